@@ -0,0 +1,331 @@
+"""
+Retailer adapter interface.
+
+Each retailer is a `RetailerAdapter` subclass that declares how it should be
+planned (cost class, concurrency limit, batch support, fallback chain) and
+implements a single `fetch` attempt through one egress. The shared `scrape`
+loop walks the fallback chain (catalog snapshot, direct request, validated
+proxies), reports proxy verdicts to the rotator, enforces the run deadline
+and the concurrency limit, and returns a typed `ScrapeResult`. Adapters that
+support batches also implement `fetch_batch`, and `scrape_batch` walks the
+chain once for many products.
+"""
+import os
+import time
+import asyncio
+import logging
+from typing import TYPE_CHECKING, Optional, Dict, Any, List, Tuple, Callable, Awaitable
+
+from scheduler import COST_HTTP, COST_BROWSER
+from log_setup import log_attempt, ATTEMPT
+from deadline import DeadlineExceeded
+from catalog_snapshot import normalize_name, normalize_ean
+
+if TYPE_CHECKING:
+    import httpx
+    from browser_pool import BrowserPool
+
+logger = logging.getLogger(__name__)
+
+# Steps of a fallback chain, also reported as the source of a price.
+SOURCE_SNAPSHOT = "snapshot"
+SOURCE_DIRECT = "direct"
+SOURCE_PROXY = "proxy"
+SOURCE_REPLAY = "replay"
+
+# Statuses meaning the retailer refused the egress rather than the product.
+BLOCKED_STATUSES = (403, 429, 502, 503)
+
+# Verdicts of a scrape: a price; the retailer answered but has no price; no attempt got an answer
+VERDICT_FOUND = "found"
+VERDICT_NOT_FOUND = "not_found"
+VERDICT_UNREACHABLE = "unreachable"
+
+# Pairs of one HTTP retailer scraped at once. HTTP work scales with the host's cores;
+# browser work is bounded by the browser (BrowserAdapter.max_concurrency, browser_server.py).
+HTTP_MAX_CONCURRENCY = int(os.environ.get("HTTP_MAX_CONCURRENCY", str(max(4, os.cpu_count() or 1))))
+
+
+class ScrapeResult:
+    """Outcome of scraping one product at one retailer."""
+
+    __slots__ = ("price", "source", "attempts", "latency_s", "answered")
+
+    def __init__(self, price: Optional[float] = None, source: Optional[str] = None, attempts: int = 0,
+                 latency_s: float = 0.0, answered: int = 0):
+        self.price = price
+        self.source = source
+        self.attempts = attempts
+        self.latency_s = latency_s
+        # Attempts the retailer answered (no EgressBlocked or other exception)
+        self.answered = answered
+
+    @property
+    def found(self) -> bool:
+        return bool(self.price)
+
+    @property
+    def verdict(self) -> str:
+        if self.found:
+            return VERDICT_FOUND
+        return VERDICT_NOT_FOUND if self.answered else VERDICT_UNREACHABLE
+
+    def __repr__(self) -> str:
+        return (f"ScrapeResult(price={self.price!r}, source={self.source!r}, attempts={self.attempts}, "
+                f"latency_s={self.latency_s:.2f}, verdict={self.verdict!r})")
+
+
+class EgressBlocked(Exception):
+    """The retailer refused this egress (e.g. 403 from a flagged proxy)."""
+
+
+class RetailerAdapter:
+    """
+    Base class of the retailer scrapers.
+
+    `services` exposes the run's shared objects as attributes, looked up on
+    every use: `rotator`, `http_pool`, `catalog`, `deadline`, `capture` and
+    `flights` (the run's SingleFlight).
+    """
+
+    # Log prefix, proxy validation lane and catalog snapshot key
+    name: str = ""
+    lane: Optional[str] = None
+    snapshot_name: Optional[str] = None
+    cost_class: str = COST_HTTP
+    # Pairs of this retailer scraped at the same time
+    max_concurrency: int = 4
+    # Whether many products can be scraped through one warmed session
+    supports_batch: bool = False
+    fallback_chain: Tuple[str, ...] = (SOURCE_SNAPSHOT, SOURCE_DIRECT, SOURCE_PROXY)
+    proxy_attempts: int = 5
+    # Shortest time an attempt needs; none is started with less left before the deadline
+    min_attempt_s: float = 0.0
+
+    def __init__(self, services):
+        self.services = services
+        self._slots = asyncio.Semaphore(self.max_concurrency)
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "cost_class": self.cost_class, "max_concurrency": self.max_concurrency,
+            "supports_batch": self.supports_batch, "fallback_chain": list(self.fallback_chain),
+        }
+
+    async def fetch(self, pool: "BrowserPool", product: Dict[str, Any], proxy_url: Optional[str]) -> Optional[float]:
+        """
+        One attempt through one egress (`proxy_url` None is direct). Returns the
+        price or None if the retailer has none; raises EgressBlocked when the
+        egress is refused and any other exception when the attempt broke.
+        """
+        raise NotImplementedError
+
+    async def fetch_batch(self, pool: "BrowserPool", eans: List[str],
+                          proxy_url: Optional[str]) -> Dict[str, Optional[float]]:
+        """
+        One attempt at many products through one egress (`supports_batch`).
+        Returns the price, or None, of each EAN the retailer answered; EANs
+        left out were not answered and are retried on the next egress. Raises
+        like `fetch` when the whole egress is refused or broken.
+        """
+        raise NotImplementedError
+
+    async def discard_egress(self, proxy_url: Optional[str]):
+        """Called after an attempt through `proxy_url` raised."""
+
+    async def close(self):
+        """Releases what the adapter keeps between attempts (end of the run)."""
+
+    async def attempt(self, pool: "BrowserPool", product: Dict[str, Any],
+                      proxy: Optional[Dict[str, Any]] = None) -> Tuple[Optional[float], bool]:
+        """One attempt; returns (price, whether the retailer answered)."""
+        proxy_url = proxy['url'] if proxy else None
+        proxy_id = proxy['proxy_id'] if proxy else None
+        attempt_type = SOURCE_PROXY if proxy else SOURCE_DIRECT
+        rotator = self.services.rotator
+        self.services.deadline.check(self.min_attempt_s)
+        log_attempt(logger, f"[{self.name}] Trying {attempt_type} for {product['product_name'][:50]}...")
+
+        try:
+            price = await self.fetch(pool, product, proxy_url)
+        except EgressBlocked as e:
+            logger.info(f"[{self.name}] {attempt_type} blocked: {e}", extra=ATTEMPT)
+            if proxy_id: await rotator.report_failure(proxy_id)
+            return None, False
+        except Exception as e:
+            logger.warning(f"[{self.name}] {attempt_type} failed: {e}", extra=ATTEMPT)
+            if proxy_id: await rotator.report_failure(proxy_id)
+            await self.discard_egress(proxy_url)
+            return None, False
+
+        if price:
+            if proxy_id: await rotator.report_success(proxy_id)
+            logger.info(f"[{self.name}] SUCCESS ({attempt_type}): ${price}")
+        return price, True
+
+    async def attempt_batch(self, pool: "BrowserPool", eans: List[str],
+                            proxy: Optional[Dict[str, Any]] = None) -> Dict[str, Optional[float]]:
+        """One batch attempt; returns the verdicts of the EANs the retailer answered."""
+        proxy_url = proxy['url'] if proxy else None
+        proxy_id = proxy['proxy_id'] if proxy else None
+        attempt_type = SOURCE_PROXY if proxy else SOURCE_DIRECT
+        rotator = self.services.rotator
+        self.services.deadline.check(self.min_attempt_s)
+        log_attempt(logger, f"[{self.name}] Trying {attempt_type} batch of {len(eans)} products...")
+
+        try:
+            prices = await self.fetch_batch(pool, eans, proxy_url)
+        except EgressBlocked as e:
+            logger.info(f"[{self.name}] {attempt_type} batch blocked: {e}", extra=ATTEMPT)
+            if proxy_id: await rotator.report_failure(proxy_id)
+            return {}
+        except Exception as e:
+            logger.warning(f"[{self.name}] {attempt_type} batch failed: {e}", extra=ATTEMPT)
+            if proxy_id: await rotator.report_failure(proxy_id)
+            await self.discard_egress(proxy_url)
+            return {}
+
+        found = sum(1 for price in prices.values() if price)
+        if found:
+            if proxy_id: await rotator.report_success(proxy_id)
+            logger.info(f"[{self.name}] SUCCESS ({attempt_type} batch): {found}/{len(eans)} prices")
+        return prices
+
+    async def lookup(self, kind: str, query: str, fetch: Callable[[], Awaitable[Optional[float]]]) -> Optional[float]:
+        """`fetch()`, shared with identical ("ean" or "name") lookups at this retailer; see single_flight.py."""
+        normalized = normalize_ean(query) if kind == "ean" else normalize_name(query)
+        return await self.services.flights.do((self.name, kind, normalized), fetch)
+
+    def snapshot(self, product: Dict[str, Any]) -> Optional[float]:
+        if not self.snapshot_name:
+            return None
+        hit = self.services.catalog.lookup(self.snapshot_name, product['ean_code'], product['product_name'])
+        if hit:
+            logger.info(f"[{self.name}] SUCCESS (snapshot, {hit['match']}): ${hit['price']}")
+            return hit['price']
+        return None
+
+    async def scrape(self, pool: "BrowserPool", product: Dict[str, Any]) -> ScrapeResult:
+        """Walks the fallback chain until one step yields a price."""
+        started = time.monotonic()
+        result = ScrapeResult()
+        async with self._slots:
+            for source in self.fallback_chain:
+                price = None
+                if source == SOURCE_SNAPSHOT:
+                    price = self.snapshot(product)
+                elif source == SOURCE_DIRECT:
+                    result.attempts += 1
+                    price, answered = await self.attempt(pool, product)
+                    result.answered += answered
+                elif source == SOURCE_PROXY:
+                    for _ in range(self.proxy_attempts):
+                        proxy = await self.services.rotator.get_proxy(self.lane)
+                        if not proxy:
+                            continue
+                        result.attempts += 1
+                        price, answered = await self.attempt(pool, product, proxy)
+                        result.answered += answered
+                        if price:
+                            break
+                if price:
+                    result.price, result.source = price, source
+                    break
+        result.latency_s = time.monotonic() - started
+        return result
+
+    async def scrape_batch(self, pool: "BrowserPool", products: List[Dict[str, Any]]) -> List[Optional[ScrapeResult]]:
+        """
+        Scrapes many products, one result per product in order. Adapters that
+        support batches walk the fallback chain once for the whole batch, each
+        egress only for the products still without a price, and share the
+        batch's latency among its products. A result is None when the run
+        deadline stopped the batch before the product got a price.
+        """
+        if not self.supports_batch:
+            return list(await asyncio.gather(*(self.scrape(pool, product) for product in products)))
+
+        started = time.monotonic()
+        results = [ScrapeResult() for _ in products]
+        pending = list(range(len(products)))
+        try:
+            async with self._slots:
+                for source in self.fallback_chain:
+                    if source == SOURCE_SNAPSHOT:
+                        for i in pending:
+                            results[i].price = self.snapshot(products[i])
+                            results[i].source = source if results[i].price else None
+                        pending = [i for i in pending if not results[i].found]
+                        continue
+                    for _ in range(self.proxy_attempts if source == SOURCE_PROXY else 1):
+                        if not pending:
+                            break
+                        proxy = None
+                        if source == SOURCE_PROXY:
+                            proxy = await self.services.rotator.get_proxy(self.lane)
+                            if not proxy:
+                                continue
+                        # Products sharing an EAN are looked up once
+                        eans = list(dict.fromkeys(products[i]['ean_code'] for i in pending))
+                        prices = await self.attempt_batch(pool, eans, proxy)
+                        for i in pending:
+                            ean = products[i]['ean_code']
+                            results[i].attempts += 1
+                            results[i].answered += ean in prices
+                            if prices.get(ean):
+                                results[i].price, results[i].source = prices[ean], source
+                        pending = [i for i in pending if not results[i].found]
+        except DeadlineExceeded:
+            if len(pending) == len(products):
+                raise
+            for i in pending:
+                results[i] = None
+        latency_s = (time.monotonic() - started) / max(len(products), 1)
+        for result in results:
+            if result is not None:
+                result.latency_s = latency_s
+        return results
+
+
+class HttpAdapter(RetailerAdapter):
+    """Retailers scraped with plain HTTP requests through the shared client pool."""
+
+    max_concurrency = HTTP_MAX_CONCURRENCY
+
+    async def get(self, proxy_url: Optional[str], url: str, **kwargs) -> "httpx.Response":
+        http_pool = self.services.http_pool
+        client = await http_pool.get(proxy_url)
+        response = await client.get(url, timeout=self.services.deadline.timeout_s(http_pool.timeout), **kwargs)
+        # Only a successful response answers for the catalog; errors and challenges are no verdict
+        if response.status_code in BLOCKED_STATUSES or not response.is_success:
+            raise EgressBlocked(f"HTTP {response.status_code}")
+        return response
+
+    async def discard_egress(self, proxy_url: Optional[str]):
+        if proxy_url:
+            await self.services.http_pool.discard(proxy_url)
+
+
+class BrowserAdapter(RetailerAdapter):
+    """Retailers that need a real browser; proxies first, then one direct attempt."""
+
+    cost_class = COST_BROWSER
+    max_concurrency = 2
+    fallback_chain = (SOURCE_PROXY, SOURCE_DIRECT)
+
+    def price_from_capture(self, product: Dict[str, Any]) -> Optional[float]:
+        """Price from the recorded page data when replaying an archive; see capture.py."""
+        raise NotImplementedError
+
+    async def scrape(self, pool: "BrowserPool", product: Dict[str, Any]) -> ScrapeResult:
+        if self.services.capture.replaying:
+            price = self.price_from_capture(product)
+            return ScrapeResult(price, SOURCE_REPLAY if price else None)
+        return await super().scrape(pool, product)
+
+    async def scrape_batch(self, pool: "BrowserPool", products: List[Dict[str, Any]]) -> List[Optional[ScrapeResult]]:
+        # Archives hold one page per product, so recording and replaying scrape products one by one
+        capture = self.services.capture
+        if capture.replaying or capture.recording:
+            return list(await asyncio.gather(*(self.scrape(pool, product) for product in products)))
+        return await super().scrape_batch(pool, products)
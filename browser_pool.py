@@ -0,0 +1,89 @@
+import os
+import asyncio
+import logging
+from typing import TYPE_CHECKING, Optional, Dict, Any
+
+if TYPE_CHECKING:
+    from playwright.async_api import Playwright, Browser, BrowserContext
+
+logger = logging.getLogger(__name__)
+
+# CDP endpoint of a shared browser (see browser_server.py); empty launches a local Chromium
+BROWSER_CDP_URL = os.environ.get("BROWSER_CDP_URL", "")
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+
+
+class BrowserPool:
+    """
+    Keeps one warm Chromium instance and hands out a fresh context per attempt.
+
+    The browser is launched in per-context proxy mode, so each attempt can use
+    its own proxy without paying for a new Chromium launch. Playwright itself
+    is only imported and started on the first request for a browser, so runs
+    without pending browser work never load it.
+
+    With a `connect_url` the pool attaches to the shared Chromium of
+    browser_server.py over CDP instead of launching its own, and falls back to
+    a local launch if the server is unreachable.
+    """
+
+    def __init__(self, headless: bool = True, connect_url: Optional[str] = BROWSER_CDP_URL):
+        self.headless = headless
+        self.connect_url = connect_url or None
+        self._playwright_cm = None
+        self._playwright: Optional["Playwright"] = None
+        self._browser: Optional["Browser"] = None
+        self._lock = asyncio.Lock()
+        self.launches = 0
+        self.connects = 0
+
+    async def get_browser(self) -> "Browser":
+        async with self._lock:
+            if self._browser and self._browser.is_connected():
+                return self._browser
+
+            if not self._playwright:
+                from playwright.async_api import async_playwright
+                self._playwright_cm = async_playwright()
+                self._playwright = await self._playwright_cm.start()
+
+            if self.connect_url:
+                try:
+                    self._browser = await self._playwright.chromium.connect_over_cdp(self.connect_url)
+                    self.connects += 1
+                    logger.info(f"Connected to shared Chromium at {self.connect_url} (connect #{self.connects}).")
+                    return self._browser
+                except Exception as e:
+                    logger.warning(f"Shared Chromium at {self.connect_url} unavailable ({e}), launching locally.")
+
+            self._browser = await self._playwright.chromium.launch(
+                headless=self.headless,
+                args=["--no-sandbox"],
+                proxy={"server": "per-context"}
+            )
+            self.launches += 1
+            logger.info(f"Launched Chromium (launch #{self.launches}).")
+            return self._browser
+
+    async def new_context(self, proxy_url: Optional[str] = None, **context_args: Any) -> "BrowserContext":
+        """Opens an isolated context, optionally routed through a proxy."""
+        browser = await self.get_browser()
+        args: Dict[str, Any] = {"user_agent": USER_AGENT}
+        args.update(context_args)
+        if proxy_url:
+            args["proxy"] = {"server": proxy_url}
+        return await browser.new_context(**args)
+
+    async def close(self):
+        # For a shared browser, close() only drops this pool's contexts and disconnects.
+        async with self._lock:
+            if self._browser:
+                try:
+                    await self._browser.close()
+                except Exception as e:
+                    logger.warning(f"Failed to close browser: {e}")
+                self._browser = None
+            if self._playwright_cm:
+                await self._playwright_cm.__aexit__(None, None, None)
+                self._playwright_cm = None
+                self._playwright = None
@@ -0,0 +1,202 @@
+"""
+Shared Chromium for every scraper process on a host.
+
+Runs one Chromium with a CDP endpoint that scraper processes attach to with
+`BrowserPool(connect_url=...)` (or `BROWSER_CDP_URL`), so a host keeps one warm
+browser no matter how many workers or shards it runs. A watchdog restarts the
+browser when its process tree exceeds the memory limit or when it exits;
+connected workers reconnect on their next attempt.
+
+Python Playwright has no `launch_server`, so the browser is started directly
+from Playwright's Chromium build and shared over CDP (`connect_over_cdp`).
+
+Usage: python browser_server.py [--port 9222] [--memory-limit-mb 3072]
+"""
+import os
+import sys
+import signal
+import shutil
+import asyncio
+import logging
+import argparse
+import tempfile
+import urllib.request
+from typing import Optional, List, Dict
+
+logger = logging.getLogger(__name__)
+
+BROWSER_SERVER_HOST = os.environ.get("BROWSER_SERVER_HOST", "127.0.0.1")
+BROWSER_SERVER_PORT = int(os.environ.get("BROWSER_SERVER_PORT", "9222"))
+# RSS of Chromium and all its child processes before the browser is recycled
+BROWSER_MEMORY_LIMIT_MB = float(os.environ.get("BROWSER_MEMORY_LIMIT_MB", "3072"))
+WATCHDOG_INTERVAL = 15
+STARTUP_TIMEOUT = 30
+
+CHROMIUM_ARGS = [
+    "--headless=new",
+    "--no-sandbox",
+    "--no-first-run",
+    "--no-default-browser-check",
+    "--disable-dev-shm-usage",
+    "--disable-background-networking",
+    "--disable-extensions",
+    "--mute-audio",
+]
+
+
+def process_tree_rss_mb(pid: int) -> float:
+    """Resident memory (MB) of a process and all its descendants. Linux only; 0 if unknown."""
+    children: Dict[int, List[int]] = {}
+    try:
+        entries = os.listdir("/proc")
+    except OSError:
+        return 0.0
+    for entry in entries:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", "r") as f:
+                # The command name may contain spaces; fields resume after the last ')'.
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+
+    total_kb = 0
+    stack = [pid]
+    while stack:
+        current = stack.pop()
+        stack.extend(children.get(current, []))
+        try:
+            with open(f"/proc/{current}/status", "r") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total_kb += int(line.split()[1])
+                        break
+        except (OSError, ValueError):
+            continue
+    return total_kb / 1024
+
+
+def chromium_executable() -> str:
+    """Path of the Chromium build installed by `playwright install chromium`."""
+    from playwright.sync_api import sync_playwright
+    with sync_playwright() as p:
+        return p.chromium.executable_path
+
+
+class BrowserServer:
+    """Launches Chromium with a CDP endpoint and recycles it past the memory limit."""
+
+    def __init__(self, host: str = BROWSER_SERVER_HOST, port: int = BROWSER_SERVER_PORT,
+                 memory_limit_mb: float = BROWSER_MEMORY_LIMIT_MB):
+        self.host = host
+        self.port = port
+        self.memory_limit_mb = memory_limit_mb
+        self.executable: Optional[str] = None
+        self.process: Optional[asyncio.subprocess.Process] = None
+        self.profile_dir: Optional[str] = None
+        self.restarts = 0
+
+    @property
+    def endpoint(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def _is_ready(self) -> bool:
+        try:
+            with urllib.request.urlopen(f"{self.endpoint}/json/version", timeout=1) as response:
+                return response.status == 200
+        except OSError:
+            return False
+
+    async def start(self):
+        if self.executable is None:
+            self.executable = await asyncio.to_thread(chromium_executable)
+        self.profile_dir = tempfile.mkdtemp(prefix="cpi-chromium-")
+        self.process = await asyncio.create_subprocess_exec(
+            self.executable,
+            *CHROMIUM_ARGS,
+            f"--remote-debugging-address={self.host}",
+            f"--remote-debugging-port={self.port}",
+            f"--user-data-dir={self.profile_dir}",
+            "about:blank",
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.DEVNULL
+        )
+        for _ in range(STARTUP_TIMEOUT * 4):
+            if await asyncio.to_thread(self._is_ready):
+                logger.info(f"Shared Chromium (pid {self.process.pid}) listening on {self.endpoint}")
+                return
+            if self.process.returncode is not None:
+                break
+            await asyncio.sleep(0.25)
+        raise RuntimeError(f"Chromium did not expose {self.endpoint} within {STARTUP_TIMEOUT}s")
+
+    async def stop(self):
+        if self.process and self.process.returncode is None:
+            self.process.terminate()
+            try:
+                await asyncio.wait_for(self.process.wait(), timeout=10)
+            except asyncio.TimeoutError:
+                self.process.kill()
+                await self.process.wait()
+        self.process = None
+        if self.profile_dir:
+            shutil.rmtree(self.profile_dir, ignore_errors=True)
+            self.profile_dir = None
+
+    async def restart(self, reason: str):
+        logger.warning(f"Restarting shared Chromium: {reason}")
+        await self.stop()
+        await self.start()
+        self.restarts += 1
+
+    async def watchdog(self):
+        while True:
+            await asyncio.sleep(WATCHDOG_INTERVAL)
+            if self.process is None or self.process.returncode is not None:
+                await self.restart("browser exited")
+                continue
+            rss_mb = process_tree_rss_mb(self.process.pid)
+            if rss_mb > self.memory_limit_mb:
+                await self.restart(f"{rss_mb:.0f} MB over the {self.memory_limit_mb:.0f} MB limit")
+            else:
+                logger.debug(f"Shared Chromium using {rss_mb:.0f} MB")
+
+    async def run(self):
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, stop.set)
+            except NotImplementedError:
+                pass
+
+        await self.start()
+        watchdog = asyncio.create_task(self.watchdog())
+        try:
+            await stop.wait()
+        finally:
+            watchdog.cancel()
+            await self.stop()
+            logger.info(f"Shared Chromium stopped after {self.restarts} restart(s).")
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Shared Chromium for scraper workers")
+    parser.add_argument("--host", default=BROWSER_SERVER_HOST)
+    parser.add_argument("--port", type=int, default=BROWSER_SERVER_PORT)
+    parser.add_argument("--memory-limit-mb", type=float, default=BROWSER_MEMORY_LIMIT_MB)
+    args = parser.parse_args()
+
+    server = BrowserServer(args.host, args.port, args.memory_limit_mb)
+    try:
+        asyncio.run(server.run())
+    except RuntimeError as e:
+        logger.error(str(e))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
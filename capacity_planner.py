@@ -0,0 +1,369 @@
+"""
+Run-duration simulator and capacity planner.
+
+Builds per-retailer distributions of pair duration and success from recorded
+runs, then simulates scraper runs to size them against the workflow limit:
+
+- Logs: GitHub Actions job logs as downloaded (UTF-16 or UTF-8, e.g.
+  `scraper_log.txt`) or local scraper output. `[Pair]` summary lines are used
+  when present; older logs are segmented from their `[Retailer] Trying ...` /
+  `Attempt n/m` lines up to `SUCCESS` or `No price found`. Job setup and
+  teardown around the scraper step, and the proxy harvest (`proxy_log.txt`),
+  are measured as fixed overhead.
+- Metrics: `.cache/retailer_stats.json` (scheduler.py) fills in retailers the
+  logs have no pairs for; scheduler defaults fill in the rest.
+
+A simulated run draws every pair's (duration, success) from its retailer's
+samples (bootstrap). Products are split evenly across shards (parallel jobs);
+within a job `concurrency` pairs run at once, at most the adapter limit per
+retailer. The job's makespan is Graham's list-scheduling bound,
+`work / workers + (1 - 1 / workers) * longest pair`, taken over all pairs and
+over each retailer with its own worker cap, which is exact for one worker and
+conservative otherwise. Recommendations only use settings the runner
+supports: scraper.yml runs main.py as one job that scrapes one pair at a time,
+so the planner says whether the run fits one job at concurrency 1 and how many
+products do. Other shard and concurrency values can still be simulated as
+what-ifs.
+
+Usage: python capacity_planner.py --products 240 [--log scraper_log.txt --log proxy_log.txt]
+       [--concurrency 1] [--shards 1] [--limit 300]
+"""
+import re
+import math
+import logging
+import argparse
+from datetime import datetime
+from typing import Optional, Dict, List, Tuple, Iterable
+
+import numpy as np
+
+from adapters import HttpAdapter, BrowserAdapter
+from scheduler import RetailerStats, STATS_PATH, COST_HTTP, COST_BROWSER, DEFAULT_COST_S, DEFAULT_SUCCESS_RATE
+
+logger = logging.getLogger(__name__)
+
+# Workflow job limit (scraper.yml timeout-minutes)
+LIMIT_MINUTES = 300
+TRIALS = 500
+PERCENTILE = 95
+# Retailer tags of the scrapers; establishment names in the database map onto them
+RETAILERS = ("Walmart", "Bodega", "Chedraui", "Soriana", "La Comer")
+RETAILER_ALIASES = {"Wal-Mart": "Walmart", "Bodega Aurrera": "Bodega"}
+COST_CLASSES = {"Walmart": COST_BROWSER, "Bodega": COST_BROWSER}
+MAX_CONCURRENCY = {COST_BROWSER: BrowserAdapter.max_concurrency, COST_HTTP: HttpAdapter.max_concurrency}
+# Samples synthesized from an EWMA cost and success rate (metrics only, no logs)
+METRIC_SAMPLES = 20
+# What the runner can apply: scraper.yml runs one main.py job, which scrapes pairs one at a time
+RUNNER_SHARDS = 1
+RUNNER_CONCURRENCY = 1
+# Trials per step of the capacity search
+CAPACITY_TRIALS = 200
+
+GITHUB_TS = re.compile(r"(\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}(?:\.\d+)?)Z")
+PYTHON_TS = re.compile(r"(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}),(\d{3})")
+PAIR_LINE = re.compile(r"\[Pair\] product=\d+ establishment=(?P<retailer>.+?) status=(?P<status>\w+) .*?"
+                       r"attempts=(?P<attempts>\d+) duration=(?P<duration>[\d.]+)s")
+ATTEMPT_LINE = re.compile(r"\[(?P<retailer>[^\]]+)\] (?:Trying (?:direct|proxy)|Attempt \d+/\d+)")
+SUCCESS_LINE = re.compile(r"\[(?P<retailer>[^\]]+)\] SUCCESS")
+NOT_FOUND_LINE = re.compile(r"(?:No price found for|Error scraping) (?P<retailer>.+?):?$")
+RUN_START = "Starting Hybrid Scraper"
+RUN_END = re.compile(r"Scraping Cycle Completed|\[Schedule\]|\[Parse\]")
+HARVEST_START = "Harvesting proxies"
+HARVEST_END = re.compile(r"Upserted \d+ proxies")
+# [Pair] statuses counted as a scraped pair, and whether they found a price
+PAIR_OUTCOMES = {"persisted": True, "not_persisted": True, "not_found": False, "unreachable": False, "error": False}
+
+
+def retailer_key(name: str) -> str:
+    name = name.strip()
+    return RETAILER_ALIASES.get(name, name)
+
+
+def read_log(path: str) -> List[str]:
+    """Lines of a log file, UTF-16 (GitHub downloads on Windows) or UTF-8."""
+    with open(path, "rb") as f:
+        raw = f.read()
+    if raw[:2] in (b"\xff\xfe", b"\xfe\xff") or raw[1:200:2].count(0) > 50:
+        text = raw.decode("utf-16", errors="replace")
+    else:
+        text = raw.decode("utf-8-sig", errors="replace")
+    return text.splitlines()
+
+
+def line_time(line: str) -> Optional[float]:
+    match = GITHUB_TS.search(line)
+    if match:
+        return datetime.fromisoformat(match.group(1)[:26]).timestamp()
+    match = PYTHON_TS.search(line)
+    if match:
+        return datetime.fromisoformat(match.group(1)).timestamp() + int(match.group(2)) / 1000
+    return None
+
+
+class RetailerProfile:
+    """Observed pair samples of one retailer."""
+
+    def __init__(self, name: str, source: str = "log"):
+        self.name = name
+        self.source = source
+        self.durations: List[float] = []
+        self.successes: List[bool] = []
+        self.attempts: List[int] = []
+
+    @property
+    def cost_class(self) -> str:
+        return COST_CLASSES.get(self.name, COST_HTTP)
+
+    @property
+    def max_concurrency(self) -> int:
+        return MAX_CONCURRENCY[self.cost_class]
+
+    def add(self, duration_s: float, success: bool, attempts: int = 1):
+        self.durations.append(max(duration_s, 0.0))
+        self.successes.append(success)
+        self.attempts.append(attempts)
+
+    def arrays(self) -> Tuple[np.ndarray, np.ndarray]:
+        return np.asarray(self.durations, dtype=np.float64), np.asarray(self.successes, dtype=bool)
+
+    def summary(self) -> str:
+        durations, successes = self.arrays()
+        p50, p95 = np.percentile(durations, [50, 95])
+        return (f"{self.name:<9} {self.cost_class:<7} {len(durations):>5} {p50:>8.1f}s {p95:>8.1f}s "
+                f"{durations.mean():>8.1f}s {successes.mean():>6.0%} {np.mean(self.attempts):>5.1f}  {self.source}")
+
+
+class LogHistory:
+    """Pairs and run overheads parsed from logs."""
+
+    def __init__(self):
+        self.profiles: Dict[str, RetailerProfile] = {}
+        self.overheads_s: List[float] = []
+        self.harvests_s: List[float] = []
+
+    def profile(self, retailer: str) -> RetailerProfile:
+        key = retailer_key(retailer)
+        if key not in self.profiles:
+            self.profiles[key] = RetailerProfile(key)
+        return self.profiles[key]
+
+    def add_log(self, path: str):
+        lines = read_log(path)
+        pairs_before = sum(len(p.durations) for p in self.profiles.values())
+        if any("[Pair] " in line for line in lines):
+            self._parse_pair_lines(lines)
+        else:
+            self._parse_attempt_lines(lines)
+        self._parse_overheads(lines)
+        pairs = sum(len(p.durations) for p in self.profiles.values()) - pairs_before
+        logger.info(f"[Planner] {path}: {pairs} pairs")
+
+    def _parse_pair_lines(self, lines: Iterable[str]):
+        for line in lines:
+            match = PAIR_LINE.search(line)
+            if match and match.group("status") in PAIR_OUTCOMES:
+                self.profile(match.group("retailer")).add(
+                    float(match.group("duration")), PAIR_OUTCOMES[match.group("status")], int(match.group("attempts")))
+
+    def _parse_attempt_lines(self, lines: Iterable[str]):
+        # Logs before the [Pair] summary: pairs ran one at a time, from the first attempt to the verdict
+        retailer, started, attempts, last_time = None, None, 0, None
+        for line in lines:
+            now = line_time(line)
+            if now is not None:
+                last_time = now
+            match = ATTEMPT_LINE.search(line)
+            if match:
+                if retailer != retailer_key(match.group("retailer")):
+                    retailer, started, attempts = retailer_key(match.group("retailer")), last_time, 0
+                attempts += 1
+                continue
+            match = SUCCESS_LINE.search(line)
+            if match:
+                # Snapshot hits succeed without an attempt
+                if retailer != retailer_key(match.group("retailer")):
+                    started, attempts = last_time, 0
+                self.profile(match.group("retailer")).add(last_time - started, True, attempts)
+                retailer = None
+                continue
+            match = NOT_FOUND_LINE.search(line.rstrip())
+            if match and retailer is not None:
+                self.profile(retailer).add(last_time - started, False, attempts)
+                retailer = None
+
+    def _parse_overheads(self, lines: List[str]):
+        times = [t for t in map(line_time, lines) if t is not None]
+        run_start = run_end = harvest_start = harvest_end = None
+        for line in lines:
+            if RUN_START in line and run_start is None:
+                run_start = line_time(line)
+            elif RUN_END.search(line):
+                run_end = line_time(line)
+            elif HARVEST_START in line and harvest_start is None:
+                harvest_start = line_time(line)
+            elif HARVEST_END.search(line) and harvest_end is None:
+                harvest_end = line_time(line)
+        if harvest_start is not None and harvest_end is not None:
+            self.harvests_s.append(harvest_end - harvest_start)
+        # Job setup (checkout, installs, harvest) before the scraper and teardown after it
+        job_log = any(GITHUB_TS.search(line) for line in lines[:50])
+        if job_log and run_start is not None and run_end is not None:
+            self.overheads_s.append((run_start - times[0]) + (times[-1] - run_end))
+
+
+def load_profiles(history: LogHistory, stats_path: Optional[str] = STATS_PATH,
+                  retailers: Iterable[str] = RETAILERS) -> Dict[str, RetailerProfile]:
+    """Log samples per retailer; retailer stats, then scheduler defaults, for retailers without any."""
+    stats = RetailerStats(stats_path) if stats_path else None
+    observed = {retailer_key(name): values for name, values in (stats.retailers if stats else {}).items()}
+    profiles = {}
+    for name in retailers:
+        profile = history.profiles.get(name)
+        if profile and profile.durations:
+            profiles[name] = profile
+            continue
+        profile = RetailerProfile(name)
+        values = observed.get(name)
+        if values and values.get("samples"):
+            profile.source = "retailer_stats"
+            cost_s, success_rate = values["cost_s"], values["success_rate"]
+        else:
+            profile.source = "default"
+            cost_s, success_rate = DEFAULT_COST_S[profile.cost_class], DEFAULT_SUCCESS_RATE
+        found = round(success_rate * METRIC_SAMPLES)
+        for i in range(METRIC_SAMPLES):
+            profile.add(cost_s, i < found)
+        profiles[name] = profile
+    return profiles
+
+
+class SimulationResult:
+    """Run times (seconds, one per trial) and prices found of a simulated configuration."""
+
+    __slots__ = ("products", "concurrency", "shards", "run_s", "found")
+
+    def __init__(self, products: int, concurrency: int, shards: int, run_s: np.ndarray, found: np.ndarray):
+        self.products = products
+        self.concurrency = concurrency
+        self.shards = shards
+        self.run_s = run_s
+        self.found = found
+
+    def percentile_min(self, q: float = PERCENTILE) -> float:
+        return float(np.percentile(self.run_s, q)) / 60
+
+    def summary(self) -> str:
+        p50, p95, worst = (np.percentile(self.run_s, [50, PERCENTILE, 100]) / 60)
+        return (f"{self.products:>8} {self.shards:>6} {self.concurrency:>11} {p50:>8.1f} {p95:>8.1f} {worst:>8.1f} "
+                f"{self.found.mean():>9.0f}")
+
+
+def simulate(profiles: Dict[str, RetailerProfile], products: int, concurrency: int = 1, shards: int = 1,
+             overhead_s: float = 0.0, trials: int = TRIALS, seed: Optional[int] = 0) -> SimulationResult:
+    """Simulated wall time of a run: the slowest shard's job, overhead included."""
+    rng = np.random.default_rng(seed)
+    per_shard = math.ceil(products / shards) if products else 0
+    total_work = np.zeros((trials, shards))
+    longest = np.zeros((trials, shards))
+    retailer_bound = np.zeros((trials, shards))
+    found = np.zeros(trials)
+    for profile in profiles.values():
+        durations, successes = profile.arrays()
+        draws = rng.integers(0, len(durations), size=(trials, shards, per_shard))
+        pair_s = durations[draws]
+        work = pair_s.sum(axis=2)
+        pair_max = pair_s.max(axis=2) if per_shard else np.zeros((trials, shards))
+        cap = min(profile.max_concurrency, concurrency)
+        retailer_bound = np.maximum(retailer_bound, work / cap + (1 - 1 / cap) * pair_max)
+        total_work += work
+        longest = np.maximum(longest, pair_max)
+        found += successes[draws].sum(axis=(1, 2))
+    makespan = np.maximum(total_work / concurrency + (1 - 1 / concurrency) * longest, retailer_bound)
+    # Shards beyond the product count have no work; drop their surplus products from the yield
+    found *= products / (per_shard * shards) if per_shard else 0
+    return SimulationResult(products, concurrency, shards, makespan.max(axis=1) + overhead_s, found)
+
+
+def recommend(profiles: Dict[str, RetailerProfile], products: int, limit_min: float = LIMIT_MINUTES,
+              overhead_s: float = 0.0, max_shards: int = RUNNER_SHARDS,
+              concurrency_options: Iterable[int] = (RUNNER_CONCURRENCY,),
+              trials: int = TRIALS) -> Optional[SimulationResult]:
+    """
+    Fewest shards, then least concurrency, whose p95 run time fits `limit_min`.
+    The defaults search only what the runner supports (one job, one pair at a time).
+    """
+    for shards in range(1, max_shards + 1):
+        for concurrency in sorted(concurrency_options):
+            result = simulate(profiles, products, concurrency, shards, overhead_s, trials)
+            if result.percentile_min() <= limit_min:
+                return result
+    return None
+
+
+def capacity(profiles: Dict[str, RetailerProfile], concurrency: int = 1, limit_min: float = LIMIT_MINUTES,
+             overhead_s: float = 0.0, trials: int = TRIALS) -> int:
+    """Most products one job finishes within `limit_min` at p95."""
+    def fits(products: int) -> bool:
+        return simulate(profiles, products, concurrency, 1, overhead_s, trials).percentile_min() <= limit_min
+
+    low, high = 0, 64
+    while fits(high):
+        low, high = high, high * 2
+    high -= 1
+    while low < high:
+        mid = (low + high + 1) // 2
+        if fits(mid):
+            low = mid
+        else:
+            high = mid - 1
+    return low
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Simulate scraper runs from recorded timings and recommend settings")
+    parser.add_argument("--products", type=int, required=True, help="Products in the run")
+    parser.add_argument("--log", action="append", default=[], help="Scraper or harvester log (repeatable)")
+    parser.add_argument("--stats", default=STATS_PATH, help="Retailer stats of previous runs (scheduler.py)")
+    parser.add_argument("--retailers", default=",".join(RETAILERS), help="Comma-separated retailers in the run")
+    parser.add_argument("--concurrency", type=int, default=RUNNER_CONCURRENCY,
+                        help="Pairs in flight per job to simulate (what-if; main.py scrapes one at a time)")
+    parser.add_argument("--shards", type=int, default=RUNNER_SHARDS,
+                        help="Parallel jobs to simulate (what-if; scraper.yml runs one job)")
+    parser.add_argument("--limit", type=float, default=LIMIT_MINUTES, help="Job limit in minutes")
+    parser.add_argument("--overhead", type=float, help="Fixed job overhead in minutes (default: measured from logs)")
+    parser.add_argument("--trials", type=int, default=TRIALS)
+    args = parser.parse_args()
+
+    history = LogHistory()
+    for path in args.log:
+        history.add_log(path)
+    retailers = [retailer_key(name) for name in args.retailers.split(",") if name.strip()]
+    profiles = load_profiles(history, args.stats, retailers)
+    if args.overhead is not None:
+        overhead_s = args.overhead * 60
+    else:
+        overhead_s = float(np.median(history.overheads_s)) if history.overheads_s else 0.0
+
+    print(f"{'retailer':<9} {'class':<7} {'pairs':>5} {'p50':>9} {'p95':>9} {'mean':>9} {'found':>6} {'tries':>5}  source")
+    for profile in profiles.values():
+        print(profile.summary())
+    harvest = f", proxy harvest {np.median(history.harvests_s):.0f}s" if history.harvests_s else ""
+    print(f"\nJob overhead {overhead_s / 60:.1f} min{harvest}; limit {args.limit:.0f} min at p{PERCENTILE}.\n")
+
+    print(f"{'products':>8} {'shards':>6} {'concurrency':>11} {'p50 min':>8} {'p95 min':>8} {'max min':>8} {'prices':>9}")
+    print(simulate(profiles, args.products, args.concurrency, args.shards, overhead_s, args.trials).summary())
+    if (args.shards, args.concurrency) != (RUNNER_SHARDS, RUNNER_CONCURRENCY):
+        print(f"(what-if: the runner supports {RUNNER_SHARDS} shard at concurrency {RUNNER_CONCURRENCY})")
+    best = recommend(profiles, args.products, args.limit, overhead_s, trials=args.trials)
+    supported = capacity(profiles, RUNNER_CONCURRENCY, args.limit, overhead_s, min(args.trials, CAPACITY_TRIALS))
+    if best:
+        print(f"\nFits the runner: {args.products} products in one job at concurrency {RUNNER_CONCURRENCY}")
+        print(best.summary())
+    else:
+        print(f"\nDoes not fit the runner: at most {supported} products fit one job.")
+    print(f"\nCapacity per job: {supported} products at concurrency {RUNNER_CONCURRENCY}")
+
+
+if __name__ == "__main__":
+    main()
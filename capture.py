@@ -0,0 +1,182 @@
+"""
+Record and replay of retailer traffic.
+
+`--record PATH` writes every retailer HTTP exchange (through the HTTP client
+pool), every browser `__NEXT_DATA__` extraction, the proxies handed out and
+each pair's scraped price to a gzip-compressed JSON Lines archive.
+`--replay PATH` runs the scrapers over the recorded pairs with the archive
+as their only source: HTTP requests are answered from it (in recorded order
+per URL, so retries and proxy fallbacks see the same failures), proxies
+come from it instead of the database, and browser retailers read the
+recorded `__NEXT_DATA__`. Replays need no network, credentials or browser,
+so they are deterministic regression and performance runs on real payloads.
+"""
+import gzip
+import json
+import base64
+import logging
+from typing import TYPE_CHECKING, Optional, Dict, Any, List, Tuple
+
+from proxy_client import ProxyRotator
+
+if TYPE_CHECKING:
+    import httpx
+    from db import Database
+
+logger = logging.getLogger(__name__)
+
+# Response headers kept in the archive; bodies are stored decoded.
+KEPT_HEADERS = ("content-type",)
+
+
+def encode_body(body: bytes) -> Dict[str, str]:
+    try:
+        return {"body": body.decode("utf-8")}
+    except UnicodeDecodeError:
+        return {"body_b64": base64.b64encode(body).decode("ascii")}
+
+
+def decode_body(entry: Dict[str, Any]) -> bytes:
+    if "body_b64" in entry:
+        return base64.b64decode(entry["body_b64"])
+    return entry.get("body", "").encode("utf-8")
+
+
+class CaptureArchive:
+    """An archive being recorded to, being replayed from, or neither (the default)."""
+
+    def __init__(self):
+        self.mode: Optional[str] = None
+        self._out = None
+        # Replay: entries per (kind, key) in recorded order, and how many were served.
+        self._entries: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
+        self._served: Dict[Tuple[str, str], int] = {}
+        self.pairs: List[Dict[str, Any]] = []
+        self.counts = {"recorded": 0, "served": 0, "missed": 0}
+
+    @property
+    def recording(self) -> bool:
+        return self.mode == "record"
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == "replay"
+
+    def record_to(self, path: str):
+        # One archive per run: replay order per URL is only meaningful within a run.
+        self._out = gzip.open(path, "wt", encoding="utf-8")
+        self.mode = "record"
+        logger.info(f"[Capture] Recording retailer traffic to {path}")
+
+    def load(self, path: str):
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                if entry["kind"] == "pair":
+                    self.pairs.append(entry)
+                else:
+                    self._entries.setdefault((entry["kind"], entry["key"]), []).append(entry)
+        self.mode = "replay"
+        logger.info(f"[Capture] Replaying {len(self.pairs)} pairs and "
+                    f"{sum(map(len, self._entries.values()))} recorded entries from {path}")
+
+    def _write(self, kind: str, key: str, **fields):
+        if not self.recording:
+            return
+        self._out.write(json.dumps({"kind": kind, "key": key, **fields}, ensure_ascii=False) + "\n")
+        self.counts["recorded"] += 1
+
+    def next(self, kind: str, key: str) -> Optional[Dict[str, Any]]:
+        """The next recorded entry for `key`; the last one repeats once all were served."""
+        entries = self._entries.get((kind, key))
+        if not entries:
+            self.counts["missed"] += 1
+            return None
+        served = self._served.get((kind, key), 0)
+        self._served[(kind, key)] = served + 1
+        self.counts["served"] += 1
+        return entries[min(served, len(entries) - 1)]
+
+    # --- Recording ---
+
+    @staticmethod
+    def request_key(request: "httpx.Request") -> str:
+        return f"{request.method} {request.url}"
+
+    def record_http(self, request: "httpx.Request", response: Optional["httpx.Response"] = None,
+                    body: bytes = b"", error: Optional[str] = None):
+        if error is not None:
+            self._write("http", self.request_key(request), error=error)
+            return
+        headers = {name: response.headers[name] for name in KEPT_HEADERS if name in response.headers}
+        self._write("http", self.request_key(request), status=response.status_code, headers=headers,
+                    **encode_body(body))
+
+    def record_next_data(self, retailer: str, ean: str, next_data: Any):
+        self._write("next_data", f"{retailer} {ean}", value=next_data)
+
+    def record_proxy(self, lane: Optional[str], proxy: Optional[Dict[str, Any]]):
+        self._write("proxy", lane or "", value=proxy)
+
+    def record_pair(self, product: Dict[str, Any], establishment: Dict[str, Any], price: Optional[float]):
+        self._write("pair", f"{product['product_id']} {establishment['establishment_id']}",
+                    product=product, establishment=establishment, price=price)
+
+    # --- Replay ---
+
+    def next_data(self, retailer: str, ean: str) -> Any:
+        """The last non-empty `__NEXT_DATA__` recorded for (retailer, EAN), if any."""
+        entries = self._entries.get(("next_data", f"{retailer} {ean}")) or []
+        values = [entry["value"] for entry in entries if entry["value"]]
+        self.counts["served" if values else "missed"] += 1
+        return values[-1] if values else None
+
+    def transport(self, proxy_url: Optional[str] = None) -> "httpx.AsyncBaseTransport":
+        """HTTP transport for one egress: recording around the real one, or answering from the archive."""
+        from capture_transport import RecordingTransport, ReplayTransport
+
+        if self.replaying:
+            return ReplayTransport(self)
+        import httpx
+        return RecordingTransport(httpx.AsyncHTTPTransport(proxy=proxy_url, verify=False), self)
+
+    def summary(self) -> str:
+        if self.recording:
+            return f"{self.counts['recorded']} entries recorded"
+        return f"{self.counts['served']} entries served, {self.counts['missed']} missing"
+
+    def close(self):
+        if self._out:
+            self._out.close()
+            self._out = None
+
+
+class CaptureRotator(ProxyRotator):
+    """
+    ProxyRotator that records the proxies it hands out, or, when replaying,
+    hands out the recorded ones without touching the database.
+    """
+
+    def __init__(self, archive: CaptureArchive, db: Optional["Database"] = None):
+        super().__init__(db)
+        self.archive = archive
+        if archive.replaying:
+            self.attach(None)
+
+    async def get_proxy(self, lane: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        if self.archive.replaying:
+            entry = self.archive.next("proxy", lane or "")
+            return entry["value"] if entry else None
+        proxy = await super().get_proxy(lane)
+        self.archive.record_proxy(lane, proxy)
+        return proxy
+
+    async def report_failure(self, proxy_id: int):
+        if not self.archive.replaying:
+            await super().report_failure(proxy_id)
+
+    async def report_success(self, proxy_id: int):
+        if not self.archive.replaying:
+            await super().report_success(proxy_id)
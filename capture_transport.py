@@ -0,0 +1,46 @@
+"""httpx transports of capture.py, kept apart so httpx is only imported when recording or replaying."""
+import httpx
+
+from capture import CaptureArchive, decode_body
+
+# Recorded bodies are decoded, so these no longer describe them.
+DROPPED_HEADERS = {"content-encoding", "content-length", "transfer-encoding"}
+
+
+class RecordingTransport(httpx.AsyncBaseTransport):
+    """Passes requests to the real transport and records each response or error."""
+
+    def __init__(self, inner: httpx.AsyncBaseTransport, archive: CaptureArchive):
+        self.inner = inner
+        self.archive = archive
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        try:
+            response = await self.inner.handle_async_request(request)
+            body = await response.aread()
+            await response.aclose()
+        except httpx.HTTPError as e:
+            self.archive.record_http(request, error=f"{type(e).__name__}: {e}")
+            raise
+        self.archive.record_http(request, response, body)
+        headers = [(k, v) for k, v in response.headers.multi_items() if k.lower() not in DROPPED_HEADERS]
+        return httpx.Response(response.status_code, headers=headers, content=body, request=request)
+
+    async def aclose(self):
+        await self.inner.aclose()
+
+
+class ReplayTransport(httpx.AsyncBaseTransport):
+    """Answers requests from the archive; unrecorded requests fail like an unreachable host."""
+
+    def __init__(self, archive: CaptureArchive):
+        self.archive = archive
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        entry = self.archive.next("http", CaptureArchive.request_key(request))
+        if entry is None:
+            raise httpx.ConnectError(f"Not in archive: {CaptureArchive.request_key(request)}", request=request)
+        if "error" in entry:
+            raise httpx.ConnectError(entry["error"], request=request)
+        return httpx.Response(entry["status"], headers=entry.get("headers", {}), content=decode_body(entry),
+                              request=request)
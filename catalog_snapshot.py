@@ -0,0 +1,389 @@
+"""
+Daily catalog snapshot of the HTTP retailers (Chedraui, Soriana, La Comer).
+
+Bulk-crawls category/aisle listings once a day into a compact local SQLite
+index keyed by EAN and normalized product name. The hourly scraper resolves
+prices from the snapshot first and only falls back to a targeted live lookup
+for products the snapshot does not cover.
+
+Usage: python catalog_snapshot.py [--retailer Chedraui] [--index .cache/catalog.sqlite]
+"""
+import os
+import re
+import json
+import time
+import sqlite3
+import asyncio
+import logging
+import argparse
+import unicodedata
+from typing import Optional, Dict, Any, List, Iterable
+
+from dotenv import load_dotenv
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+CATALOG_INDEX_PATH = os.path.join(os.environ.get("SCRAPER_CACHE_DIR", ".cache"), "catalog.sqlite")
+# Snapshot rows older than this are ignored by the scraper (a daily job plus slack).
+CATALOG_MAX_AGE = int(os.environ.get("CATALOG_MAX_AGE", str(26 * 3600)))
+CRAWL_CONCURRENCY = 8
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+
+# Chedraui (VTEX): the category tree is discovered, leaves are paged 50 at a time (VTEX caps at 2500).
+CHEDRAUI_BASE = "https://www.chedraui.com.mx/api/catalog_system/pub"
+VTEX_PAGE_SIZE = 50
+VTEX_MAX_OFFSET = 2500
+
+# Soriana (Salesforce Commerce Cloud): listing pages by category id.
+SORIANA_LISTING_URL = "https://www.soriana.com/on/demandware.store/Sites-Soriana-Site/es_MX/Search-ShowAjax"
+SORIANA_CATEGORIES = os.environ.get(
+    "SORIANA_CATEGORIES",
+    "despensa,lacteos-y-huevo,bebidas,frutas-y-verduras,carnes-pescados-y-mariscos,"
+    "salchichoneria,panaderia-y-tortilleria,limpieza-y-hogar,higiene-y-belleza"
+).split(",")
+SORIANA_PAGE_SIZE = 48
+SORIANA_MAX_PAGES = 60
+
+# La Comer: aisle (pasillo) listings by agruId for the same store as the detail endpoint.
+LACOMER_LISTING_URL = os.environ.get(
+    "LACOMER_LISTING_URL",
+    "https://www.lacomer.com.mx/lacomer-api/api/v1/public/articulopasillo/articulospasillo"
+)
+LACOMER_AISLE_IDS = [int(a) for a in os.environ.get("LACOMER_AISLE_IDS", ",".join(map(str, range(1, 81)))).split(",")]
+LACOMER_SUCC_ID = "287"
+LACOMER_MAX_PAGES = 40
+
+
+def normalize_name(name: Optional[str]) -> str:
+    """Lowercases, strips accents and punctuation and collapses whitespace."""
+    if not name:
+        return ""
+    text = unicodedata.normalize("NFKD", name)
+    text = "".join(c for c in text if not unicodedata.combining(c)).lower()
+    text = re.sub(r"[^a-z0-9]+", " ", text)
+    return " ".join(text.split())
+
+
+def normalize_ean(ean: Optional[str]) -> str:
+    """Strips non-digits and leading zeros so UPC-A/EAN-13 variants of a code match."""
+    digits = re.sub(r"\D", "", str(ean or ""))
+    return digits.lstrip("0")
+
+
+class CatalogIndex:
+    """
+    Local SQLite index of retailer catalog snapshots.
+    One row per (retailer, ean or name): price, display name, retailer reference and snapshot time.
+    """
+
+    def __init__(self, path: str = CATALOG_INDEX_PATH):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connect(self, create: bool = False) -> Optional[sqlite3.Connection]:
+        if self._conn:
+            return self._conn
+        if not self.path:
+            return None
+        if not create and not os.path.exists(self.path):
+            return None
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(self.path)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS catalog (
+                retailer TEXT NOT NULL,
+                ean TEXT,
+                norm_name TEXT,
+                name TEXT,
+                price REAL NOT NULL,
+                ref TEXT,
+                snapshot_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_catalog_ean ON catalog (retailer, ean)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_catalog_name ON catalog (retailer, norm_name)")
+        return self._conn
+
+    def replace_retailer(self, retailer: str, rows: Iterable[Dict[str, Any]]) -> int:
+        """Atomically replaces a retailer's snapshot. Returns the number of rows stored."""
+        conn = self._connect(create=True)
+        now = time.time()
+        records = []
+        for row in rows:
+            if not row.get("price"):
+                continue
+            records.append((
+                retailer,
+                normalize_ean(row.get("ean")) or None,
+                normalize_name(row.get("name")) or None,
+                row.get("name"),
+                float(row["price"]),
+                row.get("ref"),
+                now
+            ))
+        with conn:
+            conn.execute("DELETE FROM catalog WHERE retailer = ?", (retailer,))
+            conn.executemany("INSERT INTO catalog VALUES (?, ?, ?, ?, ?, ?, ?)", records)
+        return len(records)
+
+    def lookup(self, retailer: str, ean: Optional[str], name: Optional[str] = None,
+               max_age: int = CATALOG_MAX_AGE) -> Optional[Dict[str, Any]]:
+        """
+        Finds a fresh snapshot row by EAN, then by exact normalized name.
+        Returns {'price', 'name', 'ref', 'match'} or None.
+        """
+        conn = self._connect()
+        if not conn:
+            return None
+        min_time = time.time() - max_age
+        queries = []
+        if normalize_ean(ean):
+            queries.append(("ean", "ean = ?", normalize_ean(ean)))
+        if normalize_name(name):
+            queries.append(("name", "norm_name = ?", normalize_name(name)))
+        for match, clause, value in queries:
+            row = conn.execute(
+                f"SELECT price, name, ref FROM catalog WHERE retailer = ? AND {clause} AND snapshot_at >= ? "
+                f"ORDER BY snapshot_at DESC LIMIT 1",
+                (retailer, value, min_time)
+            ).fetchone()
+            if row:
+                return {"price": row[0], "name": row[1], "ref": row[2], "match": match}
+        return None
+
+    def close(self):
+        if self._conn:
+            self._conn.close()
+            self._conn = None
+
+    def disable(self):
+        """Makes every lookup miss, e.g. so recorded runs exercise the live scrapers."""
+        self.close()
+        self.path = None
+
+
+# --- Parsers ---
+
+def parse_vtex_products(data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Flattens a VTEX search payload into one row per SKU with an EAN and price."""
+    rows = []
+    for product in data or []:
+        for item in product.get("items") or []:
+            try:
+                price = item["sellers"][0]["commertialOffer"]["Price"]
+            except (KeyError, IndexError, TypeError):
+                continue
+            rows.append({
+                "ean": item.get("ean"),
+                "name": product.get("productName") or item.get("name"),
+                "price": price,
+                "ref": product.get("productId")
+            })
+    return rows
+
+
+def parse_soriana_listing(html: str) -> List[Dict[str, Any]]:
+    """Extracts product tiles (pid, name, price) from a Soriana listing page."""
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, "html.parser")
+    rows = []
+    for tile in soup.select(".product-tile"):
+        holder = tile if tile.has_attr("data-pid") else tile.find_parent(attrs={"data-pid": True})
+        pid = holder.get("data-pid") if holder else None
+        name_el = tile.select_one(".pdp-link a") or tile.select_one(".link")
+        price_el = tile.select_one(".price .sales .value") or tile.select_one(".price .value")
+        if not price_el:
+            continue
+        price_text = price_el.get("content") or price_el.get_text(strip=True)
+        try:
+            price = float(price_text.replace("$", "").replace(",", ""))
+        except ValueError:
+            continue
+        # Soriana product ids are the barcode for most packaged goods.
+        ean = pid if pid and pid.isdigit() and 8 <= len(pid) <= 14 else None
+        rows.append({
+            "ean": ean,
+            "name": name_el.get_text(strip=True) if name_el else None,
+            "price": price,
+            "ref": pid
+        })
+    return rows
+
+
+def parse_lacomer_articles(data: Any) -> List[Dict[str, Any]]:
+    """Collects every article (a dict with 'artEan') anywhere in a La Comer payload."""
+    rows = []
+    stack = [data]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            if node.get("artEan"):
+                price = node.get("artPrven") or node.get("artProfe")
+                if price:
+                    rows.append({
+                        "ean": node["artEan"],
+                        "name": " ".join(filter(None, [node.get("artDes"), node.get("marDes")])).strip(),
+                        "price": price,
+                        "ref": str(node.get("artCod") or "")
+                    })
+                continue
+            stack.extend(node.values())
+        elif isinstance(node, list):
+            stack.extend(node)
+    return rows
+
+
+# --- Crawlers ---
+
+async def crawl_chedraui(client) -> List[Dict[str, Any]]:
+    response = await client.get(f"{CHEDRAUI_BASE}/category/tree/3")
+    response.raise_for_status()
+
+    leaves = []
+    stack = [(node, f"/{node['id']}/") for node in response.json()]
+    while stack:
+        node, path = stack.pop()
+        children = node.get("children") or []
+        if not children:
+            leaves.append(path)
+        for child in children:
+            stack.append((child, f"{path}{child['id']}/"))
+
+    semaphore = asyncio.Semaphore(CRAWL_CONCURRENCY)
+
+    async def crawl_category(path: str) -> List[Dict[str, Any]]:
+        rows = []
+        async with semaphore:
+            for offset in range(0, VTEX_MAX_OFFSET, VTEX_PAGE_SIZE):
+                try:
+                    page = await client.get(
+                        f"{CHEDRAUI_BASE}/products/search",
+                        params={"fq": f"C:{path}", "_from": offset, "_to": offset + VTEX_PAGE_SIZE - 1}
+                    )
+                except Exception as e:
+                    logger.warning(f"[Snapshot] Chedraui {path} @{offset} failed: {e}")
+                    break
+                if page.status_code not in (200, 206):
+                    break
+                data = page.json()
+                rows.extend(parse_vtex_products(data))
+                if len(data) < VTEX_PAGE_SIZE:
+                    break
+        return rows
+
+    results = await asyncio.gather(*(crawl_category(path) for path in leaves))
+    logger.info(f"[Snapshot] Chedraui: crawled {len(leaves)} leaf categories.")
+    return [row for rows in results for row in rows]
+
+
+async def crawl_soriana(client) -> List[Dict[str, Any]]:
+    semaphore = asyncio.Semaphore(CRAWL_CONCURRENCY)
+
+    async def crawl_category(cgid: str) -> List[Dict[str, Any]]:
+        rows = []
+        async with semaphore:
+            for page_no in range(SORIANA_MAX_PAGES):
+                params = {"cgid": cgid, "start": page_no * SORIANA_PAGE_SIZE, "sz": SORIANA_PAGE_SIZE, "lang": "es_MX"}
+                try:
+                    page = await client.get(SORIANA_LISTING_URL, params=params, headers={"Accept": "text/html"})
+                except Exception as e:
+                    logger.warning(f"[Snapshot] Soriana {cgid} page {page_no} failed: {e}")
+                    break
+                if page.status_code != 200:
+                    break
+                page_rows = parse_soriana_listing(page.text)
+                if not page_rows:
+                    break
+                rows.extend(page_rows)
+        return rows
+
+    categories = [c.strip() for c in SORIANA_CATEGORIES if c.strip()]
+    results = await asyncio.gather(*(crawl_category(cgid) for cgid in categories))
+    return [row for rows in results for row in rows]
+
+
+async def crawl_lacomer(client) -> List[Dict[str, Any]]:
+    semaphore = asyncio.Semaphore(CRAWL_CONCURRENCY)
+    headers = {
+        "Accept": "application/json, text/plain, */*",
+        "Referer": "https://www.lacomer.com.mx/",
+        "Origin": "https://www.lacomer.com.mx"
+    }
+
+    async def crawl_aisle(aisle_id: int) -> List[Dict[str, Any]]:
+        rows = []
+        seen = set()
+        async with semaphore:
+            for page_no in range(1, LACOMER_MAX_PAGES + 1):
+                params = {"agruId": aisle_id, "noPagina": page_no, "succId": LACOMER_SUCC_ID}
+                try:
+                    page = await client.get(LACOMER_LISTING_URL, params=params, headers=headers)
+                except Exception as e:
+                    logger.warning(f"[Snapshot] La Comer aisle {aisle_id} page {page_no} failed: {e}")
+                    break
+                if page.status_code != 200:
+                    break
+                try:
+                    page_rows = parse_lacomer_articles(page.json())
+                except json.JSONDecodeError:
+                    break
+                new_rows = [r for r in page_rows if r["ean"] not in seen]
+                if not new_rows:
+                    break
+                seen.update(r["ean"] for r in new_rows)
+                rows.extend(new_rows)
+        return rows
+
+    results = await asyncio.gather(*(crawl_aisle(aisle_id) for aisle_id in LACOMER_AISLE_IDS))
+    return [row for rows in results for row in rows]
+
+
+# Keys match SCRAPER_REGISTRY / establishment names.
+CRAWLERS = {
+    "Chedraui": crawl_chedraui,
+    "Soriana": crawl_soriana,
+    "La Comer": crawl_lacomer,
+}
+
+
+async def run_snapshot(index: CatalogIndex, retailers: Optional[List[str]] = None) -> Dict[str, int]:
+    """Crawls each retailer and replaces its snapshot. A failed crawl keeps the previous snapshot."""
+    import httpx
+
+    counts = {}
+    headers = {"User-Agent": USER_AGENT, "Accept": "application/json"}
+    async with httpx.AsyncClient(timeout=30, verify=False, headers=headers, follow_redirects=True) as client:
+        for retailer in retailers or list(CRAWLERS):
+            started = time.monotonic()
+            try:
+                rows = await CRAWLERS[retailer](client)
+            except Exception as e:
+                logger.error(f"[Snapshot] {retailer} crawl failed: {e}")
+                continue
+            if not rows:
+                logger.warning(f"[Snapshot] {retailer} returned no products. Keeping previous snapshot.")
+                continue
+            counts[retailer] = index.replace_retailer(retailer, rows)
+            logger.info(f"[Snapshot] {retailer}: {counts[retailer]} products in {time.monotonic() - started:.1f}s.")
+    return counts
+
+
+async def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Daily catalog snapshot of HTTP retailers")
+    parser.add_argument("--retailer", action="append", choices=list(CRAWLERS), help="Only snapshot this retailer (repeatable)")
+    parser.add_argument("--index", default=CATALOG_INDEX_PATH, help="Path of the SQLite catalog index")
+    args = parser.parse_args()
+
+    index = CatalogIndex(args.index)
+    try:
+        counts = await run_snapshot(index, args.retailer)
+    finally:
+        index.close()
+    logger.info(f"[Snapshot] Done: {counts}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,188 @@
+"""
+Monthly coverage of the product × establishment matrix.
+
+A pair is covered when it has at least one price in the month (the same test
+as `check_existing_price`). The matrix is built with array operations from
+either the local mirror (local_mirror.py) or one `get_month_coverage` RPC
+(scripts/add_month_coverage_rpc.sql) that returns the active products, the
+establishments and the month's distinct priced pairs as a single JSON row,
+instead of one existence query per pair.
+
+Reports gap counts per establishment and per category, and optionally lists
+every missing pair as CSV. By default only establishments with a scraper
+(main.SCRAPER_REGISTRY) are counted.
+
+Usage: python coverage_report.py [--local] [--year 2026 --month 10] [--all-establishments] [--missing gaps.csv]
+"""
+import os
+import sys
+import csv
+import time
+import logging
+import argparse
+from datetime import date
+from typing import TYPE_CHECKING, Optional, Dict, Any, List, Iterable, Tuple
+
+import numpy as np
+from dotenv import load_dotenv
+
+from local_mirror import LocalMirror, rows_to_columns, PRODUCT_COLUMNS, ESTABLISHMENT_COLUMNS
+from cpi_engine import month_bounds, lookup
+
+if TYPE_CHECKING:
+    from supabase import Client
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+Columns = Dict[str, np.ndarray]
+
+
+class Coverage:
+    """Boolean matrix of covered pairs: rows are active products, columns establishments."""
+
+    def __init__(self, products: Columns, establishments: Columns, covered: np.ndarray):
+        self.products = products
+        self.establishments = establishments
+        self.covered = covered
+
+    @property
+    def pairs(self) -> int:
+        return self.covered.size
+
+    @property
+    def gaps(self) -> int:
+        return int(self.pairs - self.covered.sum())
+
+    def gaps_by_establishment(self) -> List[Tuple[str, int, int]]:
+        """(establishment name, missing pairs, pairs) per establishment."""
+        missing = (~self.covered).sum(axis=0)
+        return [(str(name), int(gaps), len(self.covered))
+                for name, gaps in zip(self.establishments["establishment_name"], missing)]
+
+    def gaps_by_category(self) -> List[Tuple[int, int, int]]:
+        """(category id, missing pairs, pairs) per category, most gaps first."""
+        categories, codes = np.unique(self.products["category_id"], return_inverse=True)
+        missing = np.bincount(codes, weights=(~self.covered).sum(axis=1), minlength=len(categories))
+        pairs = np.bincount(codes, minlength=len(categories)) * self.covered.shape[1]
+        order = np.lexsort((categories, -missing))
+        return [(int(categories[i]), int(missing[i]), int(pairs[i])) for i in order]
+
+    def missing_pairs(self) -> Iterable[Dict[str, Any]]:
+        rows, cols = np.nonzero(~self.covered)
+        for row, col in zip(rows, cols):
+            yield {
+                "product_id": int(self.products["product_id"][row]),
+                "ean_code": str(self.products["ean_code"][row]),
+                "product_name": str(self.products["product_name"][row]),
+                "category_id": int(self.products["category_id"][row]),
+                "establishment_id": int(self.establishments["establishment_id"][col]),
+                "establishment_name": str(self.establishments["establishment_name"][col]),
+            }
+
+
+def covered_pairs(prices: Columns, year: int, month: int) -> Tuple[np.ndarray, np.ndarray]:
+    """(product ids, establishment ids) of the mirrored prices dated in the month."""
+    start, end = month_bounds(year, month)
+    dates = prices["date"]
+    in_month = (dates >= start) & (dates < end)
+    return np.asarray(prices["product_id"][in_month]), np.asarray(prices["establishment_id"][in_month])
+
+
+def build_coverage(products: Columns, establishments: Columns, covered_product_ids: np.ndarray,
+                   covered_establishment_ids: np.ndarray, establishment_names: Optional[Iterable[str]] = None) -> Coverage:
+    """
+    Coverage of the active products at the establishments (those named in
+    `establishment_names` when given) from the priced pairs of the month.
+    """
+    active = np.asarray(products["is_active_product"], dtype=bool)
+    products = {name: np.asarray(column)[active] for name, column in products.items()}
+    if establishment_names is not None:
+        keep = np.isin(establishments["establishment_name"], list(establishment_names))
+        establishments = {name: np.asarray(column)[keep] for name, column in establishments.items()}
+    else:
+        establishments = {name: np.asarray(column) for name, column in establishments.items()}
+
+    covered = np.zeros((len(products["product_id"]), len(establishments["establishment_id"])), dtype=bool)
+    rows = lookup(covered_product_ids, products["product_id"], np.arange(covered.shape[0]))
+    cols = lookup(covered_establishment_ids, establishments["establishment_id"], np.arange(covered.shape[1]))
+    known = (rows >= 0) & (cols >= 0)
+    covered[rows[known], cols[known]] = True
+    return Coverage(products, establishments, covered)
+
+
+def local_coverage(mirror: LocalMirror, year: int, month: int,
+                   establishment_names: Optional[Iterable[str]] = None) -> Coverage:
+    product_ids, establishment_ids = covered_pairs(mirror.prices.columns(), year, month)
+    return build_coverage(mirror.products.columns(), mirror.establishments.columns(), product_ids,
+                          establishment_ids, establishment_names)
+
+
+def remote_coverage(client: "Client", year: int, month: int,
+                    establishment_names: Optional[Iterable[str]] = None) -> Coverage:
+    data = client.rpc("get_month_coverage", {"p_month": f"{year:04d}-{month:02d}-01"}).execute().data
+    pairs = np.array(data["covered"], dtype=np.int64).reshape(-1, 2)
+    return build_coverage(rows_to_columns(data["products"], PRODUCT_COLUMNS),
+                          rows_to_columns(data["establishments"], ESTABLISHMENT_COLUMNS),
+                          pairs[:, 0], pairs[:, 1], establishment_names)
+
+
+def write_missing(coverage: Coverage, path: str):
+    out = sys.stdout if path == "-" else open(path, "w", newline="", encoding="utf-8")
+    try:
+        writer = csv.DictWriter(out, fieldnames=["product_id", "ean_code", "product_name", "category_id",
+                                                 "establishment_id", "establishment_name"])
+        writer.writeheader()
+        writer.writerows(coverage.missing_pairs())
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    today = date.today()
+    parser = argparse.ArgumentParser(description="Product × establishment coverage of a month")
+    parser.add_argument("--year", type=int, default=today.year)
+    parser.add_argument("--month", type=int, default=today.month)
+    parser.add_argument("--local", action="store_true", help="Read from the local mirror instead of Supabase")
+    parser.add_argument("--all-establishments", action="store_true",
+                        help="Count every establishment, not only those with a scraper")
+    parser.add_argument("--missing", metavar="PATH", help="Write the missing pairs as CSV ('-' for stdout)")
+    args = parser.parse_args()
+
+    names = None
+    if not args.all_establishments:
+        from main import SCRAPER_REGISTRY
+        names = list(SCRAPER_REGISTRY)
+
+    started = time.perf_counter()
+    if args.local:
+        mirror = LocalMirror()
+        if not mirror.products.rows:
+            logger.info("Local mirror is empty. Run: python local_mirror.py")
+            return
+        coverage = local_coverage(mirror, args.year, args.month, names)
+    else:
+        url, key = os.environ.get("SUPABASE_URL"), os.environ.get("SUPABASE_KEY")
+        if not url or not key:
+            logger.error("Supabase credentials missing.")
+            return
+        from supabase import create_client
+        coverage = remote_coverage(create_client(url, key), args.year, args.month, names)
+    elapsed = time.perf_counter() - started
+
+    logger.info(f"[Coverage] {args.year}-{args.month:02d}: {coverage.pairs - coverage.gaps}/{coverage.pairs} pairs "
+                f"covered, {coverage.gaps} missing ({elapsed:.2f}s).")
+    print(f"{'establishment':<30} {'missing':>8} {'pairs':>8}")
+    for name, missing, pairs in coverage.gaps_by_establishment():
+        print(f"{name:<30} {missing:>8} {pairs:>8}")
+    print(f"\n{'category':<30} {'missing':>8} {'pairs':>8}")
+    for category_id, missing, pairs in coverage.gaps_by_category():
+        print(f"{category_id:<30} {missing:>8} {pairs:>8}")
+    if args.missing:
+        write_missing(coverage, args.missing)
+
+
+if __name__ == "__main__":
+    main()
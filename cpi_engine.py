@@ -0,0 +1,295 @@
+"""
+Vectorized CPI computation (the work `recalculate_daily_cpi` leaves as a placeholder).
+
+For a target month, prices come from the local mirror (local_mirror.py) as
+NumPy columns and every step is an array operation:
+
+1. Cells: for each (product, location, establishment), the latest valid price
+   of the month is matched with the latest price of the same month a year
+   earlier -> cpi_annual_product_location_establishment_inflation.
+2. Category × location and category (per country) inflation: geometric mean
+   (Jevons index) of the cell price relatives
+   -> cpi_category_location_inflation, cpi_category_inflation.
+3. Real CPI per criterion: category inflation weighted by cpi_weights,
+   renormalized over the categories that have data -> cpi_real_cpi.
+
+Rates are percentages. Results replace the month's rows in one transaction
+(the `replace_month_inflation` RPC, scripts/add_month_inflation_rpc.sql).
+
+Usage: python cpi_engine.py [--year 2026 --month 10] [--no-sync] [--dry-run]
+"""
+import os
+import logging
+import argparse
+from datetime import date
+from typing import TYPE_CHECKING, Optional, Dict, Any, List, Tuple
+
+import numpy as np
+from dotenv import load_dotenv
+
+from local_mirror import LocalMirror, MISSING_ID
+
+if TYPE_CHECKING:
+    from supabase import Client
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+# Columns of cpi_annual_product_location_establishment_inflation written back
+CELL_COLUMNS = [
+    "recent_price_id", "product_id", "country_id", "location_id", "establishment_id", "recent_date",
+    "historical_date", "days_between_measurements", "recent_price_value", "historical_price_value",
+    "aple_inflation_rate"
+]
+
+Columns = Dict[str, np.ndarray]
+
+
+def month_bounds(year: int, month: int) -> Tuple[np.datetime64, np.datetime64]:
+    start = np.datetime64(f"{year:04d}-{month:02d}", "M")
+    return start.astype("datetime64[D]"), (start + 1).astype("datetime64[D]")
+
+
+def factorize(*keys: np.ndarray) -> Tuple[np.ndarray, List[np.ndarray]]:
+    """
+    Combines several integer key columns into one dense int64 group code.
+    Returns (codes, uniques per key column).
+    """
+    codes = np.zeros(len(keys[0]), dtype=np.int64)
+    uniques = []
+    for key in keys:
+        values, inverse = np.unique(key, return_inverse=True)
+        codes = codes * len(values) + inverse
+        uniques.append(values)
+    return codes, uniques
+
+
+def latest_per_group(codes: np.ndarray, dates: np.ndarray, ids: np.ndarray) -> np.ndarray:
+    """Row indices of the latest row (by date, then id) of each group code."""
+    if not len(codes):
+        return np.empty(0, dtype=np.int64)
+    order = np.lexsort((ids, dates, codes))
+    sorted_codes = codes[order]
+    last = np.r_[sorted_codes[1:] != sorted_codes[:-1], True]
+    return order[last]
+
+
+def lookup(keys: np.ndarray, table_keys: np.ndarray, table_values: np.ndarray, missing: int = MISSING_ID) -> np.ndarray:
+    """Vectorized dict lookup: table_values[table_keys == key] for each key, `missing` if absent."""
+    if not len(table_keys):
+        return np.full(len(keys), missing, dtype=np.int64)
+    order = np.argsort(table_keys)
+    sorted_keys = table_keys[order]
+    positions = np.clip(np.searchsorted(sorted_keys, keys), 0, len(sorted_keys) - 1)
+    found = sorted_keys[positions] == keys
+    return np.where(found, table_values[order][positions], missing)
+
+
+def geometric_rate(codes: np.ndarray, relatives: np.ndarray, groups: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Jevons index per group code, as a percentage rate, and the number of relatives behind it."""
+    counts = np.bincount(codes, minlength=groups)
+    log_sums = np.bincount(codes, weights=np.log(relatives), minlength=groups)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        rates = (np.exp(log_sums / counts) - 1.0) * 100.0
+    return rates, counts
+
+
+def compute_cells(prices: Columns, products: Columns, year: int, month: int) -> Columns:
+    """
+    Annual price relatives per (product, location, establishment) for a month.
+    Returns the columns of cpi_annual_product_location_establishment_inflation.
+    """
+    start, end = month_bounds(year, month)
+    hist_start, hist_end = month_bounds(year - 1, month)
+    dates = np.asarray(prices["date"])
+    valid = np.asarray(prices["is_valid"]) & (np.asarray(prices["price_value"]) > 0)
+    recent_rows = np.flatnonzero(valid & (dates >= start) & (dates < end))
+    hist_rows = np.flatnonzero(valid & (dates >= hist_start) & (dates < hist_end))
+    rows = np.concatenate([recent_rows, hist_rows])
+
+    # One code per cell, shared by both months so the two sides can be matched
+    codes, _ = factorize(*(np.asarray(prices[k])[rows] for k in ("product_id", "location_id", "establishment_id")))
+    ids = np.asarray(prices["price_id"])[rows]
+    n = len(recent_rows)
+    recent_pos = latest_per_group(codes[:n], dates[recent_rows], ids[:n])
+    hist_pos = latest_per_group(codes[n:], dates[hist_rows], ids[n:])
+    _, recent_idx, hist_idx = np.intersect1d(codes[:n][recent_pos], codes[n:][hist_pos],
+                                             assume_unique=True, return_indices=True)
+    recent = recent_rows[recent_pos[recent_idx]]
+    hist = hist_rows[hist_pos[hist_idx]]
+
+    product_ids = np.asarray(prices["product_id"])[recent]
+    recent_values = np.asarray(prices["price_value"])[recent]
+    hist_values = np.asarray(prices["price_value"])[hist]
+    return {
+        "recent_price_id": np.asarray(prices["price_id"])[recent],
+        "product_id": product_ids,
+        "country_id": lookup(product_ids, np.asarray(products["product_id"]), np.asarray(products["country_id"])),
+        "category_id": lookup(product_ids, np.asarray(products["product_id"]), np.asarray(products["category_id"])),
+        "location_id": np.asarray(prices["location_id"])[recent],
+        "establishment_id": np.asarray(prices["establishment_id"])[recent],
+        "recent_date": dates[recent],
+        "historical_date": dates[hist],
+        "days_between_measurements": (dates[recent] - dates[hist]).astype(np.int64),
+        "recent_price_value": recent_values,
+        "historical_price_value": hist_values,
+        "aple_inflation_rate": (recent_values / hist_values - 1.0) * 100.0,
+    }
+
+
+def aggregate_categories(cells: Columns) -> Tuple[Columns, Columns]:
+    """Category × location and category inflation (per country) from the cell relatives."""
+    relatives = 1.0 + cells["aple_inflation_rate"] / 100.0
+
+    codes, (countries, categories, locations) = factorize(cells["country_id"], cells["category_id"], cells["location_id"])
+    rates, counts = geometric_rate(codes, relatives, len(countries) * len(categories) * len(locations))
+    present = np.flatnonzero(counts)
+    country_idx, rest = np.divmod(present, len(categories) * len(locations))
+    category_idx, location_idx = np.divmod(rest, len(locations))
+    category_location = {
+        "country_id": countries[country_idx],
+        "category_id": categories[category_idx],
+        "location_id": locations[location_idx],
+        "cli_inflation_rate": rates[present],
+        "cells": counts[present],
+    }
+
+    codes, (countries, categories) = factorize(cells["country_id"], cells["category_id"])
+    rates, counts = geometric_rate(codes, relatives, len(countries) * len(categories))
+    present = np.flatnonzero(counts)
+    country_idx, category_idx = np.divmod(present, len(categories))
+    category = {
+        "country_id": countries[country_idx],
+        "category_id": categories[category_idx],
+        "ci_inflation_rate": rates[present],
+        "cells": counts[present],
+    }
+    return category_location, category
+
+
+def weighted_real_cpi(category: Columns, weights: Columns) -> Columns:
+    """
+    Real CPI per (country, criterion): weighted mean of category inflation, with
+    the weights renormalized over the categories that have data.
+    """
+    countries, country_idx = np.unique(category["country_id"], return_inverse=True)
+    all_categories = np.union1d(category["category_id"], weights["category_id"])
+    criteria, criterion_idx = np.unique(weights["criterion_id"], return_inverse=True)
+
+    rates = np.zeros((len(countries), len(all_categories)))
+    has_data = np.zeros_like(rates)
+    cat_idx = np.searchsorted(all_categories, category["category_id"])
+    rates[country_idx, cat_idx] = category["ci_inflation_rate"]
+    has_data[country_idx, cat_idx] = 1.0
+
+    weight_matrix = np.zeros((len(criteria), len(all_categories)))
+    np.add.at(weight_matrix, (criterion_idx, np.searchsorted(all_categories, weights["category_id"])),
+              weights["weight_value"])
+
+    numerator = rates @ weight_matrix.T
+    denominator = has_data @ weight_matrix.T
+    country_pos, criterion_pos = np.nonzero(denominator > 0)
+    return {
+        "country_id": countries[country_pos],
+        "criterion_id": criteria[criterion_pos],
+        "real_cpi_inflation_rate": numerator[country_pos, criterion_pos] / denominator[country_pos, criterion_pos],
+    }
+
+
+def compute_month(prices: Columns, products: Columns, weights: Columns, year: int, month: int) -> Dict[str, Columns]:
+    cells = compute_cells(prices, products, year, month)
+    category_location, category = aggregate_categories(cells)
+    return {
+        "cells": cells,
+        "category_location": category_location,
+        "category": category,
+        "real_cpi": weighted_real_cpi(category, weights),
+    }
+
+
+def to_rows(columns: Columns, names: List[str], extra: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    """Column arrays to JSON-ready rows; -1 ids become null and dates ISO strings."""
+    converted = []
+    for name in names:
+        array = columns[name]
+        if np.issubdtype(array.dtype, np.datetime64):
+            converted.append([str(d) for d in array])
+        elif np.issubdtype(array.dtype, np.integer) and name.endswith("_id"):
+            converted.append([None if v == MISSING_ID else v for v in array.tolist()])
+        elif np.issubdtype(array.dtype, np.floating):
+            converted.append([round(v, 6) for v in array.tolist()])
+        else:
+            converted.append(array.tolist())
+    rows = [dict(zip(names, values)) for values in zip(*converted)]
+    if extra:
+        for row in rows:
+            row.update(extra)
+    return rows
+
+
+def write_results(client: "Client", results: Dict[str, Columns], year: int, month: int):
+    """
+    Replaces the month's rows of the inflation tables with `results` in one
+    `replace_month_inflation` call (scripts/add_month_inflation_rpc.sql). The
+    RPC runs in one transaction, so a failed write keeps the previous results.
+    """
+    client.rpc("replace_month_inflation", {
+        "p_year": year,
+        "p_month": month,
+        "p_cells": to_rows(results["cells"], CELL_COLUMNS),
+        "p_category_location": to_rows(results["category_location"], ["country_id", "category_id", "location_id", "cli_inflation_rate"]),
+        "p_category": to_rows(results["category"], ["country_id", "category_id", "ci_inflation_rate"]),
+        "p_real_cpi": to_rows(results["real_cpi"], ["country_id", "criterion_id", "real_cpi_inflation_rate"]),
+    }).execute()
+
+
+def fetch_weights(client: "Client") -> Columns:
+    """Weights of the active criteria."""
+    active = client.table("cpi_criteria").select("criterion_id").eq("is_active_criterion", True).execute().data or []
+    active_ids = {row["criterion_id"] for row in active}
+    rows = [
+        row for row in client.table("cpi_weights").select("criterion_id,category_id,weight_value").execute().data or []
+        if row["criterion_id"] in active_ids and row["category_id"] is not None
+    ]
+    return {
+        "criterion_id": np.array([row["criterion_id"] for row in rows], dtype=np.int64),
+        "category_id": np.array([row["category_id"] for row in rows], dtype=np.int64),
+        "weight_value": np.array([float(row["weight_value"]) for row in rows], dtype=np.float64),
+    }
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    today = date.today()
+    parser = argparse.ArgumentParser(description="Compute CPI inflation tables from the local mirror")
+    parser.add_argument("--year", type=int, default=today.year)
+    parser.add_argument("--month", type=int, default=today.month)
+    parser.add_argument("--no-sync", action="store_true", help="Use the local mirror as is")
+    parser.add_argument("--dry-run", action="store_true", help="Compute and log, do not write back")
+    args = parser.parse_args()
+
+    url, key = os.environ.get("SUPABASE_URL"), os.environ.get("SUPABASE_KEY")
+    if not url or not key:
+        logger.error("Supabase credentials missing.")
+        return
+    from supabase import create_client
+    client = create_client(url, key)
+
+    mirror = LocalMirror()
+    if not args.no_sync:
+        mirror.sync(client)
+
+    results = compute_month(mirror.prices.columns(), mirror.products.columns(), fetch_weights(client),
+                            args.year, args.month)
+    logger.info(
+        f"[CPI] {args.year}-{args.month:02d}: {len(results['cells']['product_id'])} cells, "
+        f"{len(results['category_location']['category_id'])} category×location, "
+        f"{len(results['category']['category_id'])} categories, {len(results['real_cpi']['criterion_id'])} real CPI rows."
+    )
+    if not args.dry_run:
+        write_results(client, results, args.year, args.month)
+        logger.info("[CPI] Results written.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+"""
+Incremental maintenance of the month's inflation tables.
+
+Instead of recomputing every cell after each scraper run, only the prices
+persisted since the last `price_id` watermark are consumed:
+
+1. The (product, location, establishment) cells they touch, as the month's
+   price or as the price a year earlier, are recomputed from their prices in
+   the local mirror and merged into the month's cell state kept in
+   `.cache/cpi/`.
+2. Category aggregates are recomputed from the merged cells (a few thousand
+   rows, not the price table) and only the groups whose rate changed are
+   rewritten.
+3. In the database, the affected cells' old rows (found by their
+   recent_price_id) are replaced, the changed category rows are replaced and
+   the month's real CPI is rewritten, all in one transaction (the
+   `apply_month_inflation_increment` RPC, scripts/add_month_inflation_rpc.sql).
+
+Edits to existing prices (e.g. `is_valid` toggled) are not above the
+watermark; `--verify` recomputes the month from scratch and reports cells and
+categories that differ from the maintained state, and `--rebuild` replaces
+the state and the month's tables with a full computation.
+
+Usage: python cpi_incremental.py [--year 2026 --month 10] [--verify | --rebuild] [--dry-run]
+"""
+import os
+import logging
+import argparse
+from datetime import date
+from typing import TYPE_CHECKING, Optional, Dict, Any, List, Tuple
+
+import numpy as np
+from dotenv import load_dotenv
+
+from local_mirror import LocalMirror
+from cpi_engine import (
+    Columns, compute_cells, compute_month, aggregate_categories, weighted_real_cpi, month_bounds,
+    to_rows, write_results, fetch_weights, CELL_COLUMNS
+)
+
+if TYPE_CHECKING:
+    from supabase import Client
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+CPI_STATE_DIR = os.path.join(os.environ.get("SCRAPER_CACHE_DIR", ".cache"), "cpi")
+# Relative tolerance when comparing maintained and rebuilt rates
+VERIFY_TOLERANCE = 1e-9
+
+
+def cell_keys(product_ids: np.ndarray, location_ids: np.ndarray, establishment_ids: np.ndarray) -> np.ndarray:
+    """
+    One int64 per (product, location, establishment).
+    Assumes product ids below 2^31 and location/establishment ids below 2^16 (-1 for missing).
+    """
+    return (
+        (np.asarray(product_ids, dtype=np.int64) << 32)
+        | ((np.asarray(location_ids, dtype=np.int64) & 0xFFFF) << 16)
+        | (np.asarray(establishment_ids, dtype=np.int64) & 0xFFFF)
+    )
+
+
+def member_of(values: np.ndarray, sorted_keys: np.ndarray) -> np.ndarray:
+    """np.isin for a small sorted key set: binary search instead of sorting `values`."""
+    if not len(sorted_keys):
+        return np.zeros(len(values), dtype=bool)
+    positions = np.clip(np.searchsorted(sorted_keys, values), 0, len(sorted_keys) - 1)
+    return sorted_keys[positions] == values
+
+
+def month_window(prices: Columns, year: int, month: int) -> np.ndarray:
+    """Rows dated in the month or the same month a year earlier (the only rows a month's cells use)."""
+    start, end = month_bounds(year, month)
+    hist_start, hist_end = month_bounds(year - 1, month)
+    dates = np.asarray(prices["date"])
+    return np.flatnonzero(((dates >= start) & (dates < end)) | ((dates >= hist_start) & (dates < hist_end)))
+
+
+def take(columns: Columns, index: np.ndarray) -> Columns:
+    return {name: np.asarray(array)[index] for name, array in columns.items()}
+
+
+def concat(a: Columns, b: Columns) -> Columns:
+    return {name: np.concatenate([a[name], b[name]]) for name in a}
+
+
+class MonthState:
+    """The maintained cells and category aggregates of one month, with the price_id watermark."""
+
+    def __init__(self, year: int, month: int, state_dir: str = CPI_STATE_DIR):
+        self.year = year
+        self.month = month
+        self.path = os.path.join(state_dir, f"{year:04d}-{month:02d}.npz")
+        self.watermark: Optional[int] = None
+        self.cells: Optional[Columns] = None
+        self.category_location: Optional[Columns] = None
+        self.category: Optional[Columns] = None
+
+    def load(self) -> bool:
+        try:
+            with np.load(self.path) as data:
+                self.watermark = int(data["watermark"])
+                groups = {"cells": {}, "category_location": {}, "category": {}}
+                for name in data.files:
+                    if "." in name:
+                        group, column = name.split(".", 1)
+                        groups[group][column] = data[name]
+        except (OSError, KeyError, ValueError):
+            return False
+        self.cells, self.category_location, self.category = groups["cells"], groups["category_location"], groups["category"]
+        return True
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        arrays = {"watermark": np.int64(self.watermark or 0)}
+        for group in ("cells", "category_location", "category"):
+            for column, array in getattr(self, group).items():
+                arrays[f"{group}.{column}"] = array
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_path, self.path)
+
+
+def affected_cell_keys(window: Columns, watermark: int) -> np.ndarray:
+    """Sorted keys of the cells touched by prices above the watermark."""
+    rows = np.flatnonzero(window["price_id"] > watermark)
+    return np.unique(cell_keys(*(window[k][rows] for k in ("product_id", "location_id", "establishment_id"))))
+
+
+def apply_increment(state: MonthState, prices: Columns, products: Columns) -> Dict[str, Any]:
+    """
+    Recomputes the cells touched since the watermark and merges them into the state.
+    Returns the changes to write: removed/added cells and changed category groups.
+    """
+    window = take(prices, month_window(prices, state.year, state.month))
+    keys = affected_cell_keys(window, state.watermark)
+    watermark = int(np.max(prices["price_id"])) if len(prices["price_id"]) else state.watermark
+
+    window_keys = cell_keys(*(window[k] for k in ("product_id", "location_id", "establishment_id")))
+    subset = take(window, np.flatnonzero(member_of(window_keys, keys)))
+    added = compute_cells(subset, products, state.year, state.month)
+
+    old_keys = cell_keys(state.cells["product_id"], state.cells["location_id"], state.cells["establishment_id"])
+    replaced = member_of(old_keys, keys)
+    removed = take(state.cells, np.flatnonzero(replaced))
+    cells = concat(take(state.cells, np.flatnonzero(~replaced)), added)
+
+    category_location, category = aggregate_categories(cells)
+    changes = {
+        "removed": removed,
+        "added": added,
+        "category_location": changed_groups(state.category_location, category_location,
+                                            ["country_id", "category_id", "location_id"], "cli_inflation_rate"),
+        "category": changed_groups(state.category, category, ["country_id", "category_id"], "ci_inflation_rate"),
+    }
+    state.cells, state.category_location, state.category = cells, category_location, category
+    state.watermark = watermark
+    return changes
+
+
+def group_index(columns: Columns, keys: List[str]) -> Dict[Tuple, int]:
+    return {tuple(values): i for i, values in enumerate(zip(*(columns[k].tolist() for k in keys)))}
+
+
+def changed_groups(old: Columns, new: Columns, keys: List[str], rate: str) -> Dict[str, Any]:
+    """Groups whose rate changed or that appeared ('upsert') and groups that disappeared ('deleted')."""
+    old_index, new_index = group_index(old, keys), group_index(new, keys)
+    old_pos = np.array([old_index.get(group, -1) for group in new_index], dtype=np.int64)
+    new_pos = np.array(list(new_index.values()), dtype=np.int64)
+    old_rates = np.where(old_pos >= 0, old[rate][old_pos] if len(old_pos) else old_pos, np.nan)
+    same = (old_pos >= 0) & np.isclose(old_rates, new[rate][new_pos], rtol=VERIFY_TOLERANCE, atol=0, equal_nan=True)
+    return {
+        "upsert": take(new, new_pos[~same]),
+        "deleted": [group for group in old_index if group not in new_index],
+        "keys": keys,
+    }
+
+
+def verify(state: MonthState, prices: Columns, products: Columns) -> Dict[str, int]:
+    """Compares the maintained state with a full recomputation; returns mismatch counts."""
+    full = compute_cells(prices, products, state.year, state.month)
+    full_keys = cell_keys(full["product_id"], full["location_id"], full["establishment_id"])
+    state_keys = cell_keys(state.cells["product_id"], state.cells["location_id"], state.cells["establishment_id"])
+    missing = np.setdiff1d(full_keys, state_keys).size
+    extra = np.setdiff1d(state_keys, full_keys).size
+    _, full_idx, state_idx = np.intersect1d(full_keys, state_keys, assume_unique=True, return_indices=True)
+    stale = int(np.count_nonzero(
+        (full["recent_price_id"][full_idx] != state.cells["recent_price_id"][state_idx])
+        | ~np.isclose(full["aple_inflation_rate"][full_idx], state.cells["aple_inflation_rate"][state_idx],
+                      rtol=VERIFY_TOLERANCE, atol=0)
+    ))
+    _, category = aggregate_categories(full)
+    diff = changed_groups(state.category, category, ["country_id", "category_id"], "ci_inflation_rate")
+    return {
+        "missing_cells": int(missing),
+        "extra_cells": int(extra),
+        "stale_cells": stale,
+        "category_mismatches": len(diff["upsert"]["category_id"]) + len(diff["deleted"]),
+    }
+
+
+def write_increment(client: "Client", state: MonthState, changes: Dict[str, Any], weights: Columns):
+    """
+    Applies `changes` in one `apply_month_inflation_increment` call
+    (scripts/add_month_inflation_rpc.sql), so a failed write keeps the
+    previous rows of the month.
+    """
+    def groups(diff: Dict[str, Any], rate: str) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        deleted = [{key: None if value == -1 else value for key, value in zip(diff["keys"], group)}
+                   for group in diff["deleted"]]
+        return to_rows(diff["upsert"], diff["keys"] + [rate]), deleted
+
+    category_location, category_location_deleted = groups(changes["category_location"], "cli_inflation_rate")
+    category, category_deleted = groups(changes["category"], "ci_inflation_rate")
+    real_cpi = weighted_real_cpi(state.category, weights)
+    client.rpc("apply_month_inflation_increment", {
+        "p_year": state.year,
+        "p_month": state.month,
+        "p_removed_price_ids": changes["removed"]["recent_price_id"].tolist(),
+        "p_added_cells": to_rows(changes["added"], CELL_COLUMNS),
+        "p_category_location": category_location,
+        "p_category_location_deleted": category_location_deleted,
+        "p_category": category,
+        "p_category_deleted": category_deleted,
+        "p_real_cpi": to_rows(real_cpi, ["country_id", "criterion_id", "real_cpi_inflation_rate"]),
+    }).execute()
+
+
+def rebuild(state: MonthState, prices: Columns, products: Columns, weights: Columns) -> Dict[str, Columns]:
+    results = compute_month(prices, products, weights, state.year, state.month)
+    state.cells, state.category_location, state.category = (
+        results["cells"], results["category_location"], results["category"]
+    )
+    state.watermark = int(np.max(prices["price_id"])) if len(prices["price_id"]) else 0
+    return results
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    today = date.today()
+    parser = argparse.ArgumentParser(description="Incrementally maintain the month's CPI inflation tables")
+    parser.add_argument("--year", type=int, default=today.year)
+    parser.add_argument("--month", type=int, default=today.month)
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--verify", action="store_true", help="Compare the maintained state with a full recomputation")
+    mode.add_argument("--rebuild", action="store_true", help="Recompute the month from scratch and replace its tables")
+    parser.add_argument("--dry-run", action="store_true", help="Do not write to the database")
+    args = parser.parse_args()
+
+    url, key = os.environ.get("SUPABASE_URL"), os.environ.get("SUPABASE_KEY")
+    if not url or not key:
+        logger.error("Supabase credentials missing.")
+        return
+    from supabase import create_client
+    client = create_client(url, key)
+
+    mirror = LocalMirror()
+    mirror.sync(client)
+    prices, products = mirror.prices.columns(), mirror.products.columns()
+
+    state = MonthState(args.year, args.month)
+    has_state = state.load()
+
+    if args.verify:
+        if not has_state:
+            logger.error("[CPI] No maintained state for this month to verify.")
+            return
+        mismatches = verify(state, prices, products)
+        level = logging.WARNING if any(mismatches.values()) else logging.INFO
+        logger.log(level, f"[CPI] Verify {args.year}-{args.month:02d}: {mismatches}")
+        return
+
+    weights = fetch_weights(client)
+    if args.rebuild or not has_state:
+        results = rebuild(state, prices, products, weights)
+        logger.info(f"[CPI] Rebuilt {args.year}-{args.month:02d}: {len(state.cells['product_id'])} cells.")
+        if not args.dry_run:
+            write_results(client, results, args.year, args.month)
+    else:
+        previous = state.watermark
+        changes = apply_increment(state, prices, products)
+        logger.info(
+            f"[CPI] Prices {previous}..{state.watermark}: {len(changes['added']['product_id'])} cells recomputed "
+            f"({len(changes['removed']['product_id'])} replaced), "
+            f"{len(changes['category_location']['upsert']['category_id'])} category×location and "
+            f"{len(changes['category']['upsert']['category_id'])} category rates changed."
+        )
+        if not args.dry_run:
+            write_increment(client, state, changes, weights)
+
+    if not args.dry_run:
+        state.save()
+
+
+if __name__ == "__main__":
+    main()
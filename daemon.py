@@ -0,0 +1,211 @@
+import os
+import time
+import signal
+import asyncio
+import itertools
+import logging
+from typing import Optional, Dict, Any, List, Set, Tuple, Callable, Awaitable
+
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+DAEMON_HOST = os.environ.get("SCRAPER_DAEMON_HOST", "127.0.0.1")
+DAEMON_PORT = int(os.environ.get("SCRAPER_DAEMON_PORT", "8765"))
+# Seconds between polls of `get_products_to_scrape` for due work.
+POLL_INTERVAL = int(os.environ.get("SCRAPER_DAEMON_POLL", "300"))
+# Products per poll; polls page through the catalog with a keyset cursor and wrap at the end.
+POLL_BATCH = 50
+# A pair that found no price is not queued again before this many seconds.
+RETRY_BACKOFF = 3600
+ON_DEMAND_TIMEOUT = 300
+
+PRIORITY_ON_DEMAND = 0
+PRIORITY_DUE = 10
+
+ScrapeFunc = Callable[[Dict[str, Any], Dict[str, Any]], Awaitable[Dict[str, Any]]]
+
+
+class ScraperDaemon:
+    """
+    Long-lived scraper: a priority work queue fed by a due-work poller and a
+    small local HTTP endpoint for on-demand product requests.
+
+    The daemon owns no scraping logic itself; `scrape(product, establishment)`
+    is `main.scrape_pair` bound to warm browser and HTTP pools, so every item
+    reuses the same Chromium, HTTP clients and proxy rotator.
+
+    Endpoints:
+        GET/POST /scrape/{product_id}  scrape one product now, returns the results
+        GET      /health               queue depth and counters
+    """
+
+    def __init__(self, establishments: List[Dict[str, Any]], scrape: ScrapeFunc,
+                 fetch_due: Callable[[int, int], Awaitable[List[Dict[str, Any]]]],
+                 fetch_product: Callable[[int], Awaitable[List[Dict[str, Any]]]],
+                 workers: int = 2, port: int = DAEMON_PORT, host: str = DAEMON_HOST,
+                 poll_interval: int = POLL_INTERVAL):
+        self.establishments = establishments
+        self.scrape = scrape
+        self.fetch_due = fetch_due
+        self.fetch_product = fetch_product
+        self.workers = max(1, workers)
+        self.port = port
+        self.host = host
+        self.poll_interval = poll_interval
+
+        self.queue: asyncio.PriorityQueue = asyncio.PriorityQueue()
+        self._seq = itertools.count()
+        self._queued: Set[Tuple[int, int]] = set()
+        self._retry_after: Dict[Tuple[int, int], float] = {}
+        self._stop = asyncio.Event()
+        # Last product ID of the previous due-work page (0: start of the catalog)
+        self._cursor = 0
+        self.stats = {"processed": 0, "persisted": 0, "not_found": 0, "unreachable": 0, "errors": 0, "on_demand": 0}
+
+    # --- Queue ---
+
+    def enqueue(self, product: Dict[str, Any], establishment: Dict[str, Any], priority: int = PRIORITY_DUE,
+                future: Optional[asyncio.Future] = None) -> bool:
+        """
+        Queues a pair. Due work is deduplicated and respects the retry back-off;
+        on-demand work (with a future) is always queued.
+        """
+        key = (product['product_id'], establishment['establishment_id'])
+        if future is None:
+            if key in self._queued or self._retry_after.get(key, 0) > time.monotonic():
+                return False
+            self._queued.add(key)
+        self.queue.put_nowait((priority, next(self._seq), product, establishment, future))
+        return True
+
+    async def _worker(self, worker_id: int):
+        while True:
+            priority, _, product, establishment, future = await self.queue.get()
+            key = (product['product_id'], establishment['establishment_id'])
+            try:
+                result = await self.scrape(product, establishment)
+            except Exception as e:
+                logger.error(f"[Daemon] Worker {worker_id} failed on {key}: {e}")
+                result = {"establishment_id": key[1], "establishment_name": establishment['establishment_name'],
+                          "status": "error", "price": None}
+            finally:
+                self.queue.task_done()
+                if future is None:
+                    self._queued.discard(key)
+
+            self.stats["processed"] += 1
+            if result["status"] == "persisted":
+                self.stats["persisted"] += 1
+            elif result["status"] == "not_found":
+                self.stats["not_found"] += 1
+            elif result["status"] == "unreachable":
+                self.stats["unreachable"] += 1
+            elif result["status"] == "error":
+                self.stats["errors"] += 1
+            if result["status"] in ("not_found", "not_carried", "unreachable", "error", "not_persisted"):
+                self._retry_after[key] = time.monotonic() + RETRY_BACKOFF
+
+            if future is not None and not future.done():
+                future.set_result(result)
+
+    async def poll_once(self) -> int:
+        """
+        Queues the due pairs of the next page of the catalog. Pages follow the
+        cursor, so products that keep failing do not hide the rest of the
+        catalog; a short page wraps the cursor to the start.
+        """
+        products = await self.fetch_due(POLL_BATCH, self._cursor)
+        self._cursor = products[-1]['product_id'] if len(products) >= POLL_BATCH else 0
+        queued = sum(
+            self.enqueue(product, establishment)
+            for product in products
+            for establishment in self.establishments
+        )
+        if queued:
+            logger.info(f"[Daemon] Queued {queued} due pairs ({self.queue.qsize()} in queue).")
+        return queued
+
+    async def _poll_due(self):
+        while not self._stop.is_set():
+            try:
+                await self.poll_once()
+            except Exception as e:
+                logger.error(f"[Daemon] Failed to poll due work: {e}")
+            try:
+                await asyncio.wait_for(self._stop.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    # --- HTTP endpoint ---
+
+    async def handle_scrape(self, request: web.Request) -> web.Response:
+        try:
+            product_id = int(request.match_info["product_id"])
+        except ValueError:
+            return web.json_response({"error": "product_id must be an integer"}, status=400)
+
+        products = await self.fetch_product(product_id)
+        if not products:
+            return web.json_response({"error": f"Product {product_id} not found"}, status=404)
+        product = products[0]
+        self.stats["on_demand"] += 1
+
+        loop = asyncio.get_running_loop()
+        started = time.monotonic()
+        futures = []
+        for establishment in self.establishments:
+            future = loop.create_future()
+            self.enqueue(product, establishment, PRIORITY_ON_DEMAND, future)
+            futures.append(future)
+
+        done, pending = await asyncio.wait(futures, timeout=ON_DEMAND_TIMEOUT)
+        results = [f.result() for f in futures if f in done]
+        return web.json_response({
+            "product_id": product_id,
+            "product_name": product.get("product_name"),
+            "elapsed_s": round(time.monotonic() - started, 2),
+            "complete": not pending,
+            "results": results
+        })
+
+    async def handle_health(self, request: web.Request) -> web.Response:
+        return web.json_response({"queue": self.queue.qsize(), "in_flight_due": len(self._queued), **self.stats})
+
+    def build_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_route("GET", "/scrape/{product_id}", self.handle_scrape)
+        app.router.add_route("POST", "/scrape/{product_id}", self.handle_scrape)
+        app.router.add_get("/health", self.handle_health)
+        return app
+
+    # --- Lifecycle ---
+
+    def stop(self):
+        self._stop.set()
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, self.stop)
+            except (NotImplementedError, RuntimeError):
+                # Not supported on Windows event loops; Ctrl+C still raises KeyboardInterrupt.
+                pass
+
+        runner = web.AppRunner(self.build_app())
+        await runner.setup()
+        site = web.TCPSite(runner, self.host, self.port)
+        await site.start()
+        logger.info(f"[Daemon] Listening on http://{self.host}:{self.port} with {self.workers} workers.")
+
+        tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        tasks.append(asyncio.create_task(self._poll_due()))
+        try:
+            await self._stop.wait()
+        finally:
+            logger.info("[Daemon] Shutting down...")
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await runner.cleanup()
@@ -0,0 +1,95 @@
+import os
+import time
+import logging
+from typing import TYPE_CHECKING, Optional, Dict, Any
+
+if TYPE_CHECKING:
+    import httpx
+    from supabase import AsyncClient
+
+logger = logging.getLogger(__name__)
+
+# Concurrent PostgREST connections shared by the scraper and the proxy rotator.
+DB_MAX_CONNECTIONS = int(os.environ.get("DB_MAX_CONNECTIONS", "10"))
+DB_TIMEOUT_S = float(os.environ.get("DB_TIMEOUT_S", "30"))
+
+
+class CallStats:
+    """Count and latency of one named query or RPC."""
+
+    __slots__ = ("calls", "errors", "total_s", "max_s")
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.total_s = 0.0
+        self.max_s = 0.0
+
+    def observe(self, elapsed_s: float, ok: bool = True):
+        self.calls += 1
+        self.errors += 0 if ok else 1
+        self.total_s += elapsed_s
+        self.max_s = max(self.max_s, elapsed_s)
+
+    @property
+    def mean_ms(self) -> float:
+        return self.total_s / self.calls * 1000 if self.calls else 0.0
+
+
+class Database:
+    """
+    Async Supabase access shared by the scraper and the proxy rotator.
+
+    Wraps the async supabase client, whose PostgREST requests all go through
+    one pooled `httpx.AsyncClient`, so database round-trips no longer block
+    the event loop. Build queries with `table()`/`rpc()` as with the sync
+    client and run them with `await db.execute(name, query)`; every call is
+    timed under its name and summarised by `report()`.
+    """
+
+    def __init__(self, client: "AsyncClient", http: Optional["httpx.AsyncClient"] = None):
+        self.client = client
+        self._http = http
+        self.stats: Dict[str, CallStats] = {}
+
+    @classmethod
+    async def connect(cls, url: str, key: str, max_connections: int = DB_MAX_CONNECTIONS,
+                      timeout: float = DB_TIMEOUT_S) -> "Database":
+        import httpx
+        from supabase import acreate_client, AsyncClientOptions
+
+        http = httpx.AsyncClient(
+            timeout=timeout,
+            follow_redirects=True,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        )
+        client = await acreate_client(url, key, options=AsyncClientOptions(httpx_client=http))
+        return cls(client, http)
+
+    def table(self, name: str):
+        return self.client.table(name)
+
+    def rpc(self, function: str, params: Dict[str, Any]):
+        return self.client.rpc(function, params)
+
+    async def execute(self, name: str, query) -> Any:
+        """Runs a query built with `table()`/`rpc()` and records its latency under `name`."""
+        started = time.perf_counter()
+        ok = False
+        try:
+            response = await query.execute()
+            ok = True
+            return response
+        finally:
+            self.stats.setdefault(name, CallStats()).observe(time.perf_counter() - started, ok)
+
+    def report(self):
+        for name, stats in sorted(self.stats.items(), key=lambda item: -item[1].total_s):
+            logger.info(
+                f"[DB] {name}: {stats.calls} calls, {stats.errors} errors, "
+                f"mean {stats.mean_ms:.0f}ms, max {stats.max_s * 1000:.0f}ms, total {stats.total_s:.1f}s"
+            )
+
+    async def close(self):
+        if self._http:
+            await self._http.aclose()
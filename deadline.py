@@ -0,0 +1,65 @@
+import os
+import time
+from typing import Optional
+
+# Seconds kept free before the deadline for flushing the journal, stats and pending prices.
+DEADLINE_RESERVE_S = float(os.environ.get("DEADLINE_RESERVE_S", "60"))
+# Shortest timeout handed to a request, however close the deadline is.
+MIN_TIMEOUT_S = 2.0
+
+
+class DeadlineExceeded(Exception):
+    """Raised when an attempt would start after the run's working time is over."""
+
+
+class Deadline:
+    """
+    Run-wide time limit shared by every scraper attempt.
+
+    `remaining()` is the working time left, i.e. up to the deadline minus the
+    reserve kept for flushing state on exit. Attempts check it before starting
+    and cap their request timeouts to it, so work winds down as the deadline
+    approaches instead of being killed mid-request. Without a deadline every
+    check passes and timeouts keep their defaults.
+    """
+
+    def __init__(self, seconds: Optional[float] = None, reserve_s: float = DEADLINE_RESERVE_S):
+        self.reserve_s = reserve_s
+        self.ends_at: Optional[float] = None
+        self.set(seconds)
+
+    def set(self, seconds: Optional[float]):
+        self.ends_at = time.monotonic() + seconds if seconds else None
+
+    def remaining(self) -> Optional[float]:
+        if self.ends_at is None:
+            return None
+        return self.ends_at - self.reserve_s - time.monotonic()
+
+    def hard_remaining(self) -> Optional[float]:
+        """Time left until the deadline itself, reserve included."""
+        if self.ends_at is None:
+            return None
+        return self.ends_at - time.monotonic()
+
+    def expired(self) -> bool:
+        remaining = self.remaining()
+        return remaining is not None and remaining <= 0
+
+    def can_fit(self, cost_s: float) -> bool:
+        remaining = self.remaining()
+        return remaining is None or cost_s <= remaining
+
+    def check(self, cost_s: float = 0.0):
+        """Raises DeadlineExceeded unless `cost_s` seconds of work still fit."""
+        if not self.can_fit(max(cost_s, 0.0)) or self.expired():
+            raise DeadlineExceeded(f"{self.remaining():.0f}s left, attempt needs {cost_s:.0f}s")
+
+    def timeout_s(self, default_s: float) -> float:
+        remaining = self.remaining()
+        if remaining is None:
+            return default_s
+        return max(MIN_TIMEOUT_S, min(default_s, remaining))
+
+    def timeout_ms(self, default_ms: float) -> float:
+        return self.timeout_s(default_ms / 1000) * 1000
@@ -12,7 +12,7 @@ async def main():
     
     # 1. Get a proxy
     logger.info("Requesting best MX proxy...")
-    proxy = rotator.get_proxy()
+    proxy = await rotator.get_proxy()
     
     if not proxy:
         logger.error("No proxy retrieved. Run harvester first!")
@@ -26,10 +26,10 @@ async def main():
         async with httpx.AsyncClient(proxies=proxy['url'], timeout=10) as client:
             resp = await client.get("http://httpbin.org/ip")
             logger.info(f"HTTPX Result: {resp.status_code} - {resp.json()}")
-            rotator.report_success(proxy['proxy_id'])
+            await rotator.report_success(proxy['proxy_id'])
     except Exception as e:
         logger.error(f"HTTPX Failed: {e}")
-        rotator.report_failure(proxy['proxy_id'])
+        await rotator.report_failure(proxy['proxy_id'])
 
     # 3. Example with Playwright
     logger.info("Testing with Playwright...")
@@ -40,10 +40,10 @@ async def main():
             await page.goto("http://httpbin.org/ip", timeout=10000)
             content = await page.content()
             logger.info(f"Playwright Result: {content[:100]}...")
-            rotator.report_success(proxy['proxy_id'])
+            await rotator.report_success(proxy['proxy_id'])
         except Exception as e:
             logger.error(f"Playwright Failed: {e}")
-            rotator.report_failure(proxy['proxy_id'])
+            await rotator.report_failure(proxy['proxy_id'])
         finally:
             await browser.close()
 
@@ -0,0 +1,61 @@
+import logging
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    import httpx
+    from capture import CaptureArchive
+
+logger = logging.getLogger(__name__)
+
+# Free proxies come and go; keep only the most recently used clients open.
+MAX_CLIENTS = 32
+
+
+class HTTPClientPool:
+    """
+    Reuses one `httpx.AsyncClient` per egress (direct or proxy URL).
+
+    httpx binds the proxy at client construction, so clients are keyed by
+    proxy URL. Reusing them keeps TCP/TLS connections to the retailers warm
+    across products instead of reconnecting on every attempt.
+    """
+
+    def __init__(self, timeout: float = 15, max_clients: int = MAX_CLIENTS):
+        self.timeout = timeout
+        self.max_clients = max_clients
+        self._clients: "OrderedDict[Optional[str], httpx.AsyncClient]" = OrderedDict()
+        # Set by --record/--replay: clients then go through the archive's transports.
+        self.capture: Optional["CaptureArchive"] = None
+
+    async def get(self, proxy_url: Optional[str] = None) -> "httpx.AsyncClient":
+        client = self._clients.get(proxy_url)
+        if client and not client.is_closed:
+            self._clients.move_to_end(proxy_url)
+            return client
+
+        import httpx
+        if self.capture and self.capture.mode:
+            client = httpx.AsyncClient(transport=self.capture.transport(proxy_url), timeout=self.timeout)
+        else:
+            client = httpx.AsyncClient(proxy=proxy_url, timeout=self.timeout, verify=False)
+        self._clients[proxy_url] = client
+        while len(self._clients) > self.max_clients:
+            _, evicted = self._clients.popitem(last=False)
+            await evicted.aclose()
+        return client
+
+    async def discard(self, proxy_url: Optional[str]):
+        """Drops the client for an egress that just failed (e.g. a dead proxy)."""
+        client = self._clients.pop(proxy_url, None)
+        if client:
+            await client.aclose()
+
+    async def close(self):
+        clients = list(self._clients.values())
+        self._clients.clear()
+        for client in clients:
+            try:
+                await client.aclose()
+            except Exception as e:
+                logger.warning(f"Failed to close HTTP client: {e}")
@@ -0,0 +1,227 @@
+"""
+Local columnar mirror of cpi_prices, cpi_products and cpi_establishments.
+
+Each table is stored as one raw binary file per column plus a JSON manifest
+(dtypes, row count, watermark) and read back as read-only `numpy.memmap`
+arrays, so analytics scans the data in place without copying it or paging
+PostgREST. `cpi_prices` is synced incrementally: only rows above the stored
+`price_id` watermark are fetched and appended. Products and establishments
+are small and mutable, so they are refetched in full on every sync.
+
+Usage: python local_mirror.py [--full] [--dir .cache/mirror]
+"""
+import os
+import json
+import time
+import logging
+import argparse
+from typing import TYPE_CHECKING, Optional, Dict, Any, List
+
+import numpy as np
+from dotenv import load_dotenv
+
+if TYPE_CHECKING:
+    from supabase import Client
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+MIRROR_DIR = os.path.join(os.environ.get("SCRAPER_CACHE_DIR", ".cache"), "mirror")
+# PostgREST caps responses at 1000 rows by default.
+SYNC_PAGE_SIZE = 1000
+MISSING_ID = -1
+
+PRICE_COLUMNS = {
+    "price_id": "<i8",
+    "product_id": "<i8",
+    "location_id": "<i8",
+    "establishment_id": "<i8",
+    "price_value": "<f8",
+    "date": "<M8[D]",
+    "is_valid": "|b1",
+}
+PRODUCT_COLUMNS = {
+    "product_id": "<i8",
+    "country_id": "<i8",
+    "category_id": "<i8",
+    "is_active_product": "|b1",
+    "product_name": "U",
+    "ean_code": "U",
+}
+ESTABLISHMENT_COLUMNS = {
+    "establishment_id": "<i8",
+    "country_id": "<i8",
+    "establishment_name": "U",
+}
+
+
+def rows_to_columns(rows: List[Dict[str, Any]], schema: Dict[str, str]) -> Dict[str, np.ndarray]:
+    """
+    Converts PostgREST rows to one array per column.
+    Missing ids become -1 and missing text "". Text columns ("U") get the width of their longest value.
+    """
+    columns = {}
+    for name, dtype in schema.items():
+        values = [row.get(name) for row in rows]
+        if dtype == "U":
+            columns[name] = np.array(["" if v is None else str(v) for v in values], dtype="U")
+        elif dtype.startswith("<i"):
+            columns[name] = np.array([MISSING_ID if v is None else int(v) for v in values], dtype=dtype)
+        elif dtype.startswith("|b"):
+            columns[name] = np.array([bool(v) for v in values], dtype=dtype)
+        elif dtype.startswith("<M8"):
+            columns[name] = np.array(values, dtype=dtype)
+        else:
+            columns[name] = np.array([np.nan if v is None else float(v) for v in values], dtype=dtype)
+    return columns
+
+
+class ColumnTable:
+    """
+    A table stored as raw column files plus a manifest.
+
+    Appends write the new rows to the end of every column file and then
+    atomically replace the manifest, so a crash mid-append leaves at most
+    trailing bytes that the manifest does not count; they are truncated on
+    the next write.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.manifest: Dict[str, Any] = {"rows": 0, "watermark": None, "dtypes": {}, "synced_at": None}
+        try:
+            with open(os.path.join(path, "manifest.json"), "r", encoding="utf-8") as f:
+                self.manifest = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            pass
+
+    @property
+    def rows(self) -> int:
+        return self.manifest["rows"]
+
+    @property
+    def watermark(self) -> Optional[int]:
+        return self.manifest["watermark"]
+
+    def _column_path(self, name: str) -> str:
+        return os.path.join(self.path, f"{name}.bin")
+
+    def columns(self) -> Dict[str, np.ndarray]:
+        """Read-only memory-mapped columns; nothing is read until the arrays are used."""
+        result = {}
+        for name, dtype in self.manifest["dtypes"].items():
+            if self.rows:
+                result[name] = np.memmap(self._column_path(name), dtype=np.dtype(dtype), mode="r", shape=(self.rows,))
+            else:
+                result[name] = np.empty(0, dtype=np.dtype(dtype))
+        return result
+
+    def _save_manifest(self):
+        self.manifest["synced_at"] = time.time()
+        tmp_path = os.path.join(self.path, "manifest.json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f)
+        os.replace(tmp_path, os.path.join(self.path, "manifest.json"))
+
+    def append(self, columns: Dict[str, np.ndarray], watermark: Optional[int]):
+        os.makedirs(self.path, exist_ok=True)
+        dtypes = {name: array.dtype.str for name, array in columns.items()}
+        if self.manifest["dtypes"] and dtypes != self.manifest["dtypes"]:
+            raise ValueError(f"Column types changed for {self.path}; run a full sync")
+        for name, array in columns.items():
+            path = self._column_path(name)
+            with open(path, "ab") as f:
+                f.truncate(self.rows * array.dtype.itemsize)
+                array.tofile(f)
+        lengths = {len(array) for array in columns.values()}
+        self.manifest.update(rows=self.rows + (lengths.pop() if lengths else 0), watermark=watermark, dtypes=dtypes)
+        self._save_manifest()
+
+    def replace(self, columns: Dict[str, np.ndarray], watermark: Optional[int] = None):
+        os.makedirs(self.path, exist_ok=True)
+        for name, array in columns.items():
+            tmp_path = f"{self._column_path(name)}.tmp"
+            array.tofile(tmp_path)
+            os.replace(tmp_path, self._column_path(name))
+        lengths = {len(array) for array in columns.values()}
+        self.manifest.update(
+            rows=lengths.pop() if lengths else 0,
+            watermark=watermark,
+            dtypes={name: array.dtype.str for name, array in columns.items()}
+        )
+        self._save_manifest()
+
+
+class LocalMirror:
+    """The mirrored tables under one directory."""
+
+    def __init__(self, root: str = MIRROR_DIR):
+        self.root = root
+        self.prices = ColumnTable(os.path.join(root, "cpi_prices"))
+        self.products = ColumnTable(os.path.join(root, "cpi_products"))
+        self.establishments = ColumnTable(os.path.join(root, "cpi_establishments"))
+
+    def _fetch_pages(self, client: "Client", table: str, key: str, after: Optional[int]):
+        """Yields pages of rows ordered by `key`, starting after `after`."""
+        cursor = after
+        while True:
+            query = client.table(table).select("*")
+            if cursor is not None:
+                query = query.gt(key, cursor)
+            rows = query.order(key).limit(SYNC_PAGE_SIZE).execute().data or []
+            if rows:
+                cursor = rows[-1][key]
+                yield rows
+            if len(rows) < SYNC_PAGE_SIZE:
+                return
+
+    def sync(self, client: "Client", full: bool = False) -> Dict[str, int]:
+        """
+        Brings the mirror up to date. Prices are appended from the price_id
+        watermark (refetched from scratch with `full`, e.g. after rows were edited).
+        Returns the rows fetched per table.
+        """
+        fetched = {}
+
+        if full:
+            self.prices.replace(rows_to_columns([], PRICE_COLUMNS))
+        new_prices = 0
+        for rows in self._fetch_pages(client, "cpi_prices", "price_id", self.prices.watermark):
+            self.prices.append(rows_to_columns(rows, PRICE_COLUMNS), watermark=rows[-1]["price_id"])
+            new_prices += len(rows)
+        fetched["cpi_prices"] = new_prices
+
+        for table, schema, key, target in (
+            ("cpi_products", PRODUCT_COLUMNS, "product_id", self.products),
+            ("cpi_establishments", ESTABLISHMENT_COLUMNS, "establishment_id", self.establishments),
+        ):
+            rows = [row for page in self._fetch_pages(client, table, key, None) for row in page]
+            target.replace(rows_to_columns(rows, schema))
+            fetched[table] = len(rows)
+
+        logger.info(
+            f"[Mirror] Synced {fetched['cpi_prices']} new prices (watermark {self.prices.watermark}, "
+            f"{self.prices.rows} total), {fetched['cpi_products']} products, "
+            f"{fetched['cpi_establishments']} establishments."
+        )
+        return fetched
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Sync the local columnar mirror of the CPI tables")
+    parser.add_argument("--full", action="store_true", help="Refetch all prices instead of syncing from the watermark")
+    parser.add_argument("--dir", default=MIRROR_DIR, help="Mirror directory")
+    args = parser.parse_args()
+
+    url, key = os.environ.get("SUPABASE_URL"), os.environ.get("SUPABASE_KEY")
+    if not url or not key:
+        logger.error("Supabase credentials missing.")
+        return
+    from supabase import create_client
+
+    LocalMirror(args.dir).sync(create_client(url, key), full=args.full)
+
+
+if __name__ == "__main__":
+    main()
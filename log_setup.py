@@ -0,0 +1,104 @@
+import sys
+import time
+import queue
+import atexit
+import logging
+import logging.handlers
+from contextvars import ContextVar
+from typing import Optional, Dict
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+# Marks a repetitive per-attempt line: `logger.info(msg, extra=ATTEMPT)`.
+ATTEMPT = {"sample_key": "attempt"}
+# Per window, the first SAMPLE_BURST lines of a key pass, then one in SAMPLE_EVERY.
+SAMPLE_WINDOW_S = 60.0
+SAMPLE_BURST = 20
+SAMPLE_EVERY = 25
+
+# Attempts made for the pair being scraped in the current task (see scrape_pair).
+pair_attempts: ContextVar[int] = ContextVar("pair_attempts", default=0)
+
+
+def log_attempt(logger: logging.Logger, message: str):
+    """Logs the start of a scraper attempt (sampled) and counts it for the pair summary."""
+    pair_attempts.set(pair_attempts.get() + 1)
+    logger.info(message, extra=ATTEMPT)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Rate-limits records tagged with a `sample_key` (see ATTEMPT).
+    Errors always pass. Suppressed counts are logged once per window.
+    """
+
+    def __init__(self, window_s: float = SAMPLE_WINDOW_S, burst: int = SAMPLE_BURST, every: int = SAMPLE_EVERY):
+        super().__init__()
+        self.window_s = window_s
+        self.burst = burst
+        self.every = every
+        self.window_started = time.monotonic()
+        self.counts: Dict[str, int] = {}
+        self.suppressed: Dict[str, int] = {}
+
+    def flush(self):
+        suppressed, self.suppressed, self.counts = self.suppressed, {}, {}
+        self.window_started = time.monotonic()
+        for key, count in suppressed.items():
+            logging.getLogger(__name__).info(f"[Logging] Suppressed {count} '{key}' lines (sampled 1 in {self.every}).")
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        key = getattr(record, "sample_key", None)
+        if key is None or record.levelno >= logging.ERROR:
+            return True
+        if time.monotonic() - self.window_started >= self.window_s:
+            self.flush()
+        count = self.counts.get(key, 0) + 1
+        self.counts[key] = count
+        if count <= self.burst or count % self.every == 0:
+            return True
+        self.suppressed[key] = self.suppressed.get(key, 0) + 1
+        return False
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_sampler: Optional[SamplingFilter] = None
+
+
+def configure_logging(level: int = logging.INFO, stream=None):
+    """
+    Routes the root logger through a queue: the event loop only enqueues
+    records and a background thread writes them to `stream` (stderr).
+    Safe to call more than once.
+    """
+    global _listener, _sampler
+    if _listener:
+        return
+    records: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    output = logging.StreamHandler(stream or sys.stderr)
+    output.setFormatter(logging.Formatter(LOG_FORMAT))
+
+    _sampler = SamplingFilter()
+    queue_handler = logging.handlers.QueueHandler(records)
+    queue_handler.addFilter(_sampler)
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    _listener = logging.handlers.QueueListener(records, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging():
+    """Logs pending suppression counts and drains the queue."""
+    global _listener, _sampler
+    if _sampler:
+        _sampler.flush()
+        _sampler = None
+    if _listener:
+        _listener.stop()
+        _listener = None
@@ -3,36 +3,77 @@ import asyncio
 import logging
 import argparse
 import json
+import time
 from datetime import datetime
-from typing import Optional, Dict, Any, List, Set
+from typing import TYPE_CHECKING, Optional, Dict, Any, List, Set, Tuple, AsyncIterator
 
-import httpx
-from playwright.async_api import async_playwright, Page, Playwright, TimeoutError as PlaywrightTimeoutError
-from supabase import create_client, Client
-from bs4 import BeautifulSoup
 from dotenv import load_dotenv
 
 from proxy_client import ProxyRotator
+from run_journal import RunJournal, JOURNAL_PATH
+from browser_pool import BrowserPool, BROWSER_CDP_URL
+from http_pool import HTTPClientPool
+from reference_cache import load_reference, save_reference
+from catalog_snapshot import CatalogIndex
+from scheduler import Scheduler, RetailerStats
+from resource_blocking import install_blocking, run_totals as blocking_totals
+from deadline import Deadline, DeadlineExceeded
+from log_setup import configure_logging, pair_attempts, ATTEMPT
+from capture import CaptureArchive, CaptureRotator
+from adapters import RetailerAdapter, HttpAdapter, BrowserAdapter, EgressBlocked, ScrapeResult, VERDICT_NOT_FOUND
+from single_flight import SingleFlight
+from negative_cache import NotFoundCache
+from profiler import RunProfiler, PROFILE_DIR
+from parse_executor import (ParseExecutor, PARSE_WORKERS, SORIANA_NAME_SELECTORS, vtex_price, soriana_price,
+                            lacomer_price, next_data_price, next_data_price_info)
+
+# Heavy dependencies (supabase, playwright, bs4, httpx) are imported where they
+# are first used, so importing this module and starting a run stay cheap.
+if TYPE_CHECKING:
+    from db import Database
 
 # Load environment variables
 load_dotenv()
 
-# Configure Logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
+# Logging is configured in __main__ (queue-based, see log_setup.py)
 logger = logging.getLogger(__name__)
 
 # --- Configuration ---
 SUPABASE_URL = os.environ.get("SUPABASE_URL")
 SUPABASE_KEY = os.environ.get("SUPABASE_KEY")
+# Products fetched per `get_products_to_scrape` page when streaming the worklist
+PRODUCT_PAGE_SIZE = int(os.environ.get("PRODUCT_PAGE_SIZE", "100"))
+# Shortest time a browser attempt needs; attempts are not started with less left before the deadline
+BROWSER_ATTEMPT_MIN_S = 45
+# Products per in-page fetch batch of a Walmart/Bodega page (--browser-batch without a value)
+BROWSER_BATCH_SIZE = int(os.environ.get("BROWSER_BATCH_SIZE", "24"))
+# Concurrent in-page fetch() lookups of one batch
+BROWSER_BATCH_CONCURRENCY = int(os.environ.get("BROWSER_BATCH_CONCURRENCY", "6"))
 
-# Global Proxy Rotator Instance
+# Global Proxy Rotator Instance (shares the Database connected in main())
 rotator = ProxyRotator()
 
+# Shared HTTP clients, one per egress (direct or proxy)
+http_pool = HTTPClientPool()
+# Price extraction from response bodies, off the event loop when large (--parse-workers)
+parse_pool = ParseExecutor()
+# Run-wide deadline (--deadline); unset in daemon and ad-hoc runs
+run_deadline = Deadline()
+
+# Local catalog snapshot of the HTTP retailers (built daily by catalog_snapshot.py)
+catalog = CatalogIndex()
+
+# Retailer traffic archive (--record / --replay)
+capture = CaptureArchive()
+
+# Identical retailer lookups of this run share one request
+flights = SingleFlight()
+
+# Pairs a retailer answered without the product, re-checked with exponential back-off
+not_found = NotFoundCache()
+
 # --- Supabase Client ---
-def get_supabase_client() -> Optional[Client]:
+async def get_supabase_client() -> Optional["Database"]:
     if not SUPABASE_URL or not SUPABASE_KEY:
         logger.error("Supabase credentials missing.")
         return None
@@ -44,30 +85,47 @@ def get_supabase_client() -> Optional[Client]:
     except Exception:
         logger.warning("Could not parse Supabase Project ID.")
 
-    return create_client(SUPABASE_URL, SUPABASE_KEY)
+    from db import Database
+    return await Database.connect(SUPABASE_URL, SUPABASE_KEY)
 
-async def fetch_establishments(client: Client) -> List[Dict[str, Any]]:
+async def fetch_establishments(client: "Database", refresh: bool = False) -> List[Dict[str, Any]]:
     """
-    Fetches all active establishments from the database.
+    Fetches all active establishments, using the on-disk reference cache while it is fresh.
     """
+    cached = None if refresh else load_reference()
+    if cached and all(key in SCRAPER_REGISTRY for key in cached["registry"].values()):
+        establishments = cached["establishments"]
+        logger.info(f"Loaded {len(establishments)} establishments from cache.")
+        return establishments
+
     try:
-        response = client.table("cpi_establishments").select("*").execute()
+        response = await client.execute("fetch_establishments", client.table("cpi_establishments").select("*"))
         establishments = response.data
         logger.info(f"Fetched {len(establishments)} establishments from DB.")
         for est in establishments:
-            logger.info(f"Establishment Found: ID={est.get('establishment_id')}, Name='{est.get('establishment_name')}'")
-        return establishments
+            logger.debug(f"Establishment Found: ID={est.get('establishment_id')}, Name='{est.get('establishment_name')}'")
     except Exception as e:
         logger.error(f"Failed to fetch establishments: {e}")
         return []
 
-async def fetch_products_to_scrape(client: Client, limit: int = 3) -> List[Dict[str, Any]]:
+    registry = {
+        str(est['establishment_id']): est['establishment_name']
+        for est in establishments if est.get('establishment_name') in SCRAPER_REGISTRY
+    }
+    unmatched = [est.get('establishment_name') for est in establishments if str(est.get('establishment_id')) not in registry]
+    if unmatched:
+        logger.warning(f"No scraper implemented for {unmatched}. (Available: {list(SCRAPER_REGISTRY.keys())})")
+    if establishments:
+        save_reference(establishments, registry)
+    return establishments
+
+async def fetch_products_to_scrape(client: "Database", limit: int = 3) -> List[Dict[str, Any]]:
     """
     Fetches a batch of products that need scraping for the current month.
     Uses the RPC 'get_products_to_scrape'.
     """
     try:
-        response = client.rpc("get_products_to_scrape", {"p_limit": limit}).execute()
+        response = await client.execute("get_products_to_scrape", client.rpc("get_products_to_scrape", {"p_limit": limit}))
         products = response.data
         logger.info(f"Fetched {len(products)} products to scrape (Limit: {limit}).")
         return products
@@ -75,37 +133,72 @@ async def fetch_products_to_scrape(client: Client, limit: int = 3) -> List[Dict[
         logger.error(f"Failed to fetch products: {e}")
         return []
 
-async def check_existing_price(client: Client, product_id: int, retailer_id: int) -> bool:
+async def fetch_products_page(client: "Database", limit: int, after_product_id: int = 0) -> List[Dict[str, Any]]:
+    """One keyset page of 'get_products_to_scrape': up to `limit` products with an ID above `after_product_id`."""
+    response = await client.execute("get_products_to_scrape_page", client.rpc("get_products_to_scrape", {
+        "p_limit": limit,
+        "p_after_product_id": after_product_id
+    }))
+    return response.data or []
+
+async def iter_products_to_scrape(client: "Database", page_size: int = PRODUCT_PAGE_SIZE,
+                                  after_product_id: Optional[int] = None) -> AsyncIterator[Dict[str, Any]]:
     """
-    Checks if a price exists for the given product and retailer in the current month.
+    Streams the products that need scraping, one keyset page at a time.
+    Uses the RPC 'get_products_to_scrape' with 'p_after_product_id' as the cursor,
+    so scraping starts after the first page and memory stays bounded by the page size.
+    """
+    cursor = after_product_id or 0
+    total = 0
+    while True:
+        try:
+            page = await fetch_products_page(client, page_size, cursor)
+        except Exception as e:
+            logger.error(f"Failed to fetch products after ID {cursor}: {e}")
+            return
+
+        total += len(page)
+        logger.info(f"Fetched page of {len(page)} products to scrape (after ID {cursor}, {total} so far).")
+        for product in page:
+            yield product
+
+        if len(page) < page_size:
+            return
+        cursor = page[-1]['product_id']
+
+async def check_existing_price(client: "Database", product_id: int, retailer_id: int) -> Optional[Dict[str, Any]]:
+    """
+    Returns the latest price ('price_value', 'date') of the given product and
+    retailer in the current month, or None if there is none.
     """
     try:
         # Calculate start of current month
         now = datetime.now()
         start_of_month = datetime(now.year, now.month, 1).strftime("%Y-%m-%d")
         
-        response = client.table("cpi_prices") \
-            .select("price_id") \
+        response = await client.execute("check_existing_price", client.table("cpi_prices") \
+            .select("price_value, date") \
             .eq("product_id", product_id) \
             .eq("establishment_id", retailer_id) \
             .gte("date", start_of_month) \
-            .limit(1) \
-            .execute()
+            .order("date", desc=True) \
+            .limit(1))
             
-        exists = len(response.data) > 0
-        if exists:
-            logger.info(f"Price already exists for Product {product_id} at Retailer {retailer_id} this month. Skipping.")
-        return exists
+        if not response.data:
+            return None
+        logger.info(f"Price already exists for Product {product_id} at Retailer {retailer_id} this month. Skipping.")
+        return response.data[0]
     except Exception as e:
         logger.error(f"Failed to check existing price: {e}")
-        return False # Assume false to retry if check fails, or True to be safe? False is better for data completeness.
+        return None # Assume none to retry if check fails; better for data completeness.
 
-async def persist_price(client: Client, product: Dict[str, Any], retailer_id: int, price: float):
+async def persist_price(client: "Database", product: Dict[str, Any], retailer_id: int, price: float) -> bool:
     """
     Persists the price to Supabase via RPC `add_product_and_price`.
+    Returns True if the price was stored.
     """
     if not client:
-        return
+        return False
 
     payload = {
         "p_ean_code": product['ean_code'],
@@ -120,51 +213,232 @@ async def persist_price(client: Client, product: Dict[str, Any], retailer_id: in
     }
 
     try:
-        response = client.rpc("add_product_and_price", payload).execute()
+        response = await client.execute("add_product_and_price", client.rpc("add_product_and_price", payload))
         logger.info(f"Successfully persisted price ${price} for {product['product_name']} at Retailer {retailer_id}")
+        return True
     except Exception as e:
         logger.error(f"Failed to persist data for Retailer {retailer_id}: {e}")
+        return False
+
+# --- Retailer Adapters ---
+
+class _Services:
+    """Late-bound view of the shared objects the adapters use (--record/--replay rebind some)."""
+    rotator = property(lambda self: rotator)
+    http_pool = property(lambda self: http_pool)
+    catalog = property(lambda self: catalog)
+    deadline = property(lambda self: run_deadline)
+    capture = property(lambda self: capture)
+    flights = property(lambda self: flights)
+
+services = _Services()
 
-# --- Hard Target Scrapers (Playwright) ---
+DESKTOP_USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
 
-async def scrape_walmart(playwright, product: Dict[str, Any]) -> Optional[float]:
+
+# First product of a Walmart/Bodega search results page
+PRODUCT_LINK_SELECTOR = "div[data-automation-id='product-container'] a"
+
+# Runs in a warmed page: searches each EAN with the site's own requests (the
+# Next.js data route of the first product, or its page when the build id is
+# unknown) and returns only the price fields. Only a search without results is
+# a "not found" (null); EANs whose requests failed are left out, and a 403/429
+# stops the batch.
+NEXT_DATA_BATCH_JS = """
+async ({eans, concurrency}) => {
+  const buildId = window.__NEXT_DATA__ ? window.__NEXT_DATA__.buildId : null;
+  const priceInfo = (pageProps) => {
+    const product = pageProps && pageProps.initialData && pageProps.initialData.data
+      && pageProps.initialData.data.product;
+    const info = product && product.price && product.price.price;
+    if (!info) throw new Error("product data missing");
+    return {price: info.price || null, leadPrice: info.leadPrice || null};
+  };
+  const get = async (url, data) => {
+    const response = await fetch(url, {credentials: "include", headers: data ? {"x-nextjs-data": "1"} : {}});
+    if (response.status === 403 || response.status === 429) throw new Error(`blocked: HTTP ${response.status}`);
+    if (!response.ok) throw new Error(`HTTP ${response.status}`);
+    return data ? response.json() : response.text();
+  };
+  const parse = (html) => new DOMParser().parseFromString(html, "text/html");
+  const lookup = async (ean) => {
+    const search = await get(`/productos?Ntt=${encodeURIComponent(ean)}`, false);
+    const link = parse(search).querySelector("div[data-automation-id='product-container'] a");
+    if (!link) return null;
+    const path = new URL(link.getAttribute("href"), location.origin).pathname;
+    if (buildId) {
+      try {
+        return priceInfo((await get(`/_next/data/${buildId}${path}.json`, true)).pageProps);
+      } catch (error) {
+        if (String(error.message).startsWith("blocked")) throw error;
+      }
+    }
+    const script = parse(await get(path, false)).getElementById("__NEXT_DATA__");
+    if (!script) throw new Error("no __NEXT_DATA__");
+    return priceInfo(JSON.parse(script.textContent).props.pageProps);
+  };
+
+  const queue = [...eans];
+  const prices = {};
+  let blocked = null;
+  const worker = async () => {
+    while (queue.length && !blocked) {
+      const ean = queue.shift();
+      try {
+        prices[ean] = await lookup(ean);
+      } catch (error) {
+        if (String(error.message).startsWith("blocked")) blocked = error.message;
+      }
+    }
+  };
+  await Promise.all(Array.from({length: Math.min(concurrency, eans.length)}, worker));
+  return {prices, blocked};
+}
+"""
+
+
+class NextDataAdapter(BrowserAdapter):
     """
-    Scrapes Walmart Mexico using Trust Propagation via Google.
-    Strategy: Try 5 proxies, then 1 direct attempt as fallback.
+    Walmart-family sites that render the product as `__NEXT_DATA__`.
+
+    In batch mode (--browser-batch) one warmed page per egress is kept for the
+    run, and each batch of EANs is looked up with in-page `fetch()` calls
+    (NEXT_DATA_BATCH_JS) instead of one navigation per product.
     """
-    ean = product['ean_code']
-    name = product['product_name']
-    
-    async def try_scrape(proxy_url: Optional[str] = None, proxy_id: Optional[int] = None) -> Optional[float]:
-        attempt_type = "proxy" if proxy_url else "direct"
-        logger.info(f"[Walmart] Trying {attempt_type} for {name[:50]}...")
-        
-        launch_args = {"headless": True, "args": ["--no-sandbox"]}
-        if proxy_url:
-            launch_args["proxy"] = {"server": "per-context"}
 
-        browser = await playwright.chromium.launch(**launch_args)
+    min_attempt_s = BROWSER_ATTEMPT_MIN_S
+    supports_batch = True
+    site_url = ""
+
+    def __init__(self, services):
+        super().__init__(services)
+        # Warmed (context, page, blocking stats) per egress
+        self._sessions: Dict[Optional[str], Tuple[Any, Any, Any]] = {}
+
+    async def warm_up(self, context) -> Any:
+        """Opens the site in the context; returns the page that passed the bot check."""
+        page = await context.new_page()
+        await page.goto(self.site_url, timeout=run_deadline.timeout_ms(30000))
+        await page.wait_for_load_state("domcontentloaded")
+        return page
+
+    async def session(self, pool: BrowserPool, proxy_url: Optional[str]) -> Any:
+        entry = self._sessions.get(proxy_url)
+        if entry and not entry[1].is_closed():
+            return entry[1]
+        context = await pool.new_context(proxy_url, viewport={"width": 1920, "height": 1080})
+        try:
+            context.set_default_timeout(run_deadline.timeout_ms(30000))
+            blocked = await install_blocking(context)
+            page = await self.warm_up(context)
+            if not await page.evaluate("Boolean(window.__NEXT_DATA__)"):
+                raise EgressBlocked("bot check not passed")
+        except BaseException:
+            await context.close()
+            raise
+        self._sessions[proxy_url] = (context, page, blocked)
+        return page
+
+    async def fetch_batch(self, pool: BrowserPool, eans: List[str],
+                          proxy_url: Optional[str]) -> Dict[str, Optional[float]]:
+        page = await self.session(pool, proxy_url)
+        batch = await asyncio.wait_for(
+            page.evaluate(NEXT_DATA_BATCH_JS, {"eans": eans, "concurrency": BROWSER_BATCH_CONCURRENCY}),
+            timeout=run_deadline.timeout_s(30 + 5 * len(eans)))
+        prices = {ean: next_data_price_info(info) if info else None for ean, info in batch["prices"].items()}
+        if batch["blocked"]:
+            # Keep what was answered; the rest moves on to the next egress with a fresh session
+            await self.discard_egress(proxy_url)
+            if not prices:
+                raise EgressBlocked(batch["blocked"])
+            logger.info(f"[{self.name}] Batch cut after {len(prices)}/{len(eans)} products: {batch['blocked']}",
+                        extra=ATTEMPT)
+        return prices
+
+    async def discard_egress(self, proxy_url: Optional[str]):
+        entry = self._sessions.pop(proxy_url, None)
+        if entry:
+            context, _, blocked = entry
+            logger.info(f"[{self.name}] Blocked {blocked.summary()}", extra=ATTEMPT)
+            try:
+                await context.close()
+            except Exception as e:
+                logger.debug(f"[{self.name}] Could not close batch session: {e}")
+
+    async def close(self):
+        for proxy_url in list(self._sessions):
+            await self.discard_egress(proxy_url)
+
+    async def open_first_result(self, page) -> bool:
+        """
+        Opens the first product of a loaded search page. Returns False when the
+        search has no results, so the attempt is answered "not found" instead of
+        timing out on a missing link.
+        """
+        if not await page.evaluate("Boolean(window.__NEXT_DATA__)"):
+            raise EgressBlocked("no __NEXT_DATA__ (bot check)")
+        link = await page.query_selector(PRODUCT_LINK_SELECTOR)
+        if link is None:
+            return False
+        await link.click(timeout=run_deadline.timeout_ms(30000))
+        await page.wait_for_load_state("domcontentloaded")
+        return True
+
+    def page_price(self, next_data: Any) -> Optional[float]:
+        """Price of a product page; a page without product data (bot check, other page) is no answer."""
+        if not next_data:
+            raise EgressBlocked("no __NEXT_DATA__ (bot check)")
+        try:
+            return next_data_price(next_data)
+        except (KeyError, TypeError) as e:
+            raise EgressBlocked(f"__NEXT_DATA__ without product data ({e!r})")
+
+    def price_from_capture(self, product: Dict[str, Any]) -> Optional[float]:
+        next_data = capture.next_data(self.name, product['ean_code'])
+        try:
+            return next_data_price(next_data) if next_data else None
+        except (KeyError, TypeError, ValueError):
+            logger.warning(f"[{self.name}] Recorded JSON structure mismatch.")
+            return None
+
+
+class WalmartAdapter(NextDataAdapter):
+    """Walmart Mexico using Trust Propagation via Google."""
+
+    name = "Walmart"
+    lane = "walmart"
+    site_url = "https://www.walmart.com.mx"
+
+    async def warm_up(self, context) -> Any:
+        # Same Google referral as single attempts, once per batch session
+        page = await context.new_page()
+        await page.goto("https://www.google.com.mx", timeout=run_deadline.timeout_ms(30000))
+        await page.wait_for_selector("textarea[name='q']")
+        await page.type("textarea[name='q']", "Walmart México", delay=100)
+        await page.press("textarea[name='q']", "Enter")
+        await page.wait_for_selector("a[href*='walmart.com.mx']", timeout=run_deadline.timeout_ms(30000))
+        async with page.expect_popup() as popup_info:
+            await page.click("a[href*='walmart.com.mx']")
+        target_page = await popup_info.value
+        await target_page.wait_for_load_state("domcontentloaded")
+        return target_page
+
+    async def fetch(self, pool: BrowserPool, product: Dict[str, Any], proxy_url: Optional[str]) -> Optional[float]:
+        ean = product['ean_code']
+        name = product['product_name']
         context = None
-        
+        blocked = None
         try:
-            context_args = {
-                "user_agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-                "viewport": {"width": 1920, "height": 1080}
-            }
-            if proxy_url:
-                context_args["proxy"] = {"server": proxy_url}
-                
-            context = await browser.new_context(**context_args)
+            context = await pool.new_context(proxy_url, viewport={"width": 1920, "height": 1080})
+            context.set_default_timeout(run_deadline.timeout_ms(30000))
             
-            # Block resources
-            await context.route("**/*", lambda route: route.abort() 
-                if route.request.resource_type in ["image", "media", "font", "stylesheet"] 
-                else route.continue_())
+            # Block trackers and static assets
+            blocked = await install_blocking(context)
 
             page = await context.new_page()
             
             # 1. Start at Google
-            await page.goto("https://www.google.com.mx", timeout=30000)
+            await page.goto("https://www.google.com.mx", timeout=run_deadline.timeout_ms(30000))
             await page.wait_for_selector("textarea[name='q']") 
             
             # 2. Simulate human typing
@@ -173,7 +447,7 @@ async def scrape_walmart(playwright, product: Dict[str, Any]) -> Optional[float]
             await page.press("textarea[name='q']", "Enter")
             
             # 3. Click organic result
-            await page.wait_for_selector("a[href*='walmart.com.mx']", timeout=30000)
+            await page.wait_for_selector("a[href*='walmart.com.mx']", timeout=run_deadline.timeout_ms(30000))
             
             async with page.expect_popup() as popup_info:
                 await page.click("a[href*='walmart.com.mx']")
@@ -183,323 +457,134 @@ async def scrape_walmart(playwright, product: Dict[str, Any]) -> Optional[float]
             
             # 4. Extract from __NEXT_DATA__
             if ean not in target_page.url:
-                 logger.info("[Walmart] Navigating to specific product search...")
-                 await target_page.goto(f"https://www.walmart.com.mx/productos?Ntt={ean}", timeout=30000)
+                 logger.info("[Walmart] Navigating to specific product search...", extra=ATTEMPT)
+                 await target_page.goto(f"https://www.walmart.com.mx/productos?Ntt={ean}", timeout=run_deadline.timeout_ms(30000))
                  await target_page.wait_for_load_state("networkidle")
-                 await target_page.click("div[data-automation-id='product-container'] a")
-                 await target_page.wait_for_load_state("domcontentloaded")
+                 if not await self.open_first_result(target_page):
+                     return None
 
             next_data = await target_page.evaluate("window.__NEXT_DATA__")
-            
-            if next_data:
-                try:
-                    product_data = next_data['props']['pageProps']['initialData']['data']['product']
-                    price_info = product_data['price']['price'] 
-                    price = float(price_info.get('price', 0)) or float(price_info.get('leadPrice', 0))
-                    if price:
-                        if proxy_id: rotator.report_success(proxy_id)
-                        logger.info(f"[Walmart] SUCCESS ({attempt_type}): ${price}")
-                        return price
-                except KeyError:
-                    logger.warning("[Walmart] JSON structure mismatch.")
-                    
-        except (PlaywrightTimeoutError, Exception) as e:
-            logger.warning(f"[Walmart] {attempt_type} failed: {e}")
-            if proxy_id: rotator.report_failure(proxy_id)
+            capture.record_next_data(self.name, ean, next_data)
+            return self.page_price(next_data)
         finally:
+            if blocked:
+                logger.info(f"[Walmart] Blocked {blocked.summary()}", extra=ATTEMPT)
             if context:
                 await context.close()
-            await browser.close()
-        return None
-    
-    # Phase 1: Try with proxies (5 attempts)
-    for attempt in range(5):
-        proxy_data = rotator.get_proxy()
-        if proxy_data:
-            result = await try_scrape(proxy_data['url'], proxy_data['proxy_id'])
-            if result:
-                return result
-    
-    # Phase 2: Final direct attempt (no proxy)
-    result = await try_scrape()
-    if result:
-        return result
-            
-    return None
 
-async def scrape_bodega(playwright: Playwright, product: Dict[str, Any]) -> Optional[float]:
-    """
-    Scrapes Bodega Aurrera using Playwright.
-    Strategy: Try 5 proxies, then 1 direct attempt as fallback.
-    """
-    ean = product['ean_code']
-    name = product['product_name']
-    
-    async def try_scrape(proxy_url: Optional[str] = None, proxy_id: Optional[int] = None) -> Optional[float]:
-        attempt_type = "proxy" if proxy_url else "direct"
-        logger.info(f"[Bodega] Trying {attempt_type} for {name[:50]}...")
 
-        browser = None
+class BodegaAdapter(NextDataAdapter):
+    """Bodega Aurrera product search."""
+
+    name = "Bodega"
+    lane = "bodega"
+    site_url = "https://www.bodegaaurrera.com.mx"
+
+    async def fetch(self, pool: BrowserPool, product: Dict[str, Any], proxy_url: Optional[str]) -> Optional[float]:
+        ean = product['ean_code']
         context = None
+        blocked = None
         try:
-            browser = await playwright.chromium.launch(
-                headless=True,
-                proxy={"server": proxy_url} if proxy_url else None
-            )
+            context = await pool.new_context(proxy_url)
+            context.set_default_timeout(run_deadline.timeout_ms(30000))
             
-            context = await browser.new_context(
-                user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
-            )
+            # Optimize: Block trackers, images, fonts, media
+            blocked = await install_blocking(context)
             
             page = await context.new_page()
             
-            # Optimize: Block images, fonts, media
-            await context.route("**/*", lambda route: route.abort() if route.request.resource_type in ["image", "media", "font", "stylesheet"] else route.continue_())
-            
             url = f"https://www.bodegaaurrera.com.mx/productos?Ntt={ean}"
-            await page.goto(url, timeout=30000)
+            await page.goto(url, timeout=run_deadline.timeout_ms(30000))
             await page.wait_for_load_state("networkidle")
-            
-            await page.click("div[data-automation-id='product-container'] a", timeout=30000)
-            await page.wait_for_load_state("domcontentloaded")
+            if not await self.open_first_result(page):
+                return None
             
             next_data = await page.evaluate("window.__NEXT_DATA__")
-            if next_data:
-                product_data = next_data['props']['pageProps']['initialData']['data']['product']
-                price_info = product_data['price']['price']
-                price = float(price_info.get('price', 0)) or float(price_info.get('leadPrice', 0))
-                if price:
-                    if proxy_id: rotator.report_success(proxy_id)
-                    logger.info(f"[Bodega] SUCCESS ({attempt_type}): ${price}")
-                    return price
-
-        except (PlaywrightTimeoutError, Exception) as e:
-            logger.warning(f"[Bodega] {attempt_type} failed: {e}")
-            if proxy_id: rotator.report_failure(proxy_id)
+            capture.record_next_data(self.name, ean, next_data)
+            return self.page_price(next_data)
         finally:
+            if blocked:
+                logger.info(f"[Bodega] Blocked {blocked.summary()}", extra=ATTEMPT)
             if context:
                 await context.close()
-            if browser:
-                await browser.close()
-        return None
-    
-    # Phase 1: Try with proxies (5 attempts)
-    for attempt in range(5):
-        proxy_data = rotator.get_proxy()
-        if proxy_data:
-            result = await try_scrape(proxy_data['url'], proxy_data['proxy_id'])
-            if result:
-                return result
-    
-    # Phase 2: Final direct attempt (no proxy)
-    result = await try_scrape()
-    if result:
-        return result
-            
-    return None
 
 
-# --- Soft Target Scrapers (HTTPX) ---
+class ChedrauiAdapter(HttpAdapter):
+    """Chedraui VTEX catalog search, by EAN then by name."""
 
-async def scrape_chedraui(playwright: Playwright, product: Dict[str, Any]) -> Optional[float]:
-    """
-    Scrapes Chedraui using VTEX API.
-    Strategy: Try direct first, then proxy fallback.
-    """
-    ean = product['ean_code']
-    name = product['product_name']
-    
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-        "Accept": "application/json"
-    }
-    
-    async def try_fetch(proxy_url: Optional[str] = None, proxy_id: Optional[int] = None) -> Optional[float]:
-        attempt_type = "proxy" if proxy_url else "direct"
-        logger.info(f"[Chedraui] Trying {attempt_type} for {name[:50]}...")
-        
-        try:
-            async with httpx.AsyncClient(proxy=proxy_url, timeout=15, verify=False) as client:
-                # Try EAN first
-                url = f"https://www.chedraui.com.mx/api/catalog_system/pub/products/search?ft={ean}"
-                response = await client.get(url, headers=headers)
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    if data and len(data) > 0:
-                        item = data[0]
-                        price = item['items'][0]['sellers'][0]['commertialOffer']['Price']
-                        if proxy_id: rotator.report_success(proxy_id)
-                        logger.info(f"[Chedraui] SUCCESS ({attempt_type}): ${price}")
-                        return float(price)
-                    else:
-                        # Fallback to Name Search
-                        url_name = f"https://www.chedraui.com.mx/api/catalog_system/pub/products/search?ft={name}"
-                        response_name = await client.get(url_name, headers=headers)
-                        if response_name.status_code == 200:
-                            data_name = response_name.json()
-                            if data_name and len(data_name) > 0:
-                                item = data_name[0]
-                                price = item['items'][0]['sellers'][0]['commertialOffer']['Price']
-                                if proxy_id: rotator.report_success(proxy_id)
-                                logger.info(f"[Chedraui] SUCCESS ({attempt_type}): ${price}")
-                                return float(price)
-                elif response.status_code in [403, 502, 503]:
-                    if proxy_id: rotator.report_failure(proxy_id)
-        except Exception as e:
-            logger.warning(f"[Chedraui] {attempt_type} failed: {e}")
-            if proxy_id: rotator.report_failure(proxy_id)
-        return None
-    
-    # Phase 1: Try direct request first
-    result = await try_fetch()
-    if result:
-        return result
-    
-    # Phase 2: Try with proxies (5 attempts)
-    for attempt in range(5):
-        proxy_data = rotator.get_proxy()
-        if proxy_data:
-            result = await try_fetch(proxy_data['url'], proxy_data['proxy_id'])
-            if result:
-                return result
-    
-    return None
+    name = "Chedraui"
+    lane = "chedraui"
+    snapshot_name = "Chedraui"
+    headers = {"User-Agent": DESKTOP_USER_AGENT, "Accept": "application/json"}
+    search_url = "https://www.chedraui.com.mx/api/catalog_system/pub/products/search"
 
-async def scrape_soriana(playwright: Playwright, product: Dict[str, Any]) -> Optional[float]:
-    """
-    Scrapes Soriana using HTML search.
-    Strategy: Try direct first, then proxy fallback.
-    """
-    ean = product['ean_code']
-    name = product['product_name']
-    
-    url = "https://www.soriana.com/on/demandware.store/Sites-Soriana-Site/es_MX/Search-ShowAjax"
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-        "Accept": "text/html"
-    }
-    
-    async def try_fetch(proxy_url: Optional[str] = None, proxy_id: Optional[int] = None) -> Optional[float]:
-        attempt_type = "proxy" if proxy_url else "direct"
-        logger.info(f"[Soriana] Trying {attempt_type} for {name[:50]}...")
-        
-        try:
-            async with httpx.AsyncClient(proxy=proxy_url, timeout=15, verify=False) as client:
-                # Try EAN first
-                params = {"q": ean, "lang": "es_MX"}
-                response = await client.get(url, params=params, headers=headers)
-                
-                if response.status_code == 200:
-                    soup = BeautifulSoup(response.text, 'html.parser')
-                    price_element = soup.select_one(".price .sales .value") or \
-                                    soup.select_one(".product-tile .price .value") or \
-                                    soup.select_one("[data-price]")
-                    
-                    if price_element:
-                        price_text = price_element.get_text(strip=True).replace("$", "").replace(",", "")
-                        if proxy_id: rotator.report_success(proxy_id)
-                        logger.info(f"[Soriana] SUCCESS ({attempt_type}): ${price_text}")
-                        return float(price_text)
-                    
-                    # Fallback to Name Search
-                    params_name = {"q": name, "lang": "es_MX"}
-                    response_name = await client.get(url, params=params_name, headers=headers)
-                    
-                    if response_name.status_code == 200:
-                        soup = BeautifulSoup(response_name.text, 'html.parser')
-                        price_element = soup.select_one(".price .sales .value") or \
-                                        soup.select_one(".product-tile .price .value")
-                        if price_element:
-                            price_text = price_element.get_text(strip=True).replace("$", "").replace(",", "")
-                            if proxy_id: rotator.report_success(proxy_id)
-                            logger.info(f"[Soriana] SUCCESS ({attempt_type}): ${price_text}")
-                            return float(price_text)
-                            
-                elif response.status_code in [403, 502, 503]:
-                    if proxy_id: rotator.report_failure(proxy_id)
-        except Exception as e:
-            logger.warning(f"[Soriana] {attempt_type} failed: {e}")
-            if proxy_id: rotator.report_failure(proxy_id)
-        return None
-    
-    # Phase 1: Try direct request first
-    result = await try_fetch()
-    if result:
-        return result
-    
-    # Phase 2: Try with proxies (5 attempts)
-    for attempt in range(5):
-        proxy_data = rotator.get_proxy()
-        if proxy_data:
-            result = await try_fetch(proxy_data['url'], proxy_data['proxy_id'])
-            if result:
-                return result
-    
-    return None
+    async def search(self, proxy_url: Optional[str], query: str) -> Optional[float]:
+        response = await self.get(proxy_url, f"{self.search_url}?ft={query}", headers=self.headers)
+        return await parse_pool.parse(vtex_price, response.content)
 
-async def scrape_lacomer(playwright: Playwright, product: Dict[str, Any]) -> Optional[float]:
-    """
-    Scrapes La Comer using internal API.
-    Strategy: Try direct first, then proxy fallback.
-    """
-    ean = product['ean_code']
-    name = product['product_name']
-    
-    url = "https://www.lacomer.com.mx/lacomer-api/api/v1/public/articulopasillo/detalleArticulo"
-    params = {"artEan": ean, "noPagina": "1", "succId": "287"}
+    async def fetch(self, pool: BrowserPool, product: Dict[str, Any], proxy_url: Optional[str]) -> Optional[float]:
+        ean, name = product['ean_code'], product['product_name']
+        price = await self.lookup("ean", ean, lambda: self.search(proxy_url, ean))
+        if price is None:
+            # Fallback to Name Search
+            price = await self.lookup("name", name, lambda: self.search(proxy_url, name))
+        return price
+
+
+class SorianaAdapter(HttpAdapter):
+    """Soriana HTML search, by EAN then by name."""
+
+    name = "Soriana"
+    lane = "soriana"
+    snapshot_name = "Soriana"
+    headers = {"User-Agent": DESKTOP_USER_AGENT, "Accept": "text/html"}
+    search_url = "https://www.soriana.com/on/demandware.store/Sites-Soriana-Site/es_MX/Search-ShowAjax"
+
+    async def search(self, proxy_url: Optional[str], query: str, *selectors) -> Optional[float]:
+        params = {"q": query, "lang": "es_MX"}
+        response = await self.get(proxy_url, self.search_url, params=params, headers=self.headers)
+        return await parse_pool.parse(soriana_price, response.text, *selectors)
+
+    async def fetch(self, pool: BrowserPool, product: Dict[str, Any], proxy_url: Optional[str]) -> Optional[float]:
+        ean, name = product['ean_code'], product['product_name']
+        price = await self.lookup("ean", ean, lambda: self.search(proxy_url, ean))
+        if price is None:
+            # Fallback to Name Search
+            price = await self.lookup("name", name, lambda: self.search(proxy_url, name, SORIANA_NAME_SELECTORS))
+        return price
+
+
+class LaComerAdapter(HttpAdapter):
+    """La Comer internal article API, by EAN."""
+
+    name = "La Comer"
+    lane = "lacomer"
+    snapshot_name = "La Comer"
     headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+        "User-Agent": DESKTOP_USER_AGENT,
         "Accept": "application/json, text/plain, */*",
         "Referer": "https://www.lacomer.com.mx/",
         "Origin": "https://www.lacomer.com.mx"
     }
-    
-    async def try_fetch(proxy_url: Optional[str] = None, proxy_id: Optional[int] = None) -> Optional[float]:
-        attempt_type = "proxy" if proxy_url else "direct"
-        logger.info(f"[La Comer] Trying {attempt_type} for {name[:50]}...")
-        
-        try:
-            async with httpx.AsyncClient(proxy=proxy_url, timeout=15, verify=False) as client:
-                response = await client.get(url, params=params, headers=headers)
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    if 'estrucArti' in data and data['estrucArti']:
-                        price = float(data['estrucArti'].get('artPrven', 0))
-                        if price > 0:
-                            if proxy_id: rotator.report_success(proxy_id)
-                            logger.info(f"[La Comer] SUCCESS ({attempt_type}): ${price}")
-                            return price
-                elif response.status_code in [403, 502, 503]:
-                    if proxy_id: rotator.report_failure(proxy_id)
-        except Exception as e:
-            logger.warning(f"[La Comer] {attempt_type} failed: {e}")
-            if proxy_id: rotator.report_failure(proxy_id)
-        return None
-    
-    # Phase 1: Try direct request first
-    result = await try_fetch()
-    if result:
-        return result
-    
-    # Phase 2: Try with proxies (5 attempts)
-    for attempt in range(5):
-        proxy_data = rotator.get_proxy()
-        if proxy_data:
-            result = await try_fetch(proxy_data['url'], proxy_data['proxy_id'])
-            if result:
-                return result
-    
-    return None
+    detail_url = "https://www.lacomer.com.mx/lacomer-api/api/v1/public/articulopasillo/detalleArticulo"
+
+    async def search(self, proxy_url: Optional[str], ean: str) -> Optional[float]:
+        params = {"artEan": ean, "noPagina": "1", "succId": "287"}
+        response = await self.get(proxy_url, self.detail_url, params=params, headers=self.headers)
+        return await parse_pool.parse(lacomer_price, response.content)
+
+    async def fetch(self, pool: BrowserPool, product: Dict[str, Any], proxy_url: Optional[str]) -> Optional[float]:
+        ean = product['ean_code']
+        return await self.lookup("ean", ean, lambda: self.search(proxy_url, ean))
 
 
-async def fetch_specific_product(client: Client, product_id: int) -> List[Dict[str, Any]]:
+async def fetch_specific_product(client: "Database", product_id: int) -> List[Dict[str, Any]]:
     """
     Fetches a single product by ID.
     """
     try:
-        response = client.table("cpi_products").select("*").eq("product_id", product_id).execute()
+        response = await client.execute("fetch_specific_product",
+                                        client.table("cpi_products").select("*").eq("product_id", product_id))
         if response.data:
             logger.info(f"Fetched specific product: {response.data[0]['product_name']}")
             return response.data
@@ -510,17 +595,290 @@ async def fetch_specific_product(client: Client, product_id: int) -> List[Dict[s
         logger.error(f"Failed to fetch product {product_id}: {e}")
         return []
 
+async def fetch_products_by_id(client: "Database", product_ids: List[int]) -> List[Dict[str, Any]]:
+    """
+    Fetches the rows of the given products (deferred browser pairs keep IDs only).
+    """
+    try:
+        response = await client.execute("fetch_products_by_id",
+                                        client.table("cpi_products").select("*").in_("product_id", product_ids))
+        return response.data or []
+    except Exception as e:
+        logger.error(f"Failed to fetch {len(product_ids)} products: {e}")
+        return []
+
 # --- Scraper Registry ---
-# Maps establishment names (from DB) to scraper functions.
-SCRAPER_REGISTRY = {
-    "Walmart": scrape_walmart,
-    "Wal-Mart": scrape_walmart, # Match DB Name
-    "Bodega Aurrera": scrape_bodega,
-    "Chedraui": scrape_chedraui,
-    "Soriana": scrape_soriana,
-    "La Comer": scrape_lacomer
+# Maps establishment names (from DB) to retailer adapters.
+walmart_adapter = WalmartAdapter(services)
+SCRAPER_REGISTRY: Dict[str, RetailerAdapter] = {
+    "Walmart": walmart_adapter,
+    "Wal-Mart": walmart_adapter, # Match DB Name
+    "Bodega Aurrera": BodegaAdapter(services),
+    "Chedraui": ChedrauiAdapter(services),
+    "Soriana": SorianaAdapter(services),
+    "La Comer": LaComerAdapter(services)
 }
 
+# Cost class of each scraper, used by the scheduler until timings are observed.
+RETAILER_COST_CLASS = {name: adapter.cost_class for name, adapter in SCRAPER_REGISTRY.items()}
+
+async def open_pair(client: "Database", product: Dict[str, Any], establishment: Dict[str, Any],
+                    journal: Optional[RunJournal] = None) -> Dict[str, Any]:
+    """
+    Checks whether a pair needs scraping. Returns its summary dict (see
+    scrape_pair), whose status is still None when it does.
+    """
+    product_id = product['product_id']
+    est_id = establishment['establishment_id']
+    est_name = establishment['establishment_name']
+    result = {"establishment_id": est_id, "establishment_name": est_name, "status": None, "price": None,
+              "date": None, "source": None, "duration_s": None}
+
+    if est_name not in SCRAPER_REGISTRY:
+        logger.debug(f"No scraper implemented for '{est_name}'. Skipping.")
+        result["status"] = "no_scraper"
+        return result
+
+    if journal and journal.is_done(product_id, est_id):
+        result["status"] = "skipped"
+        return result
+
+    if run_deadline.expired():
+        result["status"] = "deadline"
+        return result
+
+    if not_found.should_skip(product_id, est_id):
+        if journal:
+            journal.record_completed(product_id, est_id, "not_carried")
+        result["status"] = "not_carried"
+        return result
+    
+    # Check if price exists
+    existing = await check_existing_price(client, product_id, est_id)
+    if existing:
+        if journal:
+            journal.record_completed(product_id, est_id, "exists")
+        result["status"] = "exists"
+        result["price"] = existing["price_value"]
+        result["date"] = existing["date"]
+    return result
+
+async def close_pair(client: "Database", product: Dict[str, Any], establishment: Dict[str, Any],
+                     journal: Optional[RunJournal], result: Dict[str, Any], scraped: ScrapeResult):
+    """Records and persists the scrape result of an open pair."""
+    product_id = product['product_id']
+    est_id = establishment['establishment_id']
+    price = scraped.price
+    result["source"] = scraped.source
+    capture.record_pair(product, establishment, price)
+    if price:
+        result["price"] = price
+        not_found.record_found(product_id, est_id)
+        if journal:
+            journal.record_result(product_id, est_id, price)
+        if await persist_price(client, product, est_id, price):
+            result["status"] = "persisted"
+            if journal:
+                journal.record_completed(product_id, est_id, "persisted")
+        else:
+            result["status"] = "not_persisted"
+    elif scraped.verdict == VERDICT_NOT_FOUND:
+        result["status"] = "not_found"
+        backoff = not_found.record_not_found(product_id, est_id)
+        logger.debug(f"[NotFound] product={product_id} establishment={establishment['establishment_name']} "
+                     f"re-checked in {backoff / 3600:.0f}h")
+        if journal:
+            journal.record_failed(product_id, est_id, "no price")
+    else:
+        result["status"] = "unreachable"
+        if journal:
+            journal.record_failed(product_id, est_id, "unreachable")
+
+def log_pair(product: Dict[str, Any], result: Dict[str, Any], attempts: int):
+    # One compact line per scraped pair replaces the per-attempt lines (which are sampled)
+    duration = f"{result['duration_s']:.1f}s" if result["duration_s"] is not None else "-"
+    level = logging.INFO if result["status"] in ("persisted", "not_persisted") else logging.WARNING
+    logger.log(level, f"[Pair] product={product['product_id']} establishment={result['establishment_name']} "
+                      f"status={result['status']} price={result['price'] if result['price'] is not None else '-'} "
+                      f"source={result['source'] or '-'} attempts={attempts} duration={duration}")
+
+async def scrape_pair(client: "Database", pool: BrowserPool, product: Dict[str, Any], establishment: Dict[str, Any],
+                      journal: Optional[RunJournal] = None) -> Dict[str, Any]:
+    """
+    Scrapes and persists the price of one (product, establishment) pair.
+    Returns a summary dict with 'establishment_id', 'establishment_name', 'status' and 'price'
+    ('price' and 'date' of the existing price for 'exists').
+    Status is one of: no_scraper, skipped, not_carried, exists, persisted, not_persisted, not_found,
+    unreachable, error, deadline. not_found means the retailer answered without the product and
+    the pair backs off (not_carried while it does); unreachable means no attempt got an answer.
+    Pairs cut by the run deadline stay open in the journal for the next run.
+    """
+    result = await open_pair(client, product, establishment, journal)
+    if result["status"]:
+        return result
+    est_name = establishment['establishment_name']
+
+    # Execute scraper
+    started = time.monotonic()
+    attempts_token = pair_attempts.set(0)
+    try:
+        scraped = await SCRAPER_REGISTRY[est_name].scrape(pool, product)
+        result["duration_s"] = time.monotonic() - started
+        await close_pair(client, product, establishment, journal, result, scraped)
+    except DeadlineExceeded as e:
+        logger.info(f"[{est_name}] Not started, deadline near: {e}")
+        result["status"] = "deadline"
+    except Exception as e:
+        logger.error(f"Error scraping {est_name}: {e}")
+        result["status"] = "error"
+        result["duration_s"] = time.monotonic() - started
+        if journal:
+            journal.record_failed(product['product_id'], establishment['establishment_id'], str(e))
+    finally:
+        attempts = pair_attempts.get()
+        pair_attempts.reset(attempts_token)
+
+    log_pair(product, result, attempts)
+    return result
+
+async def scrape_batch(client: "Database", pool: BrowserPool, adapter: RetailerAdapter,
+                       pairs: List[Tuple[Dict[str, Any], Dict[str, Any]]],
+                       journal: Optional[RunJournal] = None) -> List[Dict[str, Any]]:
+    """
+    Like scrape_pair for many pairs of one batch-capable retailer: the open
+    pairs are scraped with one `adapter.scrape_batch` call, and each pair is
+    credited an equal share of its duration.
+    """
+    results = [await open_pair(client, product, establishment, journal) for product, establishment in pairs]
+    open_pairs = [(pair, result) for pair, result in zip(pairs, results) if not result["status"]]
+    if not open_pairs:
+        return results
+
+    try:
+        scraped = await adapter.scrape_batch(pool, [product for (product, _), _ in open_pairs])
+    except DeadlineExceeded as e:
+        logger.info(f"[{adapter.name}] Batch not started, deadline near: {e}")
+        scraped = [None] * len(open_pairs)
+    except Exception as e:
+        logger.error(f"Error scraping {adapter.name} batch: {e}")
+        for (product, establishment), result in open_pairs:
+            result["status"] = "error"
+            if journal:
+                journal.record_failed(product['product_id'], establishment['establishment_id'], str(e))
+            log_pair(product, result, 0)
+        return results
+
+    for ((product, establishment), result), pair_scraped in zip(open_pairs, scraped):
+        if pair_scraped is None:
+            result["status"] = "deadline"
+        else:
+            result["duration_s"] = pair_scraped.latency_s
+            await close_pair(client, product, establishment, journal, result, pair_scraped)
+        log_pair(product, result, pair_scraped.attempts if pair_scraped else 0)
+    return results
+
+async def resume_unpersisted(client: "Database", journal: RunJournal):
+    """
+    Persists prices a previous, interrupted run scraped but never stored.
+    """
+    for (product_id, est_id), price in journal.unpersisted_results().items():
+        product = journal.products.get(product_id)
+        if not product:
+            continue
+        if await persist_price(client, product, est_id, price):
+            journal.record_completed(product_id, est_id, "persisted")
+
+async def product_feed(client: "Database", args, journal: Optional[RunJournal]) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Yields the products for this run according to the CLI mode.
+    A resumed --all run first finishes the journal's open products, then
+    continues the worklist after the last product it had planned.
+    """
+    if args.product_id:
+        logger.info(f"Mode: Single Product (ID: {args.product_id})")
+        for product in await fetch_specific_product(client, args.product_id):
+            yield product
+    elif args.all:
+        after_product_id = None
+        if journal and journal.resumed:
+            products = journal.pending_products()
+            logger.info(f"Mode: ALL Products (resumed, {len(products)} open products in journal)")
+            for product in products:
+                yield product
+            after_product_id = journal.last_product_id()
+        else:
+            logger.info(f"Mode: ALL Products (streaming, {args.page_size} per page)")
+        async for product in iter_products_to_scrape(client, args.page_size, after_product_id):
+            yield product
+    else:
+        logger.info("Mode: Batch Scraping (limit 3)")
+        for product in await fetch_products_to_scrape(client, limit=3):
+            yield product
+
+async def run_daemon(client: "Database", establishments: List[Dict[str, Any]], args):
+    """
+    Runs the scraper as a long-lived process with warm browser, HTTP clients and proxy pool.
+    """
+    from daemon import ScraperDaemon
+
+    pool = BrowserPool(connect_url=args.browser_url)
+    daemon = ScraperDaemon(
+        [est for est in establishments if est['establishment_name'] in SCRAPER_REGISTRY],
+        scrape=lambda product, establishment: scrape_pair(client, pool, product, establishment),
+        fetch_due=lambda limit, after_product_id: fetch_products_page(client, limit, after_product_id),
+        fetch_product=lambda product_id: fetch_specific_product(client, product_id),
+        workers=args.workers,
+        **({"port": args.port} if args.port else {})
+    )
+    try:
+        await daemon.run()
+    finally:
+        not_found.save()
+        logger.info(f"[NotFound] {not_found.summary()}")
+        await pool.close()
+        await http_pool.close()
+        parse_pool.close()
+        capture.close()
+        client.report()
+        await client.close()
+
+async def run_replay(args) -> int:
+    """
+    Re-runs the scrapers over the pairs of a --record archive, served only from
+    the archive, and compares each price with the recorded one. Nothing is
+    read from or written to the database. Returns the number of mismatches.
+    """
+    global rotator
+    capture.load(args.replay)
+    catalog.disable()
+    http_pool.capture = capture
+    rotator = CaptureRotator(capture)
+    # Never started: browser retailers read the recorded __NEXT_DATA__
+    pool = BrowserPool(connect_url=args.browser_url)
+
+    started = time.monotonic()
+    mismatches = 0
+    try:
+        for pair in capture.pairs:
+            product, establishment = pair["product"], pair["establishment"]
+            adapter = SCRAPER_REGISTRY.get(establishment['establishment_name'])
+            try:
+                price = (await adapter.scrape(pool, product)).price if adapter else None
+            except Exception as e:
+                logger.error(f"Error replaying {establishment['establishment_name']}: {e}")
+                price = None
+            if price != pair["price"]:
+                mismatches += 1
+                logger.warning(f"[Replay] product={product['product_id']} establishment={establishment['establishment_name']} "
+                               f"recorded={pair['price']} replayed={price}")
+    finally:
+        await pool.close()
+        await http_pool.close()
+        parse_pool.close()
+    logger.info(f"[Replay] {len(capture.pairs)} pairs in {time.monotonic() - started:.2f}s, "
+                f"{mismatches} mismatches ({capture.summary()}).")
+    return mismatches
+
 async def main():
     logger.info("Starting Hybrid Scraper...")
     
@@ -528,68 +886,197 @@ async def main():
     parser = argparse.ArgumentParser(description="CPI Web Scraper")
     parser.add_argument("--product_id", type=int, help="Scrape a specific product ID only")
     parser.add_argument("--all", action="store_true", help="Scrape ALL products in the database (no limit)")
+    parser.add_argument("--journal", default=JOURNAL_PATH, help="Run journal path used by --all runs")
+    parser.add_argument("--no-resume", action="store_true", help="Ignore an unfinished run journal and start over")
+    parser.add_argument("--daemon", action="store_true", help="Run as a long-lived scraper with a local HTTP endpoint")
+    parser.add_argument("--port", type=int, help="Port of the daemon HTTP endpoint (default: SCRAPER_DAEMON_PORT or 8765)")
+    parser.add_argument("--workers", type=int, default=HttpAdapter.max_concurrency + BrowserAdapter.max_concurrency,
+                        help="Concurrent scrape workers in daemon mode (default: the HTTP slots, which scale with "
+                             "HTTP_MAX_CONCURRENCY or the core count, plus the browser slots)")
+    parser.add_argument("--page-size", type=int, default=PRODUCT_PAGE_SIZE, help="Products per page when streaming --all")
+    parser.add_argument("--budget", type=float, help="Time budget in minutes; browser work that does not fit is left for the next run")
+    parser.add_argument("--deadline", type=float, help="Hard run deadline in minutes; attempts shrink their timeouts and stop in time to flush state")
+    parser.add_argument("--browser-url", default=BROWSER_CDP_URL, help="CDP endpoint of a shared browser_server.py (default: BROWSER_CDP_URL)")
+    parser.add_argument("--parse-workers", type=int, nargs="?", const=os.cpu_count(), default=PARSE_WORKERS,
+                        help="Parse large response bodies in a process pool (default: PARSE_WORKERS or 0; no value: one per core)")
+    parser.add_argument("--record", metavar="PATH", help="Record retailer traffic and browser extractions to a .jsonl.gz archive")
+    parser.add_argument("--replay", metavar="PATH", help="Re-run the pairs of a --record archive from the archive alone (no network or database)")
+    parser.add_argument("--refresh-cache", action="store_true", help="Refetch establishments instead of using the reference cache")
+    parser.add_argument("--browser-batch", type=int, nargs="?", const=BROWSER_BATCH_SIZE, default=0, metavar="N",
+                        help="Scrape deferred Walmart/Bodega pairs N at a time with in-page fetch() on one warmed page "
+                             "per egress (no value: BROWSER_BATCH_SIZE or 24)")
+    parser.add_argument("--recheck-not-found", action="store_true",
+                        help="Re-check pairs a retailer recently answered without the product instead of skipping them")
+    parser.add_argument("--profile", nargs="?", const=PROFILE_DIR, metavar="DIR",
+                        help="Profile the run (stack samples, loop lag, slow callbacks, task times) into DIR (default .cache/profile)")
     args = parser.parse_args()
 
-    client = get_supabase_client()
+    if args.profile:
+        async with RunProfiler(args.profile):
+            await run(args)
+    else:
+        await run(args)
+
+async def run(args):
+    """One scraper run (or daemon) for the parsed command line."""
+    global rotator
+
+    run_deadline.set(args.deadline * 60 if args.deadline else None)
+    parse_pool.workers = args.parse_workers
+    not_found.skipping = not args.recheck_not_found
+
+    if args.replay:
+        await run_replay(args)
+        return
+
+    client = await get_supabase_client()
     if not client:
         return
+    if args.record:
+        # Bypass the catalog snapshot so the archive holds live retailer payloads
+        capture.record_to(args.record)
+        catalog.disable()
+        not_found.disable()
+        http_pool.capture = capture
+        rotator = CaptureRotator(capture)
+    rotator.attach(client)
 
     # Fetch Establishments
-    establishments = await fetch_establishments(client)
+    establishments = await fetch_establishments(client, refresh=args.refresh_cache)
     if not establishments:
         logger.error("No establishments found in DB. Exiting.")
+        capture.close()
+        await client.close()
         return
 
-    async with async_playwright() as playwright:
-        # Determine which products to scrape
-        if args.product_id:
-            logger.info(f"Mode: Single Product (ID: {args.product_id})")
-            products = await fetch_specific_product(client, args.product_id)
-        elif args.all:
-            logger.info("Mode: ALL Products (no limit)")
-            products = await fetch_products_to_scrape(client, limit=9999)
-        else:
-            logger.info("Mode: Batch Scraping (limit 3)")
-            products = await fetch_products_to_scrape(client, limit=3)
+    if args.daemon:
+        await run_daemon(client, establishments, args)
+        return
 
-        if not products:
-            logger.info("No products to scrape.")
-            return
+    # Long --all runs are journaled so a run killed by the workflow timeout can resume.
+    journal = None
+    if args.all:
+        journal = RunJournal(args.journal)
+        journal.open(resume=not args.no_resume)
+        for proxy_id in journal.burned_proxies():
+            rotator.exclude(proxy_id)
+
+        def on_proxy_verdict(proxy_id: int, verdict: str):
+            journal.record_proxy(proxy_id, verdict)
+            if journal.is_burned(proxy_id):
+                rotator.exclude(proxy_id)
+
+        rotator.verdict_hook = on_proxy_verdict
+        await resume_unpersisted(client, journal)
+
+    pool = BrowserPool(connect_url=args.browser_url)
+    budgets = [b for b in (args.budget * 60 if args.budget else None, run_deadline.remaining()) if b is not None]
+    scheduler = Scheduler(RetailerStats(), RETAILER_COST_CLASS, budget_s=min(budgets) if budgets else None)
+
+    async def run_pair(product: Dict[str, Any], establishment: Dict[str, Any]):
+        expected = scheduler.estimate(product, establishment)
+        result = await scrape_pair(client, pool, product, establishment, journal)
+        scheduler.observe(product, establishment, result, expected)
 
-        for product in products:
+    async def run_batch(adapter: RetailerAdapter, pairs: List[Tuple[Dict[str, Any], Dict[str, Any]]]):
+        expected = [scheduler.estimate(product, establishment) for product, establishment in pairs]
+        results = await scrape_batch(client, pool, adapter, pairs, journal)
+        for (product, establishment), result, pair_expected in zip(pairs, results, expected):
+            scheduler.observe(product, establishment, result, pair_expected)
+
+    async def process() -> int:
+        processed = 0
+        async for product in product_feed(client, args, journal):
+            if run_deadline.expired():
+                logger.warning("[Deadline] Reached, no new products started.")
+                break
+            processed += 1
             product_id = product['product_id']
             name = product['product_name']
             ean = product['ean_code']
             
             logger.info(f"--- Processing Product: {name} (EAN: {ean}) ---")
+
+            if journal and product_id not in journal.products:
+                journal.record_pending(product, [
+                    est['establishment_id'] for est in establishments
+                    if est['establishment_name'] in SCRAPER_REGISTRY
+                ])
             
-            # Scrape all retailers for this product
-            for establishment in establishments:
-                est_id = establishment['establishment_id']
-                est_name = establishment['establishment_name']
-                
-                # Get the scraper function
-                scraper_func = SCRAPER_REGISTRY.get(est_name)
-                
-                if not scraper_func:
-                    logger.warning(f"No scraper implemented for '{est_name}'. Skipping. (Available: {list(SCRAPER_REGISTRY.keys())})")
-                    continue
-                
-                # Check if price exists
-                if await check_existing_price(client, product_id, est_id):
-                    continue
-                
-                # Execute scraper
+            # Cheap retailers run now; browser retailers are deferred and packed into the budget
+            for establishment in scheduler.plan(product, establishments):
+                await run_pair(product, establishment)
+
+        # With --browser-batch, deferred pairs of batch-capable retailers are grouped per retailer
+        batches: Dict[str, List[Tuple[Dict[str, Any], Dict[str, Any]]]] = {}
+        # Rows of the next page of deferred products, reloaded by ID
+        rows: Dict[int, Dict[str, Any]] = {}
+        for product_id, establishment in scheduler.drain_deferred():
+            if run_deadline.expired():
+                break
+            if product_id not in rows:
+                rows.clear()
+                page_ids = set(scheduler.upcoming_product_ids(args.page_size)) | {product_id}
+                rows.update((row['product_id'], row) for row in await fetch_products_by_id(client, list(page_ids)))
+            product = rows.get(product_id)
+            if product is None:
+                continue
+            adapter = SCRAPER_REGISTRY.get(establishment['establishment_name'])
+            if not args.browser_batch or not adapter or not adapter.supports_batch:
+                await run_pair(product, establishment)
+                continue
+            batch = batches.setdefault(adapter.name, [])
+            batch.append((product, establishment))
+            if len(batch) >= args.browser_batch:
+                await run_batch(adapter, batches.pop(adapter.name))
+        for batch in batches.values():
+            if run_deadline.expired():
+                break
+            await run_batch(SCRAPER_REGISTRY[batch[0][1]['establishment_name']], batch)
+        return processed
+
+    finished = False
+    try:
+        # Stragglers still running at the deadline are cancelled; the reserve is left for flushing.
+        hard_remaining = run_deadline.hard_remaining()
+        timeout = max(hard_remaining - run_deadline.reserve_s / 2, 0) if hard_remaining is not None else None
+        try:
+            processed = await asyncio.wait_for(process(), timeout=timeout)
+            if not processed:
+                logger.info("No products to scrape.")
+            finished = not run_deadline.expired()
+        except asyncio.TimeoutError:
+            logger.warning("[Deadline] Cancelled in-flight attempts.")
+    finally:
+        if journal:
+            if not finished:
+                # Flush prices scraped this run that did not make it to the database yet
                 try:
-                    price = await scraper_func(playwright, product)
-                    if price:
-                        await persist_price(client, product, est_id, price)
-                    else:
-                        logger.warning(f"No price found for {est_name}")
+                    await resume_unpersisted(client, journal)
                 except Exception as e:
-                    logger.error(f"Error scraping {est_name}: {e}")
+                    logger.warning(f"[Deadline] Could not flush pending prices: {e}")
+            journal.close(finished=finished)
+        scheduler.report()
+        scheduler.stats.save()
+        if blocking_totals.total:
+            logger.info(f"[Blocking] Run total: {blocking_totals.summary()}")
+        logger.info(f"[Parse] {parse_pool.stats.summary()}")
+        logger.info(f"[Coalesce] {flights.stats.summary()}")
+        not_found.save()
+        logger.info(f"[NotFound] {not_found.summary()}")
+        if capture.recording:
+            logger.info(f"[Capture] {capture.summary()}")
+        for adapter in set(SCRAPER_REGISTRY.values()):
+            await adapter.close()
+        await pool.close()
+        await http_pool.close()
+        parse_pool.close()
+        capture.close()
+        client.report()
+        await client.close()
 
     logger.info("Scraping Cycle Completed.")
 
 if __name__ == "__main__":
+    configure_logging()
     asyncio.run(main())
@@ -0,0 +1,97 @@
+"""
+Persistent "not found" verdicts of (product, retailer) pairs.
+
+A pair is not found when the retailer answered at least one attempt and none
+of them had the product. Blocked attempts, timeouts and other errors prove
+nothing about the catalog and are not recorded here. A not-found pair is
+skipped until its back-off expires: `NOT_FOUND_BACKOFF_H` after the first
+verdict, doubling with every consecutive one up to `NOT_FOUND_MAX_BACKOFF_H`.
+Finding a price clears the entry. Verdicts are stored in
+`.cache/not_found.json`, which the workflow carries between runs.
+"""
+import os
+import json
+import time
+import logging
+from typing import Optional, Dict, Any
+
+logger = logging.getLogger(__name__)
+
+NOT_FOUND_PATH = os.path.join(os.environ.get("SCRAPER_CACHE_DIR", ".cache"), "not_found.json")
+NOT_FOUND_BACKOFF_H = float(os.environ.get("NOT_FOUND_BACKOFF_H", "6"))
+NOT_FOUND_MAX_BACKOFF_H = float(os.environ.get("NOT_FOUND_MAX_BACKOFF_H", "168"))
+# Entries whose last verdict is older than this are dropped on save.
+NOT_FOUND_FORGET_S = 90 * 86400
+
+
+class NotFoundCache:
+    """Not-found verdicts per pair with exponential back-off before the next check."""
+
+    def __init__(self, path: Optional[str] = NOT_FOUND_PATH, backoff_h: float = NOT_FOUND_BACKOFF_H,
+                 max_backoff_h: float = NOT_FOUND_MAX_BACKOFF_H):
+        self.path = path
+        self.backoff_s = backoff_h * 3600
+        self.max_backoff_s = max_backoff_h * 3600
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self.counts = {"skipped": 0, "recorded": 0, "cleared": 0}
+        # --recheck-not-found: verdicts are still recorded, but no pair is skipped
+        self.skipping = True
+        self.load()
+
+    @staticmethod
+    def key(product_id: int, establishment_id: int) -> str:
+        return f"{product_id}:{establishment_id}"
+
+    def load(self):
+        if not self.path:
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.entries = json.load(f).get("pairs", {})
+        except (OSError, json.JSONDecodeError):
+            pass
+
+    def save(self):
+        if not self.path:
+            return
+        cutoff = time.time() - NOT_FOUND_FORGET_S
+        self.entries = {key: entry for key, entry in self.entries.items() if entry["last_at"] >= cutoff}
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"pairs": self.entries}, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning(f"Could not save not-found cache {self.path}: {e}")
+
+    def disable(self):
+        """Neither skips nor persists (e.g. while recording an archive)."""
+        self.path = None
+        self.entries = {}
+
+    def should_skip(self, product_id: int, establishment_id: int, now: Optional[float] = None) -> bool:
+        entry = self.entries.get(self.key(product_id, establishment_id))
+        now = time.time() if now is None else now
+        if not self.skipping or entry is None or entry["retry_at"] <= now:
+            return False
+        self.counts["skipped"] += 1
+        return True
+
+    def record_not_found(self, product_id: int, establishment_id: int, now: Optional[float] = None) -> float:
+        """Records a verdict; returns the back-off in seconds before the pair is checked again."""
+        now = time.time() if now is None else now
+        entry = self.entries.setdefault(self.key(product_id, establishment_id), {"misses": 0})
+        entry["misses"] += 1
+        backoff = min(self.backoff_s * 2 ** (entry["misses"] - 1), self.max_backoff_s)
+        entry.update(last_at=now, retry_at=now + backoff)
+        self.counts["recorded"] += 1
+        return backoff
+
+    def record_found(self, product_id: int, establishment_id: int):
+        if self.entries.pop(self.key(product_id, establishment_id), None) is not None:
+            self.counts["cleared"] += 1
+
+    def summary(self) -> str:
+        return (f"{self.counts['skipped']} pairs skipped, {self.counts['recorded']} verdicts recorded, "
+                f"{self.counts['cleared']} cleared ({len(self.entries)} pairs backing off or remembered)")
@@ -0,0 +1,173 @@
+"""
+Price extraction off the event loop.
+
+The extractors below take a raw response body and return only the price, so
+a worker process receives one string and sends back one float: the pickling
+cost is the body copy on the way in, never a parsed tree or decoded payload
+on the way out. `ParseExecutor` runs them in a process pool sized to the
+cores when parsing inline is predicted to block the loop for longer than
+the pool's round-trip (pickling plus IPC, ~0.3 ms plus the body copy; see
+scripts/bench_parse_executor.py). The prediction uses each extractor's
+measured inline cost per byte: HTML trees cost ~1 ms/KB, JSON ~5 us/KB.
+"""
+import os
+import re
+import json
+import time
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Dict, Any, Callable, Sequence, Union
+
+logger = logging.getLogger(__name__)
+
+# Bodies smaller than this are always parsed on the event loop.
+PARSE_INLINE_BYTES = int(os.environ.get("PARSE_INLINE_BYTES", "1024"))
+# Larger bodies go to the pool when inline parsing is predicted to take longer than this.
+PARSE_INLINE_MS = float(os.environ.get("PARSE_INLINE_MS", "1.0"))
+# Worker processes; 0 parses everything inline.
+PARSE_WORKERS = int(os.environ.get("PARSE_WORKERS", "0"))
+# Weight of the newest sample in an extractor's cost-per-byte estimate.
+COST_ALPHA = 0.2
+
+SORIANA_SELECTORS = (".price .sales .value", ".product-tile .price .value", "[data-price]")
+SORIANA_NAME_SELECTORS = (".price .sales .value", ".product-tile .price .value")
+
+_NEXT_DATA = re.compile(r'<script[^>]*id="__NEXT_DATA__"[^>]*>(.*?)</script>', re.S)
+
+Body = Union[str, bytes]
+
+
+# --- Extractors (top-level so worker processes can unpickle them) ---
+
+def vtex_price(body: Body) -> Optional[float]:
+    """Price of the first SKU in a VTEX catalog search response (Chedraui)."""
+    data = json.loads(body)
+    if not data:
+        return None
+    return float(data[0]['items'][0]['sellers'][0]['commertialOffer']['Price'])
+
+
+def soriana_price(body: Body, selectors: Sequence[str] = SORIANA_SELECTORS) -> Optional[float]:
+    """Price of the first match of `selectors` in a Soriana search page."""
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(body, 'html.parser')
+    for selector in selectors:
+        element = soup.select_one(selector)
+        if element:
+            return float(element.get_text(strip=True).replace("$", "").replace(",", ""))
+    return None
+
+
+def lacomer_price(body: Body) -> Optional[float]:
+    """`artPrven` of a La Comer article detail response, if positive."""
+    data = json.loads(body)
+    if 'estrucArti' in data and data['estrucArti']:
+        price = float(data['estrucArti'].get('artPrven', 0))
+        if price > 0:
+            return price
+    return None
+
+
+def next_data_price(next_data: Dict[str, Any]) -> Optional[float]:
+    """Product price from a Walmart/Bodega `__NEXT_DATA__` object."""
+    product_data = next_data['props']['pageProps']['initialData']['data']['product']
+    return next_data_price_info(product_data['price']['price'])
+
+
+def next_data_price_info(price_info: Dict[str, Any]) -> Optional[float]:
+    """Price from the `price.price` object of a Walmart/Bodega product (page data or in-page batch)."""
+    return float(price_info.get('price') or 0) or float(price_info.get('leadPrice') or 0) or None
+
+
+def next_data_html_price(body: Body) -> Optional[float]:
+    """Product price from the `__NEXT_DATA__` script of a Walmart/Bodega product page."""
+    text = body.decode("utf-8", "replace") if isinstance(body, bytes) else body
+    match = _NEXT_DATA.search(text)
+    if not match:
+        return None
+    return next_data_price(json.loads(match.group(1)))
+
+
+class ParseStats:
+    __slots__ = ("inline", "pooled", "inline_s", "pooled_s", "pooled_bytes")
+
+    def __init__(self):
+        self.inline = 0
+        self.pooled = 0
+        self.inline_s = 0.0
+        self.pooled_s = 0.0
+        self.pooled_bytes = 0
+
+    def summary(self) -> str:
+        parts = [f"{self.inline} inline ({self.inline_s * 1000:.0f}ms on loop)"]
+        if self.pooled:
+            parts.append(f"{self.pooled} pooled ({self.pooled_bytes / 1e6:.1f}MB shipped, {self.pooled_s:.1f}s wall)")
+        return ", ".join(parts)
+
+
+class ParseExecutor:
+    """
+    Runs extractors on raw bodies, in a process pool when they are expensive
+    and inline when the round-trip would cost more than parsing. An
+    extractor runs inline until its cost per byte has been measured. The
+    pool starts on first use; with 0 workers everything is parsed inline.
+    """
+
+    def __init__(self, workers: int = PARSE_WORKERS, inline_bytes: int = PARSE_INLINE_BYTES,
+                 inline_ms: float = PARSE_INLINE_MS):
+        self.workers = workers
+        self.inline_bytes = inline_bytes
+        self.inline_ms = inline_ms
+        self.stats = ParseStats()
+        # Seconds per byte of parsing inline, per extractor name.
+        self.cost_per_byte: Dict[str, float] = {}
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def _executor(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # forkserver: workers do not inherit the loop, the browser or the logging thread.
+            method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context(method))
+            logger.info(f"[Parse] Started {self.workers} parse workers ({method}).")
+        return self._pool
+
+    def offload(self, extractor: Callable, size: int) -> bool:
+        """True when `extractor` on `size` bytes should run in the pool."""
+        if self.workers <= 0 or size < self.inline_bytes:
+            return False
+        cost = self.cost_per_byte.get(extractor.__name__)
+        return cost is not None and cost * size * 1000 > self.inline_ms
+
+    def _observe(self, extractor: Callable, size: int, elapsed_s: float):
+        sample = elapsed_s / max(size, 1)
+        previous = self.cost_per_byte.get(extractor.__name__)
+        self.cost_per_byte[extractor.__name__] = sample if previous is None else \
+            previous + COST_ALPHA * (sample - previous)
+
+    async def parse(self, extractor: Callable[..., Optional[float]], body: Body, *args) -> Optional[float]:
+        """Returns `extractor(body, *args)`; exceptions propagate as if it ran inline."""
+        started = time.perf_counter()
+        if not self.offload(extractor, len(body)):
+            try:
+                return extractor(body, *args)
+            finally:
+                elapsed = time.perf_counter() - started
+                if len(body) >= self.inline_bytes:
+                    self._observe(extractor, len(body), elapsed)
+                self.stats.inline += 1
+                self.stats.inline_s += elapsed
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self._executor(), extractor, body, *args)
+        finally:
+            self.stats.pooled += 1
+            self.stats.pooled_bytes += len(body)
+            self.stats.pooled_s += time.perf_counter() - started
+
+    def close(self):
+        if self._pool:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
@@ -0,0 +1,315 @@
+"""
+Run profiler for main.py (--profile).
+
+Four views of one run:
+  - Stack samples: a background thread samples the event loop thread's
+    stack every PROFILE_INTERVAL_MS. Each sample is rooted at the asyncio
+    task that was running (or "[idle]" while the loop waits in select), so
+    coroutine work is attributed to its task instead of to the loop
+    internals. Written as collapsed stacks (`<dir>/profile-<ts>.folded`),
+    the input format of flamegraph.pl, speedscope and inferno.
+  - Loop lag: a probe sleeps PROFILE_LAG_INTERVAL_MS and measures how late
+    it wakes up, i.e. how long the loop was blocked.
+  - Slow callbacks: asyncio debug mode reports every callback or task step
+    that held the loop longer than PROFILE_SLOW_CALLBACK_MS.
+  - Tasks: wall time (creation to completion) and CPU time (summed over
+    the task's steps) per coroutine, via a task factory.
+
+The top-N summary (`<dir>/profile-<ts>.txt`) is also logged at the end.
+"""
+import os
+import re
+import sys
+import time
+import asyncio
+import logging
+import threading
+import statistics
+import collections.abc
+from collections import Counter, defaultdict
+from typing import Optional, Dict, List
+
+logger = logging.getLogger(__name__)
+
+PROFILE_DIR = os.path.join(os.environ.get("SCRAPER_CACHE_DIR", ".cache"), "profile")
+PROFILE_INTERVAL_MS = float(os.environ.get("PROFILE_INTERVAL_MS", "5"))
+PROFILE_LAG_INTERVAL_MS = float(os.environ.get("PROFILE_LAG_INTERVAL_MS", "100"))
+PROFILE_SLOW_CALLBACK_MS = float(os.environ.get("PROFILE_SLOW_CALLBACK_MS", "100"))
+PROFILE_TOP = int(os.environ.get("PROFILE_TOP", "15"))
+
+_ASYNCIO_DIR = os.path.dirname(asyncio.__file__)
+_SELECTORS_FILE = os.path.basename(getattr(sys.modules.get("selectors"), "__file__", "selectors.py"))
+IDLE = "[idle]"
+CALLBACKS = "[callbacks]"
+# Source tracebacks asyncio debug mode captures for every future and handle;
+# counted apart so they do not show up as the scraper's own hot paths.
+DEBUG_OVERHEAD = "[asyncio-debug]"
+_TASK_CORO = re.compile(r"coro=<(\S+)(?: running at (\S+?:\d+))?>")
+
+
+def frame_label(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def collapse_stack(frame, task_label: Optional[str]) -> str:
+    """
+    Collapsed stack of one sample, rooted at the running task. Frames of the
+    loop machinery (asyncio.run, run_forever, _run_once, Handle._run) are dropped.
+    """
+    codes = []
+    while frame is not None:
+        codes.append(frame.f_code)
+        frame = frame.f_back
+    codes.reverse()
+    if codes and os.path.basename(codes[-1].co_filename) == _SELECTORS_FILE:
+        return IDLE
+    if any(code.co_name == "extract_stack" for code in codes):
+        return DEBUG_OVERHEAD
+    # Everything up to the last loop dispatch frame is the same for every sample.
+    start = 0
+    for index, code in enumerate(codes):
+        if code.co_filename.startswith(_ASYNCIO_DIR) and code.co_name in ("_run", "_run_once", "run_forever"):
+            start = index + 1
+    frames = [frame_label(code) for code in codes[start:] if code.co_filename != __file__]
+    return ";".join([task_label or CALLBACKS] + frames)
+
+
+def callback_label(handle: str) -> str:
+    """Groups asyncio handle reprs: a task step by its coroutine and line, other callbacks by their repr."""
+    match = _TASK_CORO.search(handle)
+    if not match:
+        return handle[:160]
+    where = f" at {os.path.basename(match.group(2))}" if match.group(2) else ""
+    return f"task step {match.group(1)}{where}"
+
+
+class TaskStats:
+    __slots__ = ("tasks", "wall_s", "cpu_s", "steps", "max_step_s")
+
+    def __init__(self):
+        self.tasks = 0
+        self.wall_s = 0.0
+        self.cpu_s = 0.0
+        self.steps = 0
+        self.max_step_s = 0.0
+
+
+class TimedCoroutine(collections.abc.Coroutine):
+    """Wraps a task's coroutine and adds the CPU time of each step to its TaskStats."""
+
+    def __init__(self, coro, stats: TaskStats):
+        self._coro = coro
+        self._stats = stats
+        self.__qualname__ = getattr(coro, "__qualname__", type(coro).__name__)
+        self.__name__ = getattr(coro, "__name__", self.__qualname__)
+
+    def _step(self, method, *args):
+        started = time.thread_time()
+        try:
+            return method(*args)
+        finally:
+            elapsed = time.thread_time() - started
+            self._stats.cpu_s += elapsed
+            self._stats.steps += 1
+            self._stats.max_step_s = max(self._stats.max_step_s, elapsed)
+
+    def send(self, value):
+        return self._step(self._coro.send, value)
+
+    def throw(self, *args):
+        return self._step(self._coro.throw, *args)
+
+    def close(self):
+        return self._coro.close()
+
+    def __await__(self):
+        return self._coro.__await__()
+
+    def __getattr__(self, name):
+        # cr_frame, cr_code, cr_running... for asyncio's task repr and stack helpers
+        return getattr(self._coro, name)
+
+
+class _SlowCallbackFilter(logging.Filter):
+    """
+    Collects asyncio's debug-mode 'Executing <handle> took N seconds' warnings
+    into the profile instead of the log.
+    """
+
+    def __init__(self, profiler: "RunProfiler"):
+        super().__init__()
+        self.profiler = profiler
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if isinstance(record.msg, str) and record.msg.startswith("Executing %s took") and len(record.args or ()) == 2:
+            handle, seconds = record.args
+            self.profiler.slow_callbacks[callback_label(str(handle))].append(float(seconds))
+            return False
+        return True
+
+
+class RunProfiler:
+    """Use as `async with RunProfiler(directory): ...` around the profiled work."""
+
+    def __init__(self, directory: str = PROFILE_DIR, interval_ms: float = PROFILE_INTERVAL_MS,
+                 lag_interval_ms: float = PROFILE_LAG_INTERVAL_MS,
+                 slow_callback_ms: float = PROFILE_SLOW_CALLBACK_MS, top: int = PROFILE_TOP):
+        self.directory = directory
+        self.interval_s = interval_ms / 1000
+        self.lag_interval_s = lag_interval_ms / 1000
+        self.slow_callback_s = slow_callback_ms / 1000
+        self.top = top
+        self.samples: Counter = Counter()
+        self.lags: List[float] = []
+        # Durations (s) of slow callbacks per callback_label()
+        self.slow_callbacks: Dict[str, List[float]] = defaultdict(list)
+        self.tasks: Dict[str, TaskStats] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._stop = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+        self._lag_task: Optional[asyncio.Task] = None
+        self._slow_filter = _SlowCallbackFilter(self)
+        self._previous_factory = None
+        self._previous_debug = False
+        self._started_wall = 0.0
+        self._started_cpu = 0.0
+        self.wall_s = 0.0
+        self.cpu_s = 0.0
+
+    # --- Task accounting ---
+
+    def _task_factory(self, loop, coro, **kwargs):
+        name = getattr(coro, "__qualname__", type(coro).__name__)
+        stats = self.tasks.setdefault(name, TaskStats())
+        stats.tasks += 1
+        task = asyncio.Task(TimedCoroutine(coro, stats), loop=loop, **kwargs)
+        created = time.perf_counter()
+
+        def on_done(_):
+            stats.wall_s += time.perf_counter() - created
+        task.add_done_callback(on_done)
+        return task
+
+    # --- Samplers ---
+
+    def _current_task_label(self) -> Optional[str]:
+        # Read without the loop's cooperation; a dict lookup is atomic under the GIL.
+        task = asyncio.tasks._current_tasks.get(self._loop)
+        if task is None:
+            return None
+        coro = task.get_coro()
+        return f"task:{getattr(coro, '__qualname__', task.get_name())}"
+
+    def _sample_loop(self):
+        while not self._stop.wait(self.interval_s):
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is not None:
+                self.samples[collapse_stack(frame, self._current_task_label())] += 1
+
+    async def _probe_lag(self):
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.lag_interval_s)
+            self.lags.append(max(time.perf_counter() - started - self.lag_interval_s, 0.0))
+
+    # --- Lifecycle ---
+
+    async def __aenter__(self) -> "RunProfiler":
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._started_wall = time.perf_counter()
+        self._started_cpu = time.process_time()
+        # The probe is created before the factory so it is not counted as a task.
+        self._lag_task = asyncio.ensure_future(self._probe_lag())
+        self._previous_factory = self._loop.get_task_factory()
+        self._loop.set_task_factory(self._task_factory)
+        self._previous_debug = self._loop.get_debug()
+        self._loop.set_debug(True)
+        self._loop.slow_callback_duration = self.slow_callback_s
+        logging.getLogger("asyncio").addFilter(self._slow_filter)
+        self._sampler = threading.Thread(target=self._sample_loop, name="profiler-sampler", daemon=True)
+        self._sampler.start()
+        logger.info(f"[Profile] Sampling every {self.interval_s * 1000:g}ms, writing to {self.directory}")
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self._stop.set()
+        self._sampler.join()
+        self._lag_task.cancel()
+        self._loop.set_task_factory(self._previous_factory)
+        self._loop.set_debug(self._previous_debug)
+        logging.getLogger("asyncio").removeFilter(self._slow_filter)
+        self.wall_s = time.perf_counter() - self._started_wall
+        self.cpu_s = time.process_time() - self._started_cpu
+        try:
+            self.write()
+        except OSError as e:
+            logger.warning(f"[Profile] Could not write profile: {e}")
+        return False
+
+    # --- Output ---
+
+    def hot_paths(self) -> Dict[str, List[tuple]]:
+        """Top functions by self samples (leaf) and inclusive samples (anywhere on the stack)."""
+        own: Counter = Counter()
+        inclusive: Counter = Counter()
+        for stack, count in self.samples.items():
+            if stack == DEBUG_OVERHEAD:
+                continue
+            frames = stack.split(";")
+            own[frames[-1]] += count
+            for frame in set(frames):
+                inclusive[frame] += count
+        return {"self": own.most_common(self.top), "inclusive": inclusive.most_common(self.top)}
+
+    def summary_lines(self) -> List[str]:
+        total = sum(self.samples.values()) or 1
+        idle = self.samples.get(IDLE, 0)
+        overhead = self.samples.get(DEBUG_OVERHEAD, 0)
+        lines = [
+            f"Run: {self.wall_s:.1f}s wall, {self.cpu_s:.1f}s CPU; {total} samples, "
+            f"loop busy {100 * (total - idle) / total:.0f}% (asyncio debug overhead {100 * overhead / total:.0f}%)",
+        ]
+        if self.lags:
+            ordered = sorted(self.lags)
+            pick = lambda q: ordered[min(int(q * len(ordered)), len(ordered) - 1)] * 1000
+            lines.append(f"Loop lag: {len(ordered)} probes, median {statistics.median(ordered) * 1000:.1f}ms, "
+                         f"p95 {pick(0.95):.1f}ms, p99 {pick(0.99):.1f}ms, max {ordered[-1] * 1000:.1f}ms")
+        paths = self.hot_paths()
+        lines.append(f"Top {self.top} self:")
+        lines += [f"  {100 * count / total:5.1f}%  {frame}" for frame, count in paths["self"]]
+        lines.append(f"Top {self.top} inclusive:")
+        lines += [f"  {100 * count / total:5.1f}%  {frame}" for frame, count in paths["inclusive"]]
+        if self.slow_callbacks:
+            durations = [d for values in self.slow_callbacks.values() for d in values]
+            lines.append(f"Slow callbacks (>{self.slow_callback_s * 1000:g}ms): {len(durations)}, "
+                         f"{sum(durations):.1f}s total")
+            ranked = sorted(self.slow_callbacks.items(), key=lambda item: -sum(item[1]))[:self.top]
+            lines += [f"  {sum(values):7.2f}s {len(values):5d}x  max {max(values) * 1000:.0f}ms  {label}"
+                      for label, values in ranked]
+        if self.tasks:
+            lines.append("Tasks (by CPU):")
+            ranked = sorted(self.tasks.items(), key=lambda item: -item[1].cpu_s)[:self.top]
+            lines += [f"  {stats.cpu_s:7.2f}s CPU {stats.wall_s:8.1f}s wall {stats.tasks:5d} tasks "
+                      f"{stats.steps:7d} steps  max step {stats.max_step_s * 1000:.0f}ms  {name}"
+                      for name, stats in ranked]
+        return lines
+
+    def write(self) -> Dict[str, str]:
+        os.makedirs(self.directory, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        paths = {
+            "folded": os.path.join(self.directory, f"profile-{stamp}.folded"),
+            "summary": os.path.join(self.directory, f"profile-{stamp}.txt"),
+        }
+        with open(paths["folded"], "w", encoding="utf-8") as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+        lines = self.summary_lines()
+        with open(paths["summary"], "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        for line in lines:
+            logger.info(f"[Profile] {line}")
+        logger.info(f"[Profile] Flamegraph input: {paths['folded']} (e.g. flamegraph.pl {paths['folded']} > flame.svg)")
+        return paths
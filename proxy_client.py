@@ -1,39 +1,77 @@
 import logging
 import os
-from typing import Optional, Dict, Any
-from supabase import create_client, Client
+from typing import TYPE_CHECKING, Optional, Dict, Any, Set, Callable
 from dotenv import load_dotenv
 
+if TYPE_CHECKING:
+    from db import Database
+
 load_dotenv()
 logger = logging.getLogger(__name__)
 
+# Hand out unproven proxies when no proxy has passed a retailer's lane (off: no proxy for that lane)
+PROXY_LANE_FALLBACK = os.environ.get("PROXY_LANE_FALLBACK", "").lower() in ("1", "true", "yes")
+
 class ProxyRotator:
-    def __init__(self):
+    def __init__(self, db: Optional["Database"] = None, lane_fallback: bool = PROXY_LANE_FALLBACK):
+        """
+        Pass the caller's Database to share one connection pool.
+        Without one, a Database is connected from the environment on first use.
+        `lane_fallback` hands out unproven proxies for lanes no proxy has passed.
+        """
         self.supabase_url = os.environ.get("SUPABASE_URL")
         self.supabase_key = os.environ.get("SUPABASE_KEY")
-        self.client: Optional[Client] = None
-        
-        if self.supabase_url and self.supabase_key:
-            self.client = create_client(self.supabase_url, self.supabase_key)
-        else:
-            logger.error("Supabase credentials missing for ProxyRotator.")
-
-    def get_proxy(self) -> Optional[Dict[str, Any]]:
+        self._db: Optional["Database"] = db
+        self._db_checked = db is not None
+        # Proxies burned during this run; never handed out again until restart.
+        self.excluded: Set[int] = set()
+        # Optional callback(proxy_id, verdict) used by the run journal.
+        self.verdict_hook: Optional[Callable[[int, str], None]] = None
+        self.lane_fallback = lane_fallback
+        # Lanes with no proven proxy, already warned about this run.
+        self._unproven_lanes: Set[str] = set()
+        # Whether the missing cpi_proxies.lanes column was already reported.
+        self._lanes_missing = False
+
+    async def database(self) -> Optional["Database"]:
+        if not self._db_checked:
+            self._db_checked = True
+            if self.supabase_url and self.supabase_key:
+                from db import Database
+                self._db = await Database.connect(self.supabase_url, self.supabase_key)
+            else:
+                logger.error("Supabase credentials missing for ProxyRotator.")
+        return self._db
+
+    def attach(self, db: "Database"):
+        """Shares an existing Database instead of opening a second pool."""
+        self._db = db
+        self._db_checked = True
+
+    async def get_proxy(self, lane: Optional[str] = None) -> Optional[Dict[str, Any]]:
         """
         Fetches the best available proxy from Supabase (Americas region).
+        With a lane (e.g. "walmart"), only proxies the harvester proved for that
+        retailer are returned; if none is proven yet, None is returned (any
+        active proxy with `lane_fallback`).
         Returns dict with 'proxy_id', 'ip_address', 'port', 'protocol', 'url'.
         """
-        if not self.client:
+        db = await self.database()
+        if not db:
             return None
 
         try:
             # Direct query to bypass RPC country restriction - get any active proxy
-            response = self.client.table("cpi_proxies") \
+            query = db.table("cpi_proxies") \
                 .select("*") \
-                .eq("status", "active") \
+                .eq("status", "active")
+            if lane:
+                query = query.contains("lanes", {lane: True})
+            if self.excluded:
+                query = query.not_.in_("proxy_id", list(self.excluded))
+            response = await db.execute("get_proxy", query \
                 .order("last_checked", desc=True) \
-                .limit(1) \
-                .execute()
+                .limit(1))
                 
             if response.data and len(response.data) > 0:
                 proxy_record = response.data[0]
@@ -44,6 +82,13 @@ class ProxyRotator:
                     "proxy_id": proxy_record['proxy_id']
                 }
                 return self.current_proxy
+            elif lane:
+                if lane not in self._unproven_lanes:
+                    self._unproven_lanes.add(lane)
+                    action = "using unproven proxies" if self.lane_fallback else \
+                        "no proxy for it until the harvester validates one (PROXY_LANE_FALLBACK=1 uses unproven proxies)"
+                    logger.warning(f"No proxy proven for lane '{lane}', {action}.")
+                return await self._without_lane()
             else:
                 logger.warning("No active proxies available in DB.")
                 # Note: self.current_proxy is not initialized in __init__ in the original code,
@@ -52,17 +97,38 @@ class ProxyRotator:
                 return None
 
         except Exception as e:
+            if lane and "lanes" in str(e):
+                if not self._lanes_missing:
+                    self._lanes_missing = True
+                    logger.error(f"cpi_proxies has no usable 'lanes' column; apply scripts/add_proxy_lanes.sql "
+                                 f"in Supabase ({e}).")
+                return await self._without_lane()
             logger.error(f"Error fetching proxy: {e}")
             # Note: self.current_proxy is not initialized in __init__ in the original code,
             # but the provided snippet uses it. Assuming it's intended to be an instance variable.
             self.current_proxy = None
             return None
 
-    def report_failure(self, proxy_id: int):
+    async def _without_lane(self) -> Optional[Dict[str, Any]]:
+        """Any active proxy with `lane_fallback`, otherwise None."""
+        if self.lane_fallback:
+            return await self.get_proxy()
+        self.current_proxy = None
+        return None
+
+    def exclude(self, proxy_id: int):
+        """Stops handing out a proxy for the rest of this run."""
+        self.excluded.add(proxy_id)
+
+    async def report_failure(self, proxy_id: int):
         """Increments fail_count. If > 5, marks as dead."""
-        if not self.client or not proxy_id:
+        db = await self.database()
+        if not db or not proxy_id:
             return
 
+        if self.verdict_hook:
+            self.verdict_hook(proxy_id, "failure")
+
         try:
             # We can do this via a direct update or another RPC. 
             # Direct update for simplicity.
@@ -72,36 +138,42 @@ class ProxyRotator:
             # For now, simple read-modify-write or just blind update.
             
             # Fetch current
-            res = self.client.table("cpi_proxies").select("fail_count").eq("proxy_id", proxy_id).execute()
+            res = await db.execute("proxy_fail_count",
+                                   db.table("cpi_proxies").select("fail_count").eq("proxy_id", proxy_id))
             if res.data:
                 current_fail = res.data[0]['fail_count'] or 0
                 new_fail = current_fail + 1
                 status = 'dead' if new_fail > 5 else 'active'
                 
-                self.client.table("cpi_proxies").update({
+                await db.execute("report_proxy_failure", db.table("cpi_proxies").update({
                     "fail_count": new_fail,
                     "status": status
-                }).eq("proxy_id", proxy_id).execute()
+                }).eq("proxy_id", proxy_id))
                 
         except Exception as e:
             logger.error(f"Failed to report failure for proxy {proxy_id}: {e}")
 
-    def report_success(self, proxy_id: int):
+    async def report_success(self, proxy_id: int):
         """Resets fail_count and increments success_count."""
-        if not self.client or not proxy_id:
+        db = await self.database()
+        if not db or not proxy_id:
             return
 
+        if self.verdict_hook:
+            self.verdict_hook(proxy_id, "success")
+
         try:
             # Atomic increment for success_count would be better, but...
-            res = self.client.table("cpi_proxies").select("success_count").eq("proxy_id", proxy_id).execute()
+            res = await db.execute("proxy_success_count",
+                                   db.table("cpi_proxies").select("success_count").eq("proxy_id", proxy_id))
             if res.data:
                 current_success = res.data[0]['success_count'] or 0
                 
-                self.client.table("cpi_proxies").update({
+                await db.execute("report_proxy_success", db.table("cpi_proxies").update({
                     "fail_count": 0,
                     "success_count": current_success + 1,
                     "status": "active" # Ensure it stays active
-                }).eq("proxy_id", proxy_id).execute()
+                }).eq("proxy_id", proxy_id))
                 
         except Exception as e:
             logger.error(f"Failed to report success for proxy {proxy_id}: {e}")
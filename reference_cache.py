@@ -0,0 +1,43 @@
+import os
+import json
+import time
+import logging
+from typing import Optional, Dict, Any, List
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = os.environ.get("SCRAPER_CACHE_DIR", ".cache")
+REFERENCE_CACHE_PATH = os.path.join(CACHE_DIR, "reference.json")
+# Establishments rarely change; refetch them at most once a day by default.
+REFERENCE_CACHE_TTL = int(os.environ.get("REFERENCE_CACHE_TTL", "86400"))
+
+
+def load_reference(path: str = REFERENCE_CACHE_PATH, ttl: int = REFERENCE_CACHE_TTL) -> Optional[Dict[str, Any]]:
+    """
+    Returns the cached reference data if it exists and is younger than `ttl` seconds:
+    {"fetched_at", "establishments", "registry"} where registry maps
+    establishment_id (as str) to the SCRAPER_REGISTRY key that handles it.
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+
+    age = time.time() - data.get("fetched_at", 0)
+    if age > ttl or not data.get("establishments"):
+        return None
+    return data
+
+
+def save_reference(establishments: List[Dict[str, Any]], registry: Dict[str, str],
+                   path: str = REFERENCE_CACHE_PATH):
+    data = {"fetched_at": time.time(), "establishments": establishments, "registry": registry}
+    try:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.warning(f"Could not write reference cache {path}: {e}")
@@ -0,0 +1,95 @@
+import re
+from typing import TYPE_CHECKING, Dict
+
+if TYPE_CHECKING:
+    from playwright.async_api import BrowserContext, Route
+
+# Tracker, ad and analytics hosts. Subdomains are blocked too.
+# Do NOT add bot-protection hosts (e.g. PerimeterX on Walmart): blocking them fails the challenge.
+TRACKER_DOMAINS = [
+    "doubleclick.net", "googlesyndication.com", "googleadservices.com", "googletagmanager.com",
+    "google-analytics.com", "analytics.google.com", "adservice.google.com", "adservice.google.com.mx",
+    "facebook.net", "connect.facebook.com", "hotjar.com", "hotjar.io", "clarity.ms", "bat.bing.com",
+    "nr-data.net", "newrelic.com", "criteo.com", "criteo.net", "taboola.com", "outbrain.com",
+    "scorecardresearch.com", "quantserve.com", "adsrvr.org", "pubmatic.com", "rubiconproject.com",
+    "amazon-adsystem.com", "analytics.tiktok.com", "cdn.segment.com", "api.segment.io",
+    "amplitude.com", "mixpanel.com", "optimizely.com", "branch.io", "braze.com", "onesignal.com",
+    "tealiumiq.com", "tiqcdn.com", "demdex.net", "omtrdc.net", "everesttech.net", "mathtag.com",
+]
+# Hosts that only serve images/media for the storefronts.
+# Not gstatic.com: it also serves Google's page scripts and reCAPTCHA (the Walmart flow starts on Google).
+MEDIA_DOMAINS = ["walmartimages.com", "walmartimages.com.mx", "ytimg.com"]
+
+BLOCKED_HOST_PATTERN = re.compile(
+    r"^https?://([^/?#]*\.)?(" + "|".join(re.escape(d) for d in TRACKER_DOMAINS + MEDIA_DOMAINS) + r")(:\d+)?([/?#]|$)",
+    re.IGNORECASE
+)
+# Static assets by file extension, with or without a query string.
+BLOCKED_ASSET_PATTERN = re.compile(
+    r"\.(png|jpe?g|gif|webp|avif|svg|ico|bmp|woff2?|ttf|otf|eot|css|mp4|webm|mp3|m4a|ogg)([?#]|$)",
+    re.IGNORECASE
+)
+
+# Typical transfer sizes (bytes), used to estimate the bandwidth a blocked request would have cost.
+ESTIMATED_BYTES = {"tracker": 45_000, "image": 35_000, "font": 40_000, "stylesheet": 30_000, "media": 400_000}
+_ASSET_CATEGORY = {
+    "woff": "font", "woff2": "font", "ttf": "font", "otf": "font", "eot": "font",
+    "css": "stylesheet", "mp4": "media", "webm": "media", "mp3": "media", "m4a": "media", "ogg": "media",
+}
+
+
+class BlockStats:
+    """Requests blocked (and bytes estimated saved) for one browser context."""
+
+    def __init__(self):
+        self.requests: Dict[str, int] = {}
+        self.estimated_bytes = 0
+
+    def add(self, category: str):
+        self.requests[category] = self.requests.get(category, 0) + 1
+        self.estimated_bytes += ESTIMATED_BYTES.get(category, 0)
+
+    def merge(self, other: "BlockStats"):
+        for category, count in other.requests.items():
+            self.requests[category] = self.requests.get(category, 0) + count
+        self.estimated_bytes += other.estimated_bytes
+
+    @property
+    def total(self) -> int:
+        return sum(self.requests.values())
+
+    def summary(self) -> str:
+        parts = ", ".join(f"{count} {category}" for category, count in sorted(self.requests.items()))
+        return f"{self.total} requests ({parts or 'none'}), ~{self.estimated_bytes / 1024:.0f} KB saved"
+
+
+# Totals across every context of the run.
+run_totals = BlockStats()
+
+
+def asset_category(url: str) -> str:
+    match = BLOCKED_ASSET_PATTERN.search(url)
+    if not match:
+        return "tracker"
+    return _ASSET_CATEGORY.get(match.group(1).lower(), "image")
+
+
+async def install_blocking(context: "BrowserContext") -> BlockStats:
+    """
+    Blocks trackers, ads and static assets on a context with pattern-scoped routes.
+
+    Playwright only intercepts requests whose URL matches a route pattern, so
+    every other request (documents, XHR, first-party scripts) goes straight
+    through the browser without a round-trip into Python.
+    """
+    stats = BlockStats()
+
+    async def abort(route: "Route"):
+        category = asset_category(route.request.url)
+        stats.add(category)
+        run_totals.add(category)
+        await route.abort()
+
+    await context.route(BLOCKED_HOST_PATTERN, abort)
+    await context.route(BLOCKED_ASSET_PATTERN, abort)
+    return stats
@@ -0,0 +1,196 @@
+import os
+import json
+import logging
+from datetime import datetime
+from typing import Optional, Dict, Any, List, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+JOURNAL_PATH = os.environ.get("RUN_JOURNAL_PATH", "run_journal.jsonl")
+
+# A proxy that fails this many times in one run (without a success in between)
+# is considered burned and is not handed out again until the run finishes.
+PROXY_BURN_THRESHOLD = 3
+
+Pair = Tuple[int, int]
+
+
+class RunJournal:
+    """
+    Local append-only journal of a scraping run.
+
+    Every event is written as one JSON line and flushed immediately, so a run
+    killed by the workflow timeout leaves behind everything it learned:
+    planned (pending) pairs, completed and failed pairs, proxy verdicts and
+    prices that were scraped but not yet persisted. A restarted run in the
+    same month replays the journal and resumes from where it stopped.
+    """
+
+    def __init__(self, path: str = JOURNAL_PATH):
+        self.path = path
+        self.run_id: Optional[str] = None
+        self.resumed = False
+        self.products: Dict[int, Dict[str, Any]] = {}
+        self.pending: Set[Pair] = set()
+        self.completed: Set[Pair] = set()
+        self.failed: Set[Pair] = set()
+        self.results: Dict[Pair, float] = {}
+        self.proxy_failures: Dict[int, int] = {}
+        self._fh = None
+
+    # --- Lifecycle ---
+
+    def open(self, resume: bool = True) -> bool:
+        """
+        Opens the journal for the current month.
+        Returns True if an unfinished run was found and resumed.
+        """
+        month = datetime.now().strftime("%Y-%m")
+        if resume and os.path.exists(self.path):
+            self._replay(month)
+
+        if self.resumed:
+            logger.info(
+                f"Resuming run {self.run_id} from journal: {len(self.completed)} completed, "
+                f"{len(self.failed)} failed, {len(self.open_pairs())} pending, "
+                f"{len(self.results)} unpersisted results, {len(self.burned_proxies())} burned proxies."
+            )
+            self._fh = open(self.path, "a", encoding="utf-8")
+            self._write({"event": "run_resumed"})
+        else:
+            self.run_id = datetime.now().strftime("%Y%m%dT%H%M%S")
+            self._fh = open(self.path, "w", encoding="utf-8")
+            self._write({"event": "run_started", "run_id": self.run_id, "month": month})
+        return self.resumed
+
+    def close(self, finished: bool = True):
+        """Closes the journal. A finished run will not be resumed."""
+        if not self._fh:
+            return
+        if finished:
+            self._write({"event": "run_finished"})
+        self._fh.close()
+        self._fh = None
+
+    def _replay(self, month: str):
+        events: List[Dict[str, Any]] = []
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        events.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        # A torn last line from a killed run; everything before it is valid.
+                        logger.warning("Ignoring truncated journal line.")
+        except OSError as e:
+            logger.warning(f"Could not read run journal {self.path}: {e}")
+            return
+
+        if not events or events[0].get("event") != "run_started":
+            return
+        if events[0].get("month") != month:
+            logger.info("Run journal belongs to a previous month. Starting fresh.")
+            return
+        if any(e.get("event") == "run_finished" for e in events):
+            return
+
+        self.run_id = events[0].get("run_id")
+        for event in events[1:]:
+            self._apply(event)
+        self.resumed = True
+
+    def _apply(self, event: Dict[str, Any]):
+        kind = event.get("event")
+        if kind == "proxy":
+            proxy_id = event["proxy_id"]
+            if event["verdict"] == "success":
+                self.proxy_failures.pop(proxy_id, None)
+            else:
+                self.proxy_failures[proxy_id] = self.proxy_failures.get(proxy_id, 0) + 1
+            return
+
+        if kind == "pending":
+            product = event["product"]
+            self.products[product["product_id"]] = product
+            for est_id in event["establishment_ids"]:
+                self.pending.add((product["product_id"], est_id))
+            return
+
+        if kind not in ("result", "completed", "failed"):
+            return
+
+        pair = (event["product_id"], event["establishment_id"])
+        if kind == "result":
+            self.results[pair] = event["price"]
+        elif kind == "completed":
+            self.completed.add(pair)
+            self.results.pop(pair, None)
+        elif kind == "failed":
+            self.failed.add(pair)
+
+    def _write(self, event: Dict[str, Any]):
+        if not self._fh:
+            return
+        event["ts"] = datetime.now().isoformat()
+        self._fh.write(json.dumps(event, default=str) + "\n")
+        self._fh.flush()
+
+    # --- Recording ---
+
+    def record_pending(self, product: Dict[str, Any], establishment_ids: List[int]):
+        event = {"event": "pending", "product": product, "establishment_ids": establishment_ids}
+        self._apply(event)
+        self._write(event)
+
+    def record_result(self, product_id: int, establishment_id: int, price: float):
+        """Records a scraped price before it is persisted."""
+        event = {"event": "result", "product_id": product_id, "establishment_id": establishment_id, "price": price}
+        self._apply(event)
+        self._write(event)
+
+    def record_completed(self, product_id: int, establishment_id: int, reason: str):
+        event = {"event": "completed", "product_id": product_id, "establishment_id": establishment_id, "reason": reason}
+        self._apply(event)
+        self._write(event)
+
+    def record_failed(self, product_id: int, establishment_id: int, error: str):
+        event = {"event": "failed", "product_id": product_id, "establishment_id": establishment_id, "error": error}
+        self._apply(event)
+        self._write(event)
+
+    def record_proxy(self, proxy_id: int, verdict: str):
+        """Records a proxy verdict ('success' or 'failure')."""
+        event = {"event": "proxy", "proxy_id": proxy_id, "verdict": verdict}
+        self._apply(event)
+        self._write(event)
+
+    # --- Queries ---
+
+    def is_done(self, product_id: int, establishment_id: int) -> bool:
+        """True if the pair was already completed or attempted and failed in this run."""
+        pair = (product_id, establishment_id)
+        return pair in self.completed or pair in self.failed
+
+    def open_pairs(self) -> Set[Pair]:
+        return self.pending - self.completed - self.failed
+
+    def pending_products(self) -> List[Dict[str, Any]]:
+        """Products that still have open pairs, in the order they were planned."""
+        open_product_ids = {product_id for product_id, _ in self.open_pairs()}
+        return [p for pid, p in self.products.items() if pid in open_product_ids]
+
+    def last_product_id(self) -> Optional[int]:
+        """Highest planned product ID; the worklist cursor to continue from on resume."""
+        return max(self.products) if self.products else None
+
+    def is_burned(self, proxy_id: int) -> bool:
+        return self.proxy_failures.get(proxy_id, 0) >= PROXY_BURN_THRESHOLD
+
+    def unpersisted_results(self) -> Dict[Pair, float]:
+        return dict(self.results)
+
+    def burned_proxies(self) -> Set[int]:
+        return {pid for pid in self.proxy_failures if self.is_burned(pid)}
@@ -0,0 +1,213 @@
+import os
+import json
+import time
+import heapq
+import itertools
+import logging
+from typing import Optional, Dict, Any, List, Tuple, Iterator
+
+logger = logging.getLogger(__name__)
+
+STATS_PATH = os.path.join(os.environ.get("SCRAPER_CACHE_DIR", ".cache"), "retailer_stats.json")
+
+# Cost classes and their prior cost per pair (seconds) until timings are observed.
+COST_HTTP = "http"
+COST_BROWSER = "browser"
+DEFAULT_COST_S = {COST_HTTP: 5.0, COST_BROWSER: 90.0}
+DEFAULT_SUCCESS_RATE = 0.5
+# Weight of the newest observation in the exponential moving averages.
+EWMA_ALPHA = 0.2
+# Every consecutive failure of a pair halves its expected success probability.
+FAILURE_STREAK_DECAY = 0.5
+RETAILER_COUNT = 5
+# A failure streak stops mattering once the success probability hits its floor.
+MAX_FAILURE_STREAK = 6
+# Failure streaks kept; the least recently failed pairs are forgotten first.
+MAX_FAILURE_STREAKS = 50_000
+
+Pair = Tuple[int, int]
+
+
+class RetailerStats:
+    """
+    Observed per-retailer cost and yield, persisted between runs.
+    Costs and success rates are exponential moving averages; per-pair failure
+    streaks lower the success probability of pairs that keep failing.
+    """
+
+    def __init__(self, path: str = STATS_PATH):
+        self.path = path
+        self.retailers: Dict[str, Dict[str, float]] = {}
+        self.failure_streaks: Dict[str, int] = {}
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.retailers = data.get("retailers", {})
+            self.failure_streaks = data.get("failure_streaks", {})
+        except (OSError, json.JSONDecodeError):
+            pass
+
+    def save(self):
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"retailers": self.retailers, "failure_streaks": self.failure_streaks}, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning(f"Could not save retailer stats {self.path}: {e}")
+
+    def record(self, retailer: str, pair: Pair, duration_s: float, success: bool):
+        stats = self.retailers.get(retailer)
+        if stats is None:
+            stats = {"cost_s": duration_s, "success_rate": 1.0 if success else 0.0, "samples": 0}
+            self.retailers[retailer] = stats
+        else:
+            stats["cost_s"] += EWMA_ALPHA * (duration_s - stats["cost_s"])
+            stats["success_rate"] += EWMA_ALPHA * ((1.0 if success else 0.0) - stats["success_rate"])
+        stats["samples"] += 1
+
+        key = f"{pair[0]}:{pair[1]}"
+        streak = self.failure_streaks.pop(key, 0)
+        if not success:
+            # Re-inserted, so the dict stays ordered by last failure
+            self.failure_streaks[key] = min(streak + 1, MAX_FAILURE_STREAK)
+            while len(self.failure_streaks) > MAX_FAILURE_STREAKS:
+                del self.failure_streaks[next(iter(self.failure_streaks))]
+
+    def expected_cost(self, retailer: str, cost_class: str) -> float:
+        stats = self.retailers.get(retailer)
+        if stats and stats["samples"]:
+            return stats["cost_s"]
+        return DEFAULT_COST_S.get(cost_class, DEFAULT_COST_S[COST_HTTP])
+
+    def success_probability(self, retailer: str, pair: Pair) -> float:
+        stats = self.retailers.get(retailer)
+        rate = stats["success_rate"] if stats and stats["samples"] else DEFAULT_SUCCESS_RATE
+        streak = self.failure_streaks.get(f"{pair[0]}:{pair[1]}", 0)
+        # Keep a floor so no pair is starved forever.
+        return max(0.02, rate * (FAILURE_STREAK_DECAY ** streak))
+
+
+class Scheduler:
+    """
+    Cost-aware ordering of (product, establishment) pairs.
+
+    Each pair gets a value (how much the month's coverage still needs it: products
+    with fewer prices are worth more), a success probability and an expected cost
+    from observed timings. Cheap (HTTP) pairs run as products stream in, ordered
+    by expected yield per second. Expensive (browser) pairs are deferred and then
+    packed into whatever remains of the time budget, best yield per second first.
+    Deferred pairs are kept as IDs only, so memory does not grow with the
+    product rows of a streamed --all run; the caller reloads the rows
+    (`upcoming_product_ids`). Expected and actual cost/yield are tracked for
+    the end-of-run report.
+    """
+
+    def __init__(self, stats: RetailerStats, cost_classes: Dict[str, str], budget_s: Optional[float] = None):
+        self.stats = stats
+        self.cost_classes = cost_classes
+        self.budget_s = budget_s
+        self.started = time.monotonic()
+        # (-score, seq, product_id, establishment_id, expected cost)
+        self._deferred: List[Tuple[float, int, int, int, float]] = []
+        self._establishments: Dict[int, Dict[str, Any]] = {}
+        self._seq = itertools.count()
+        self.skipped_over_budget = 0
+        self.totals = {
+            cost_class: {"pairs": 0, "expected_s": 0.0, "actual_s": 0.0, "expected_ok": 0.0, "actual_ok": 0}
+            for cost_class in DEFAULT_COST_S
+        }
+
+    def cost_class(self, establishment: Dict[str, Any]) -> str:
+        return self.cost_classes.get(establishment['establishment_name'], COST_HTTP)
+
+    def estimate(self, product: Dict[str, Any], establishment: Dict[str, Any]) -> Tuple[float, float, float]:
+        """Returns (score, expected_cost_s, success_probability) for a pair."""
+        retailer = establishment['establishment_name']
+        pair = (product['product_id'], establishment['establishment_id'])
+        prices_count = product.get('prices_count') or 0
+        value = 1.0 + max(0, RETAILER_COUNT - prices_count) / RETAILER_COUNT
+        cost = self.stats.expected_cost(retailer, self.cost_class(establishment))
+        probability = self.stats.success_probability(retailer, pair)
+        return value * probability / max(cost, 0.1), cost, probability
+
+    def remaining_s(self) -> Optional[float]:
+        if self.budget_s is None:
+            return None
+        return self.budget_s - (time.monotonic() - self.started)
+
+    def plan(self, product: Dict[str, Any], establishments: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Returns the cheap establishments of a product to run now, best first.
+        Expensive ones are deferred until `drain_deferred`.
+        """
+        cheap = []
+        for establishment in establishments:
+            score, cost, _ = self.estimate(product, establishment)
+            if self.cost_class(establishment) == COST_BROWSER:
+                self._establishments[establishment['establishment_id']] = establishment
+                heapq.heappush(self._deferred, (-score, next(self._seq), product['product_id'],
+                                                establishment['establishment_id'], cost))
+            else:
+                cheap.append((-score, establishment))
+        cheap.sort(key=lambda item: item[0])
+        return [establishment for _, establishment in cheap]
+
+    def upcoming_product_ids(self, count: int) -> List[int]:
+        """Distinct product IDs of the next `count` deferred pairs, in drain order."""
+        return list(dict.fromkeys(item[2] for item in heapq.nsmallest(count, self._deferred)))
+
+    def drain_deferred(self) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """
+        Yields deferred expensive pairs as (product ID, establishment), best
+        yield per second first, while their expected cost fits in the remaining budget.
+        """
+        if self._deferred:
+            expected = sum(item[4] for item in self._deferred)
+            remaining = self.remaining_s()
+            budget_note = f", {remaining / 60:.1f} min of budget left" if remaining is not None else ""
+            logger.info(f"[Scheduler] {len(self._deferred)} browser pairs deferred, expected {expected / 60:.1f} min{budget_note}.")
+
+        while self._deferred:
+            _, _, product_id, establishment_id, cost = heapq.heappop(self._deferred)
+            remaining = self.remaining_s()
+            if remaining is not None and cost > remaining:
+                self.skipped_over_budget += 1
+                continue
+            yield product_id, self._establishments[establishment_id]
+
+    def observe(self, product: Dict[str, Any], establishment: Dict[str, Any], result: Dict[str, Any],
+                expected: Tuple[float, float, float]):
+        """Records the outcome of a pair whose scraper actually ran."""
+        if result.get("duration_s") is None:
+            return
+        _, cost, probability = expected
+        success = result["status"] in ("persisted", "not_persisted")
+        totals = self.totals[self.cost_class(establishment)]
+        totals["pairs"] += 1
+        totals["expected_s"] += cost
+        totals["actual_s"] += result["duration_s"]
+        totals["expected_ok"] += probability
+        totals["actual_ok"] += 1 if success else 0
+        self.stats.record(
+            establishment['establishment_name'],
+            (product['product_id'], establishment['establishment_id']),
+            result["duration_s"],
+            success
+        )
+
+    def report(self):
+        for cost_class, totals in self.totals.items():
+            if not totals["pairs"]:
+                continue
+            logger.info(
+                f"[Scheduler] {cost_class}: {totals['pairs']} pairs | "
+                f"time expected {totals['expected_s'] / 60:.1f} min, actual {totals['actual_s'] / 60:.1f} min | "
+                f"prices expected {totals['expected_ok']:.1f}, actual {totals['actual_ok']}"
+            )
+        if self.skipped_over_budget:
+            logger.info(f"[Scheduler] {self.skipped_over_budget} browser pairs left for the next run (over budget).")
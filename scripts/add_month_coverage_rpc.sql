@@ -0,0 +1,43 @@
+-- Monthly coverage in one round-trip, for coverage_report.py.
+-- Returns a single JSON document with the active products, the establishments and the distinct
+-- (product_id, establishment_id) pairs that have a price in the month of p_month. One JSON row is
+-- not subject to PostgREST's max-rows cap, and the month filter uses idx_cpi_prices_date.
+-- Requires manual execution in Supabase.
+
+CREATE OR REPLACE FUNCTION public.get_month_coverage(p_month DATE DEFAULT CURRENT_DATE)
+RETURNS JSON
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT json_build_object(
+        'products', (
+            SELECT COALESCE(json_agg(json_build_object(
+                'product_id', p.product_id,
+                'country_id', p.country_id,
+                'category_id', p.category_id,
+                'is_active_product', p.is_active_product,
+                'product_name', p.product_name,
+                'ean_code', p.ean_code
+            )), '[]'::json)
+            FROM public.cpi_products p
+            WHERE p.is_active_product = TRUE
+        ),
+        'establishments', (
+            SELECT COALESCE(json_agg(json_build_object(
+                'establishment_id', e.establishment_id,
+                'country_id', e.country_id,
+                'establishment_name', e.establishment_name
+            )), '[]'::json)
+            FROM public.cpi_establishments e
+        ),
+        'covered', (
+            SELECT COALESCE(json_agg(json_build_array(c.product_id, c.establishment_id)), '[]'::json)
+            FROM (
+                SELECT DISTINCT pr.product_id, pr.establishment_id
+                FROM public.cpi_prices pr
+                WHERE pr.date >= date_trunc('month', p_month)::date
+                  AND pr.date < (date_trunc('month', p_month) + INTERVAL '1 month')::date
+            ) c
+        )
+    );
+$$;
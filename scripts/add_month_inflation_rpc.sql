@@ -0,0 +1,120 @@
+-- Atomic writes of a month's inflation tables, for cpi_engine.py and cpi_incremental.py.
+-- A function body runs in one transaction: if any insert fails, every delete of the call is
+-- rolled back and the previous results of the month stay in place.
+-- Rows are passed as JSON arrays of objects with the table's column names.
+-- Requires manual execution in Supabase.
+
+-- Replaces the whole month (full runs and --rebuild).
+CREATE OR REPLACE FUNCTION public.replace_month_inflation(
+    p_year INTEGER,
+    p_month INTEGER,
+    p_cells JSONB,
+    p_category_location JSONB,
+    p_category JSONB,
+    p_real_cpi JSONB
+)
+RETURNS VOID
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_start DATE := make_date(p_year, p_month, 1);
+BEGIN
+    DELETE FROM public.cpi_annual_product_location_establishment_inflation
+    WHERE recent_date >= v_start AND recent_date < (v_start + INTERVAL '1 month')::date;
+    INSERT INTO public.cpi_annual_product_location_establishment_inflation (
+        recent_price_id, product_id, country_id, location_id, establishment_id, recent_date, historical_date,
+        days_between_measurements, recent_price_value, historical_price_value, aple_inflation_rate
+    )
+    SELECT recent_price_id, product_id, country_id, location_id, establishment_id, recent_date, historical_date,
+           days_between_measurements, recent_price_value, historical_price_value, aple_inflation_rate
+    FROM jsonb_to_recordset(p_cells) AS r(
+        recent_price_id BIGINT, product_id BIGINT, country_id BIGINT, location_id BIGINT, establishment_id BIGINT,
+        recent_date DATE, historical_date DATE, days_between_measurements INTEGER, recent_price_value NUMERIC,
+        historical_price_value NUMERIC, aple_inflation_rate NUMERIC
+    );
+
+    DELETE FROM public.cpi_category_location_inflation WHERE year = p_year AND month = p_month;
+    INSERT INTO public.cpi_category_location_inflation (country_id, category_id, location_id, cli_inflation_rate, year, month)
+    SELECT country_id, category_id, location_id, cli_inflation_rate, p_year, p_month
+    FROM jsonb_to_recordset(p_category_location) AS r(
+        country_id BIGINT, category_id BIGINT, location_id BIGINT, cli_inflation_rate NUMERIC
+    );
+
+    DELETE FROM public.cpi_category_inflation WHERE year = p_year AND month = p_month;
+    INSERT INTO public.cpi_category_inflation (country_id, category_id, ci_inflation_rate, year, month)
+    SELECT country_id, category_id, ci_inflation_rate, p_year, p_month
+    FROM jsonb_to_recordset(p_category) AS r(country_id BIGINT, category_id BIGINT, ci_inflation_rate NUMERIC);
+
+    DELETE FROM public.cpi_real_cpi WHERE year = p_year AND month = p_month;
+    INSERT INTO public.cpi_real_cpi (country_id, criterion_id, real_cpi_inflation_rate, year, month)
+    SELECT country_id, criterion_id, real_cpi_inflation_rate, p_year, p_month
+    FROM jsonb_to_recordset(p_real_cpi) AS r(country_id BIGINT, criterion_id BIGINT, real_cpi_inflation_rate NUMERIC);
+END;
+$$;
+
+-- Applies an incremental change set: removed and added cells, changed or vanished category groups
+-- (p_*_deleted hold the key columns of groups to drop), and the month's real CPI.
+CREATE OR REPLACE FUNCTION public.apply_month_inflation_increment(
+    p_year INTEGER,
+    p_month INTEGER,
+    p_removed_price_ids BIGINT[],
+    p_added_cells JSONB,
+    p_category_location JSONB,
+    p_category_location_deleted JSONB,
+    p_category JSONB,
+    p_category_deleted JSONB,
+    p_real_cpi JSONB
+)
+RETURNS VOID
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    DELETE FROM public.cpi_annual_product_location_establishment_inflation
+    WHERE recent_price_id = ANY(p_removed_price_ids);
+    INSERT INTO public.cpi_annual_product_location_establishment_inflation (
+        recent_price_id, product_id, country_id, location_id, establishment_id, recent_date, historical_date,
+        days_between_measurements, recent_price_value, historical_price_value, aple_inflation_rate
+    )
+    SELECT recent_price_id, product_id, country_id, location_id, establishment_id, recent_date, historical_date,
+           days_between_measurements, recent_price_value, historical_price_value, aple_inflation_rate
+    FROM jsonb_to_recordset(p_added_cells) AS r(
+        recent_price_id BIGINT, product_id BIGINT, country_id BIGINT, location_id BIGINT, establishment_id BIGINT,
+        recent_date DATE, historical_date DATE, days_between_measurements INTEGER, recent_price_value NUMERIC,
+        historical_price_value NUMERIC, aple_inflation_rate NUMERIC
+    );
+
+    -- Null keys (e.g. no location) match with IS NOT DISTINCT FROM
+    DELETE FROM public.cpi_category_location_inflation t
+    USING (
+        SELECT country_id, category_id, location_id
+        FROM jsonb_to_recordset(p_category_location || p_category_location_deleted)
+            AS r(country_id BIGINT, category_id BIGINT, location_id BIGINT)
+    ) g
+    WHERE t.year = p_year AND t.month = p_month
+      AND t.country_id IS NOT DISTINCT FROM g.country_id
+      AND t.category_id IS NOT DISTINCT FROM g.category_id
+      AND t.location_id IS NOT DISTINCT FROM g.location_id;
+    INSERT INTO public.cpi_category_location_inflation (country_id, category_id, location_id, cli_inflation_rate, year, month)
+    SELECT country_id, category_id, location_id, cli_inflation_rate, p_year, p_month
+    FROM jsonb_to_recordset(p_category_location) AS r(
+        country_id BIGINT, category_id BIGINT, location_id BIGINT, cli_inflation_rate NUMERIC
+    );
+
+    DELETE FROM public.cpi_category_inflation t
+    USING (
+        SELECT country_id, category_id
+        FROM jsonb_to_recordset(p_category || p_category_deleted) AS r(country_id BIGINT, category_id BIGINT)
+    ) g
+    WHERE t.year = p_year AND t.month = p_month
+      AND t.country_id IS NOT DISTINCT FROM g.country_id
+      AND t.category_id IS NOT DISTINCT FROM g.category_id;
+    INSERT INTO public.cpi_category_inflation (country_id, category_id, ci_inflation_rate, year, month)
+    SELECT country_id, category_id, ci_inflation_rate, p_year, p_month
+    FROM jsonb_to_recordset(p_category) AS r(country_id BIGINT, category_id BIGINT, ci_inflation_rate NUMERIC);
+
+    DELETE FROM public.cpi_real_cpi WHERE year = p_year AND month = p_month;
+    INSERT INTO public.cpi_real_cpi (country_id, criterion_id, real_cpi_inflation_rate, year, month)
+    SELECT country_id, criterion_id, real_cpi_inflation_rate, p_year, p_month
+    FROM jsonb_to_recordset(p_real_cpi) AS r(country_id BIGINT, criterion_id BIGINT, real_cpi_inflation_rate NUMERIC);
+END;
+$$;
@@ -0,0 +1,9 @@
+-- Per-retailer proxy validation lanes.
+-- The harvester stores one verdict per lane, e.g. {"https": true, "walmart": false, "chedraui": true},
+-- and ProxyRotator.get_proxy(lane) only hands out proxies with {"<lane>": true}.
+ALTER TABLE public.cpi_proxies ADD COLUMN IF NOT EXISTS lanes JSONB NOT NULL DEFAULT '{}'::jsonb;
+
+-- Supports the `lanes @> '{"<lane>": true}'` filter
+CREATE INDEX IF NOT EXISTS idx_cpi_proxies_lanes
+  ON public.cpi_proxies USING gin (lanes jsonb_path_ops)
+  WHERE status = 'active';
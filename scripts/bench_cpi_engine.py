@@ -0,0 +1,92 @@
+"""
+Benchmark of the vectorized CPI engine on synthetic data.
+
+Generates `--rows` prices (default 2,000,000) over two years for `--products`
+products across 32 locations and 5 establishments, stores them in a temporary
+local mirror, and times each stage of `compute_month` on the memory-mapped columns,
+then an incremental update (cpi_incremental.py) for the last `--new` prices.
+
+Usage: python scripts/bench_cpi_engine.py [--rows 2000000] [--products 20000] [--new 5000]
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from local_mirror import ColumnTable  # noqa: E402
+from cpi_engine import compute_cells, aggregate_categories, weighted_real_cpi  # noqa: E402
+from cpi_incremental import MonthState, apply_increment, rebuild  # noqa: E402
+
+
+def synthetic_prices(rows: int, products: int, seed: int = 7):
+    rng = np.random.default_rng(seed)
+    base = rng.uniform(10, 500, products)
+    product_id = rng.integers(1, products + 1, rows)
+    day = rng.integers(0, 730, rows)
+    drift = 1 + 0.05 * day / 365 + rng.normal(0, 0.02, rows)
+    return {
+        "price_id": np.arange(1, rows + 1, dtype=np.int64),
+        "product_id": product_id.astype(np.int64),
+        "location_id": rng.integers(1, 33, rows).astype(np.int64),
+        "establishment_id": rng.integers(1, 6, rows).astype(np.int64),
+        "price_value": np.round(base[product_id - 1] * drift, 2),
+        "date": np.datetime64("2024-11-01") + day.astype("timedelta64[D]"),
+        "is_valid": rng.random(rows) > 0.01,
+    }
+
+
+def timed(label: str, fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    print(f"{label:<40} {(time.perf_counter() - start) * 1000:>10.1f} ms")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CPI engine benchmark")
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    parser.add_argument("--products", type=int, default=20_000)
+    parser.add_argument("--new", type=int, default=5_000, help="Prices consumed by the incremental update")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(1)
+    products = {
+        "product_id": np.arange(1, args.products + 1, dtype=np.int64),
+        "country_id": np.ones(args.products, dtype=np.int64),
+        "category_id": rng.integers(1, 120, args.products).astype(np.int64),
+    }
+    weights = {
+        "criterion_id": np.repeat(np.arange(1, 5), 119).astype(np.int64),
+        "category_id": np.tile(np.arange(1, 120), 4).astype(np.int64),
+        "weight_value": rng.uniform(0.1, 5, 4 * 119),
+    }
+
+    with tempfile.TemporaryDirectory() as tmp:
+        table = ColumnTable(tmp)
+        timed(f"write mirror ({args.rows:,} rows)", table.replace, synthetic_prices(args.rows, args.products))
+        prices = timed("open memmap columns", ColumnTable(tmp).columns)
+
+        start = time.perf_counter()
+        cells = timed("cells (latest price, annual match)", compute_cells, prices, products, 2026, 10)
+        category_location, category = timed("category × location / category", aggregate_categories, cells)
+        real_cpi = timed("real CPI per criterion", weighted_real_cpi, category, weights)
+        total = time.perf_counter() - start
+
+        state = MonthState(2026, 10, tmp)
+        older = {name: array[:args.rows - args.new] for name, array in prices.items()}
+        rebuild(state, older, products, weights)
+        changes = timed(f"incremental ({args.new:,} new prices)", apply_increment, state, prices, products)
+
+    print(f"{'total compute':<40} {total * 1000:>10.1f} ms  ({args.rows / total / 1e6:.1f} M price rows/s)")
+    print(f"{len(cells['product_id']):,} cells, {len(category_location['category_id']):,} category×location, "
+          f"{len(category['category_id'])} categories, {len(real_cpi['criterion_id'])} real CPI rows")
+    print(f"incremental: {len(changes['added']['product_id'])} cells recomputed, "
+          f"{len(changes['category']['upsert']['category_id'])} category rates changed")
+
+
+if __name__ == "__main__":
+    main()
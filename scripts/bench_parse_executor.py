@@ -0,0 +1,72 @@
+"""
+Inline vs process-pool parsing benchmark for parse_executor.py.
+
+For synthetic Soriana search pages and VTEX search payloads of growing size,
+measures the median time to parse inline and through a warm one-worker pool
+(pickling the body, IPC, parsing, returning the price). The pool pays off
+once inline parsing blocks the loop for longer than the round-trip costs;
+PARSE_INLINE_MS should sit around that crossover.
+
+Usage: python scripts/bench_parse_executor.py [--runs 20]
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from parse_executor import ParseExecutor, soriana_price, vtex_price  # noqa: E402
+
+
+def soriana_page(tiles: int) -> str:
+    tile = ('<div class="product-tile" data-pid="7501000{i:06d}"><div class="pdp-link"><a>Producto {i}</a></div>'
+            '<div class="price"><div class="sales"><span class="value">${i}.50</span></div></div></div>')
+    return "<html><body>" + "".join(tile.format(i=i) for i in range(tiles)) + "</body></html>"
+
+
+def vtex_payload(products: int) -> bytes:
+    return json.dumps([{
+        "productId": str(i), "productName": f"Producto {i}", "description": "x" * 200,
+        "items": [{"ean": f"7501000{i:06d}", "sellers": [{"commertialOffer": {"Price": i + 0.5}}]}]
+    } for i in range(products)]).encode()
+
+
+async def median_ms(executor: ParseExecutor, extractor, body, runs: int) -> float:
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        await executor.parse(extractor, body)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+async def bench(runs: int):
+    inline = ParseExecutor(workers=0)
+    # inline_ms=0: every extractor goes to the pool once its first (inline) call is measured.
+    pooled = ParseExecutor(workers=1, inline_bytes=0, inline_ms=0)
+
+    print(f"{'payload':<22} {'bytes':>10} {'inline ms':>10} {'pool ms':>10}")
+    cases = [(f"soriana {n} tiles", soriana_price, soriana_page(n)) for n in (1, 5, 20, 80)]
+    cases += [(f"vtex {n} products", vtex_price, vtex_payload(n)) for n in (1, 20, 200, 2000)]
+    for label, extractor, body in cases:
+        inline_ms = await median_ms(inline, extractor, body, runs)
+        for _ in range(2):  # measure the extractor, then start the worker, outside the timings
+            await pooled.parse(extractor, body)
+        pool_ms = await median_ms(pooled, extractor, body, runs)
+        print(f"{label:<22} {len(body):>10} {inline_ms:>10.2f} {pool_ms:>10.2f}")
+    pooled.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark inline vs pooled price parsing")
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(bench(args.runs))
+
+
+if __name__ == "__main__":
+    main()
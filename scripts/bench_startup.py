@@ -0,0 +1,63 @@
+"""
+Startup-time benchmark for the scraper.
+
+Measures, in fresh interpreters:
+  - `import main` (what every run pays before doing any work)
+  - importing the heavy dependencies eagerly, as main.py used to
+  - which heavy modules `import main` actually loads
+  - loading the on-disk reference cache
+
+Usage: python scripts/bench_startup.py [--runs 5]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ["playwright.async_api", "supabase", "bs4", "httpx", "aiohttp"]
+
+
+def time_snippet(code: str, runs: int) -> float:
+    """Median wall time (ms) of running `code` in a fresh interpreter, minus bare startup."""
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], cwd=ROOT, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def loaded_heavy_modules() -> list:
+    code = (
+        "import sys, json, main; "
+        f"print(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))"
+    )
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, check=True,
+                         capture_output=True, text=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scraper startup benchmark")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    baseline = time_snippet("pass", args.runs)
+    import_main = time_snippet("import main", args.runs) - baseline
+    eager = time_snippet("; ".join(f"import {m}" for m in HEAVY_MODULES), args.runs) - baseline
+    cache = time_snippet("import reference_cache; reference_cache.load_reference()", args.runs) - baseline
+
+    print(f"{'Measurement':<40} {'Median (ms)':>12}")
+    print(f"{'import main':<40} {import_main:>12.1f}")
+    print(f"{'eager heavy imports (previous startup)':<40} {eager:>12.1f}")
+    print(f"{'reference cache load':<40} {cache:>12.1f}")
+    print(f"Heavy modules loaded by `import main`: {loaded_heavy_modules() or 'none'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,7 @@
 import os
+import sys
 import logging
+import argparse
 from datetime import datetime
 from dotenv import load_dotenv
 from supabase import create_client, Client
@@ -43,5 +45,26 @@ def check_latest_prices():
     except Exception as e:
         logger.error(f"Failed to fetch prices: {e}")
 
+def check_latest_prices_local():
+    """Same listing from the local mirror (python local_mirror.py), without querying the API."""
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    import numpy as np
+    from local_mirror import LocalMirror
+
+    prices = LocalMirror().prices.columns()
+    if not len(prices.get("price_id", [])):
+        logger.info("Local mirror is empty. Run: python local_mirror.py")
+        return
+
+    latest = np.argsort(prices["date"], kind="stable")[::-1][:10]
+    logger.info(f"Found {len(latest)} recent price entries (local mirror):")
+    for i in latest:
+        print(f"ID: {prices['price_id'][i]} | Date: {prices['date'][i]} | Value: {prices['price_value'][i]} | Product ID: {prices['product_id'][i]} | Establishment ID: {prices['establishment_id'][i]}")
+
 if __name__ == "__main__":
-    check_latest_prices()
+    parser = argparse.ArgumentParser(description="Show the latest prices")
+    parser.add_argument("--local", action="store_true", help="Read from the local mirror instead of Supabase")
+    if parser.parse_args().local:
+        check_latest_prices_local()
+    else:
+        check_latest_prices()
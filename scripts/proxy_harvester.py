@@ -1,10 +1,11 @@
 import asyncio
 import os
+import time
 import logging
 import aiohttp
 import geoip2.database
 import httpx
-from typing import List, Optional, Tuple
+from typing import List, Optional, Tuple, Dict
 from datetime import datetime
 from supabase import create_client, Client
 from dotenv import load_dotenv
@@ -40,6 +41,30 @@ PROXY_SOURCES = [
     "https://raw.githubusercontent.com/sunny9577/proxy-scraper/master/proxies.txt"
 ]
 
+# Validation lanes. Every live proxy gets an HTTPS CONNECT probe; proxies that pass
+# it get a cheap request to each retailer. Verdicts are stored in cpi_proxies.lanes
+# (scripts/add_proxy_lanes.sql) and ProxyRotator.get_proxy(lane) filters on them.
+HTTPS_LANE = "https"
+HTTPS_PROBE_URL = "https://httpbin.org/ip"
+RETAILER_LANES = {
+    "walmart": "https://www.walmart.com.mx/robots.txt",
+    "bodega": "https://www.bodegaaurrera.com.mx/robots.txt",
+    "chedraui": "https://www.chedraui.com.mx/robots.txt",
+    "soriana": "https://www.soriana.com/robots.txt",
+    "lacomer": "https://www.lacomer.com.mx/robots.txt",
+}
+# Comma-separated subset of RETAILER_LANES to probe (default: all)
+ENABLED_LANES = [
+    lane.strip() for lane in os.environ.get("PROXY_LANES", ",".join(RETAILER_LANES)).split(",")
+    if lane.strip() in RETAILER_LANES
+]
+LANE_TIMEOUT = 8
+
+# Stage 1 of the validation funnel: a bare TCP connect weeds out the many listed
+# proxies that are not even listening before any HTTP request is made.
+TCP_CONNECT_TIMEOUT = float(os.environ.get("PROXY_TCP_TIMEOUT", "0.8"))
+TCP_CONCURRENCY = int(os.environ.get("PROXY_TCP_CONCURRENCY", "1000"))
+
 def get_supabase_client() -> Optional[Client]:
     if not SUPABASE_URL or not SUPABASE_KEY:
         logger.error("Supabase credentials missing.")
@@ -78,6 +103,25 @@ async def fetch_proxies(client: httpx.AsyncClient, url: str) -> List[str]:
         logger.warning(f"Failed to fetch from {url}: {e}")
     return []
 
+async def tcp_probe(proxy: str, semaphore: asyncio.Semaphore) -> bool:
+    """True if the proxy's port accepts a TCP connection within TCP_CONNECT_TIMEOUT."""
+    try:
+        host, port = proxy.rsplit(":", 1)
+        port = int(port)
+    except ValueError:
+        return False
+    async with semaphore:
+        try:
+            _, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout=TCP_CONNECT_TIMEOUT)
+        except (OSError, asyncio.TimeoutError):
+            return False
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except OSError:
+            pass
+        return True
+
 async def validate_proxy(session: aiohttp.ClientSession, proxy: str) -> Tuple[str, str, int]:
     """
     Validates proxy against httpbin.org.
@@ -94,6 +138,83 @@ async def validate_proxy(session: aiohttp.ClientSession, proxy: str) -> Tuple[st
         pass
     return proxy, 'dead', 9999
 
+async def probe_lane(session: aiohttp.ClientSession, proxy: str, url: str) -> bool:
+    """True if `url` answers through the proxy without being blocked (status < 400)."""
+    try:
+        async with session.get(url, proxy=f"http://{proxy}", allow_redirects=False,
+                               timeout=aiohttp.ClientTimeout(total=LANE_TIMEOUT)) as response:
+            return response.status < 400
+    except Exception:
+        return False
+
+async def validate_lanes(session: aiohttp.ClientSession, proxy: str) -> Dict[str, bool]:
+    """
+    Runs the validation lanes for a live proxy.
+    Retailer lanes are only probed once HTTPS CONNECT works; otherwise they all fail.
+    """
+    lanes = {HTTPS_LANE: await probe_lane(session, proxy, HTTPS_PROBE_URL)}
+    if lanes[HTTPS_LANE]:
+        verdicts = await asyncio.gather(*(probe_lane(session, proxy, RETAILER_LANES[lane]) for lane in ENABLED_LANES))
+    else:
+        verdicts = [False] * len(ENABLED_LANES)
+    lanes.update(zip(ENABLED_LANES, verdicts))
+    return lanes
+
+async def validate_candidates(americas_proxies: List[Tuple[str, str]]) -> List[Dict]:
+    """
+    Runs the validation funnel (TCP connect -> HTTP check -> validation lanes)
+    over (proxy, country code) candidates. Returns the cpi_proxies rows of the
+    proxies that are live over HTTP, with their lane verdicts.
+    """
+    valid_proxies = []
+    
+    # Create a mapping from proxy string to country code for lookup after validation
+    proxy_country_map = {p: cc for p, cc in americas_proxies}
+
+    logger.info(f"Stage 1: TCP connect to {len(americas_proxies)} proxies ({TCP_CONNECT_TIMEOUT}s timeout, {TCP_CONCURRENCY} at a time)...")
+    stage_started = time.perf_counter()
+    semaphore = asyncio.Semaphore(TCP_CONCURRENCY)
+    listening = await asyncio.gather(*(tcp_probe(p, semaphore) for p, _ in americas_proxies))
+    survivors = [p for (p, _), ok in zip(americas_proxies, listening) if ok]
+    tcp_s = time.perf_counter() - stage_started
+
+    logger.info(f"Stage 2: HTTP check of {len(survivors)} listening proxies...")
+    stage_started = time.perf_counter()
+    async with aiohttp.ClientSession() as session:
+        tasks = [validate_proxy(session, p) for p in survivors]
+        results = await asyncio.gather(*tasks)
+        live = [(proxy, latency) for proxy, status, latency in results if status == 'active']
+        http_s = time.perf_counter() - stage_started
+
+        logger.info(f"Stage 3: validation lanes ({', '.join([HTTPS_LANE] + ENABLED_LANES)}) on {len(live)} live proxies...")
+        stage_started = time.perf_counter()
+        lane_results = await asyncio.gather(*(validate_lanes(session, proxy) for proxy, _ in live))
+        lanes_s = time.perf_counter() - stage_started
+
+        for (proxy, latency), lanes in zip(live, lane_results):
+            country_code = proxy_country_map.get(proxy, 'US')  # Default to US if not found
+            valid_proxies.append({
+                "ip_address": proxy.split(":")[0],
+                "port": int(proxy.split(":")[1]),
+                "protocol": "http",
+                "country_code": country_code,
+                "status": "active",
+                "latency_ms": latency,
+                "fail_count": 0,
+                "lanes": lanes,
+                "last_checked": datetime.now().isoformat()
+            })
+
+    for lane in [HTTPS_LANE] + ENABLED_LANES:
+        passed = sum(1 for lanes in lane_results if lanes.get(lane))
+        logger.info(f"Lane {lane}: {passed}/{len(live)} proxies passed.")
+    logger.info(
+        f"Funnel: {len(americas_proxies)} candidates -> {len(survivors)} listening ({tcp_s:.1f}s) "
+        f"-> {len(live)} live over HTTP ({http_s:.1f}s) "
+        f"-> {sum(1 for lanes in lane_results if lanes.get(HTTPS_LANE))} HTTPS-capable ({lanes_s:.1f}s)"
+    )
+    return valid_proxies
+
 async def main():
     supabase = get_supabase_client()
     if not supabase:
@@ -135,30 +256,8 @@ async def main():
         logger.warning("No Americas proxies found.")
         return
 
-    # 3. Validate
-    logger.info("Validating Americas proxies...")
-    valid_proxies = []
-    
-    # Create a mapping from proxy string to country code for lookup after validation
-    proxy_country_map = {p: cc for p, cc in americas_proxies}
-    
-    async with aiohttp.ClientSession() as session:
-        tasks = [validate_proxy(session, p) for p, _ in americas_proxies]
-        results = await asyncio.gather(*tasks)
-        
-        for proxy, status, latency in results:
-            if status == 'active':
-                country_code = proxy_country_map.get(proxy, 'US')  # Default to US if not found
-                valid_proxies.append({
-                    "ip_address": proxy.split(":")[0],
-                    "port": int(proxy.split(":")[1]),
-                    "protocol": "http",
-                    "country_code": country_code,
-                    "status": "active",
-                    "latency_ms": latency,
-                    "fail_count": 0,
-                    "last_checked": datetime.now().isoformat()
-                })
+    # 3. Validate (funnel: TCP connect -> HTTP check -> validation lanes)
+    valid_proxies = await validate_candidates(americas_proxies)
 
     logger.info(f"Found {len(valid_proxies)} active Americas proxies.")
 
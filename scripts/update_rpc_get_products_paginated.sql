@@ -0,0 +1,52 @@
+-- Keyset pagination for get_products_to_scrape.
+-- Adds p_after_product_id: when set, returns active products with product_id > p_after_product_id
+-- ordered by product_id, so the scraper can stream the worklist page by page.
+-- Calls without p_after_product_id keep the original "fewest prices first" ordering.
+-- Requires manual execution in Supabase.
+
+-- The old single-argument signature must go, otherwise get_products_to_scrape(p_limit) is ambiguous.
+DROP FUNCTION IF EXISTS public.get_products_to_scrape(INTEGER);
+
+CREATE OR REPLACE FUNCTION public.get_products_to_scrape(
+    p_limit INTEGER DEFAULT 3,
+    p_after_product_id BIGINT DEFAULT NULL
+)
+RETURNS TABLE (
+    product_id BIGINT,
+    ean_code TEXT,
+    product_name TEXT,
+    country_id BIGINT,
+    category_id BIGINT,
+    prices_count BIGINT
+)
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    RETURN QUERY
+    SELECT 
+        p.product_id,
+        p.ean_code,
+        p.product_name,
+        p.country_id,
+        p.category_id,
+        COUNT(pr.price_id) as prices_count
+    FROM 
+        public.cpi_products p
+    LEFT JOIN 
+        public.cpi_prices pr ON p.product_id = pr.product_id 
+        AND date_trunc('month', pr.date) = date_trunc('month', CURRENT_DATE)
+    WHERE 
+        p.is_active_product = TRUE
+        AND (p_after_product_id IS NULL OR p.product_id > p_after_product_id)
+    GROUP BY 
+        p.product_id
+    HAVING 
+        COUNT(pr.price_id) < 5 -- Assuming 5 retailers
+    ORDER BY 
+        -- Keyset pages must be ordered by the key alone; counts change while a run persists prices.
+        CASE WHEN p_after_product_id IS NULL THEN COUNT(pr.price_id) ELSE 0 END ASC,
+        p.product_id ASC
+    LIMIT 
+        p_limit;
+END;
+$$;
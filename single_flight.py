@@ -0,0 +1,89 @@
+"""
+In-run request coalescing (single-flight) for retailer lookups.
+
+Several products can share an EAN or a name, and the name-search fallbacks
+repeat the same query for different products. `SingleFlight.do(key, fetch)`
+runs `fetch` once per key at a time: callers arriving while it is in flight
+await the same result instead of sending their own request. A found price is
+also kept for `COALESCE_TTL_S`, so identical lookups later in the run reuse
+it. "Not found" results are only shared while in flight, and a failed lookup
+is not shared at all: its waiters retry with their own request and egress.
+"""
+import os
+import time
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Seconds a found price is reused for identical lookups (0: only share in-flight requests)
+COALESCE_TTL_S = float(os.environ.get("COALESCE_TTL_S", "600"))
+
+
+class CoalesceStats:
+    """Lookups sent, and lookups answered by an in-flight or recent identical one."""
+
+    __slots__ = ("sent", "shared", "reused")
+
+    def __init__(self):
+        self.sent = 0
+        self.shared = 0
+        self.reused = 0
+
+    def summary(self) -> str:
+        return f"{self.sent} lookups sent, {self.shared} shared in flight, {self.reused} reused"
+
+
+class SingleFlight:
+    """Coalesces concurrent identical lookups, keyed e.g. by (retailer, kind, normalized query)."""
+
+    def __init__(self, ttl_s: float = COALESCE_TTL_S):
+        self.ttl_s = ttl_s
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self._found: Dict[Hashable, Tuple[float, Any]] = {}
+        self.stats = CoalesceStats()
+
+    async def do(self, key: Hashable, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        found = self._found.get(key)
+        if found is not None:
+            if found[0] > time.monotonic():
+                self.stats.reused += 1
+                return found[1]
+            del self._found[key]
+
+        leader = self._inflight.get(key)
+        if leader is not None:
+            try:
+                # Shielded: a cancelled waiter must not cancel the leader's request
+                value = await asyncio.shield(leader)
+            except asyncio.CancelledError:
+                if not leader.cancelled():
+                    raise
+            except Exception:
+                pass
+            else:
+                self.stats.shared += 1
+                return value
+            # The leader failed; this caller makes its own attempt
+            return await self.do(key, fetch)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        self.stats.sent += 1
+        try:
+            value = await fetch()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # retrieved here; waiters are optional
+            raise
+        finally:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+        future.set_result(value)
+        if value is not None and self.ttl_s > 0:
+            self._found[key] = (time.monotonic() + self.ttl_s, value)
+        return value
@@ -0,0 +1,209 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from adapters import (RetailerAdapter, BrowserAdapter, ScrapeResult, EgressBlocked, SOURCE_SNAPSHOT,
+                      SOURCE_DIRECT, SOURCE_PROXY, SOURCE_REPLAY)
+
+PRODUCT = {"product_id": 1, "ean_code": "7501000000001", "product_name": "Leche Entera 1L"}
+
+
+def make_services(proxies=(), snapshot=None, replaying=False):
+    services = MagicMock()
+    services.rotator.get_proxy = AsyncMock(side_effect=list(proxies) + [None] * 10)
+    services.rotator.report_failure = AsyncMock()
+    services.rotator.report_success = AsyncMock()
+    services.catalog.lookup.return_value = snapshot
+    services.capture.replaying = replaying
+    return services
+
+
+class FakeAdapter(RetailerAdapter):
+    name = "Fake"
+    lane = "fake"
+    snapshot_name = "Fake"
+    proxy_attempts = 3
+
+    def __init__(self, services, outcomes):
+        super().__init__(services)
+        self.outcomes = list(outcomes)
+        self.egresses = []
+
+    async def fetch(self, pool, product, proxy_url):
+        self.egresses.append(proxy_url)
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+
+def test_scrape_result_has_slots():
+    result = ScrapeResult(12.5, SOURCE_DIRECT, attempts=1)
+    assert result.found
+    with pytest.raises(AttributeError):
+        result.extra = 1
+    assert not ScrapeResult().found
+
+
+@pytest.mark.asyncio
+async def test_snapshot_hit_skips_live_requests():
+    adapter = FakeAdapter(make_services(snapshot={"price": 20.0, "match": "ean"}), [])
+    result = await adapter.scrape(None, PRODUCT)
+    assert (result.price, result.source, result.attempts) == (20.0, SOURCE_SNAPSHOT, 0)
+    assert adapter.egresses == []
+
+
+@pytest.mark.asyncio
+async def test_chain_falls_back_from_direct_to_proxies():
+    proxies = [{"url": "http://p1", "proxy_id": 1}, {"url": "http://p2", "proxy_id": 2}]
+    services = make_services(proxies)
+    adapter = FakeAdapter(services, [None, EgressBlocked("HTTP 403"), 18.0])
+    result = await adapter.scrape(None, PRODUCT)
+    assert (result.price, result.source, result.attempts) == (18.0, SOURCE_PROXY, 3)
+    assert adapter.egresses == [None, "http://p1", "http://p2"]
+    services.rotator.report_failure.assert_awaited_once_with(1)
+    services.rotator.report_success.assert_awaited_once_with(2)
+
+
+@pytest.mark.asyncio
+async def test_broken_attempt_discards_egress_and_reports_proxy():
+    services = make_services([{"url": "http://p1", "proxy_id": 7}])
+    adapter = FakeAdapter(services, [None, RuntimeError("reset")])
+    adapter.discard_egress = AsyncMock()
+    result = await adapter.scrape(None, PRODUCT)
+    assert not result.found and result.attempts == 2
+    services.rotator.report_failure.assert_awaited_once_with(7)
+    adapter.discard_egress.assert_awaited_once_with("http://p1")
+
+
+@pytest.mark.asyncio
+async def test_concurrency_limit():
+    class SlowAdapter(FakeAdapter):
+        max_concurrency = 2
+        running = peak = 0
+
+        async def fetch(self, pool, product, proxy_url):
+            SlowAdapter.running += 1
+            SlowAdapter.peak = max(SlowAdapter.peak, SlowAdapter.running)
+            await asyncio.sleep(0.01)
+            SlowAdapter.running -= 1
+            return 1.0
+
+    adapter = SlowAdapter(make_services(), [])
+    await asyncio.gather(*(adapter.scrape(None, PRODUCT) for _ in range(5)))
+    assert SlowAdapter.peak == 2
+
+
+@pytest.mark.asyncio
+async def test_browser_adapter_replays_from_capture():
+    class Browser(BrowserAdapter):
+        def price_from_capture(self, product):
+            return 31.0
+
+        async def fetch(self, pool, product, proxy_url):
+            raise AssertionError("no live attempt while replaying")
+
+    result = await Browser(make_services(replaying=True)).scrape(None, PRODUCT)
+    assert (result.price, result.source) == (31.0, SOURCE_REPLAY)
+
+
+@pytest.mark.asyncio
+async def test_identical_name_searches_share_one_request():
+    import httpx
+    import main
+    from single_flight import SingleFlight
+
+    requests = []
+
+    async def vtex(request):
+        requests.append(request.url.params["ft"])
+        await asyncio.sleep(0.01)
+        if request.url.params["ft"].isdigit():
+            return httpx.Response(200, json=[])
+        return httpx.Response(200, json=[{"items": [{"sellers": [{"commertialOffer": {"Price": 27.5}}]}]}])
+
+    services = make_services()
+    services.flights = SingleFlight()
+    services.deadline.timeout_s = lambda timeout: timeout
+    services.http_pool.get = AsyncMock(return_value=httpx.AsyncClient(transport=httpx.MockTransport(vtex)))
+    adapter = main.ChedrauiAdapter(services)
+    products = [dict(PRODUCT, product_id=i, ean_code=f"750100000000{i}", product_name="Leche  entera 1L")
+                for i in range(3)]
+    prices = await asyncio.gather(*(adapter.fetch(None, product, None) for product in products))
+    assert prices == [27.5] * 3
+    # Three EAN searches, one name search
+    assert sorted(requests) == sorted([p["ean_code"] for p in products] + ["Leche  entera 1L"])
+
+
+class FakeBatchAdapter(FakeAdapter):
+    supports_batch = True
+    fallback_chain = (SOURCE_PROXY, SOURCE_DIRECT)
+
+    async def fetch_batch(self, pool, eans, proxy_url):
+        self.egresses.append((proxy_url, list(eans)))
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return {ean: price for ean, price in outcome.items() if ean in eans}
+
+
+@pytest.mark.asyncio
+async def test_batch_walks_the_chain_once_for_all_products():
+    products = [dict(PRODUCT, product_id=i, ean_code=ean) for i, ean in enumerate(["A", "B", "C", "A"])]
+    services = make_services([{"url": "http://p1", "proxy_id": 1}, {"url": "http://p2", "proxy_id": 2}])
+    adapter = FakeBatchAdapter(services, [EgressBlocked("HTTP 403"), {"A": 10.0, "B": None}, {"B": None}])
+    results = await adapter.scrape_batch(None, products)
+
+    # Shared EANs are looked up once; each egress only gets the products still without a price
+    assert adapter.egresses == [("http://p1", ["A", "B", "C"]), ("http://p2", ["A", "B", "C"]), (None, ["B", "C"])]
+    assert [(r.price, r.source, r.attempts) for r in results] == [
+        (10.0, SOURCE_PROXY, 2), (None, None, 3), (None, None, 3), (10.0, SOURCE_PROXY, 2)]
+    assert [r.verdict for r in results[1:3]] == ["not_found", "unreachable"]
+    services.rotator.report_failure.assert_awaited_once_with(1)
+    services.rotator.report_success.assert_awaited_once_with(2)
+
+
+@pytest.mark.asyncio
+async def test_batch_cut_by_deadline_keeps_found_prices():
+    from deadline import DeadlineExceeded
+
+    services = make_services([{"url": "http://p1", "proxy_id": 1}])
+    services.deadline.check.side_effect = [None, DeadlineExceeded("0s left")]
+    adapter = FakeBatchAdapter(services, [{"A": 10.0}])
+    products = [dict(PRODUCT, ean_code="A"), dict(PRODUCT, ean_code="B")]
+    first, second = await adapter.scrape_batch(None, products)
+    assert first.price == 10.0 and second is None
+
+    services.deadline.check.side_effect = DeadlineExceeded("0s left")
+    with pytest.raises(DeadlineExceeded):
+        await adapter.scrape_batch(None, products)
+
+
+@pytest.mark.asyncio
+async def test_adapters_without_batch_support_scrape_one_by_one():
+    adapter = FakeAdapter(make_services(), [5.0, 6.0])
+    results = await adapter.scrape_batch(None, [PRODUCT, PRODUCT])
+    assert [r.price for r in results] == [5.0, 6.0] and len(adapter.egresses) == 2
+
+
+@pytest.mark.asyncio
+async def test_next_data_batch_returns_prices_and_drops_blocked_sessions(monkeypatch):
+    import main
+
+    page = MagicMock()
+    page.evaluate = AsyncMock(side_effect=[
+        {"prices": {"A": {"price": 12.0, "leadPrice": None}, "B": None, "C": {"price": None, "leadPrice": 9.5}},
+         "blocked": None},
+        {"prices": {"A": {"price": 12.0, "leadPrice": None}}, "blocked": "blocked: HTTP 429"},
+        {"prices": {}, "blocked": "blocked: HTTP 403"},
+    ])
+    adapter = main.BodegaAdapter(make_services())
+    monkeypatch.setattr(adapter, "session", AsyncMock(return_value=page))
+    adapter.discard_egress = AsyncMock()
+
+    assert await adapter.fetch_batch(None, ["A", "B", "C"], None) == {"A": 12.0, "B": None, "C": 9.5}
+    assert await adapter.fetch_batch(None, ["A", "B"], "http://p1") == {"A": 12.0}
+    adapter.discard_egress.assert_awaited_once_with("http://p1")
+    with pytest.raises(EgressBlocked):
+        await adapter.fetch_batch(None, ["B"], "http://p1")
@@ -0,0 +1,153 @@
+import os
+import sys
+import types
+import socket
+import asyncio
+import pytest
+import browser_server
+from browser_server import BrowserServer, process_tree_rss_mb
+from browser_pool import BrowserPool
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="reads /proc")
+def test_process_tree_rss_includes_own_process():
+    assert process_tree_rss_mb(os.getpid()) > 0
+    assert process_tree_rss_mb(2 ** 22 + 1) == 0
+
+def test_pool_without_connect_url_launches_locally():
+    assert BrowserPool(connect_url="").connect_url is None
+    assert BrowserPool(connect_url="http://127.0.0.1:9222").connect_url == "http://127.0.0.1:9222"
+
+# Stands in for Chromium: serves /json/version on --remote-debugging-port until terminated
+FAKE_CHROMIUM = """
+import sys
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+class Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.send_response(200 if self.path == "/json/version" else 404)
+        self.end_headers()
+        self.wfile.write(b"{}")
+
+    def log_message(self, *args):
+        pass
+
+port = int(next(a for a in sys.argv if a.startswith("--remote-debugging-port=")).split("=")[1])
+HTTPServer(("127.0.0.1", port), Handler).serve_forever()
+"""
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def fake_chromium(tmp_path):
+    path = tmp_path / "chromium"
+    path.write_text(f"#!{sys.executable}\n{FAKE_CHROMIUM}")
+    path.chmod(0o755)
+    return str(path)
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="runs a script as the browser executable")
+def test_server_starts_serves_and_stops_the_browser(tmp_path):
+    async def lifecycle():
+        server = BrowserServer("127.0.0.1", free_port())
+        server.executable = fake_chromium(tmp_path)
+        await server.start()
+        process, profile_dir = server.process, server.profile_dir
+        assert server._is_ready() and os.path.isdir(profile_dir)
+        await server.stop()
+        assert process.returncode is not None
+        assert server.process is None and not os.path.exists(profile_dir)
+        assert not server._is_ready()
+
+    asyncio.run(lifecycle())
+
+def test_watchdog_restarts_the_browser_over_the_memory_limit(monkeypatch):
+    monkeypatch.setattr(browser_server, "WATCHDOG_INTERVAL", 0)
+    usage = iter([100.0, 5000.0, 100.0])
+    monkeypatch.setattr(browser_server, "process_tree_rss_mb", lambda pid: next(usage, 100.0))
+    server = BrowserServer(memory_limit_mb=3072)
+    events = []
+
+    class Process:
+        pid = 1
+        returncode = None
+
+    async def start():
+        events.append("start")
+        server.process = Process()
+
+    async def stop():
+        events.append("stop")
+        server.process = None
+
+    server.start, server.stop = start, stop
+
+    async def watch():
+        await server.start()
+        watchdog = asyncio.create_task(server.watchdog())
+        while server.restarts < 1:
+            await asyncio.sleep(0)
+        for _ in range(10):
+            await asyncio.sleep(0)
+        watchdog.cancel()
+
+    asyncio.run(watch())
+    assert events == ["start", "stop", "start"]
+    assert server.restarts == 1
+
+class FakeBrowser:
+    def __init__(self, source):
+        self.source = source
+        self.closed = False
+
+    def is_connected(self):
+        return not self.closed
+
+    async def close(self):
+        self.closed = True
+
+class FakeChromium:
+    def __init__(self, cdp_up):
+        self.cdp_up = cdp_up
+        self.calls = []
+
+    async def connect_over_cdp(self, url):
+        self.calls.append(("connect", url))
+        if not self.cdp_up:
+            raise ConnectionRefusedError("connect ECONNREFUSED")
+        return FakeBrowser("shared")
+
+    async def launch(self, **kwargs):
+        self.calls.append(("launch", kwargs["proxy"]))
+        return FakeBrowser("local")
+
+def fake_playwright(monkeypatch, chromium):
+    class Manager:
+        async def start(self):
+            return types.SimpleNamespace(chromium=chromium)
+
+        async def __aexit__(self, *exc):
+            pass
+
+    module = types.ModuleType("playwright.async_api")
+    module.async_playwright = Manager
+    monkeypatch.setitem(sys.modules, "playwright.async_api", module)
+
+@pytest.mark.parametrize("cdp_up, source", [(True, "shared"), (False, "local")])
+def test_pool_connects_to_the_server_or_launches_locally(monkeypatch, cdp_up, source):
+    chromium = FakeChromium(cdp_up)
+    fake_playwright(monkeypatch, chromium)
+    pool = BrowserPool(connect_url="http://127.0.0.1:9222")
+
+    async def use():
+        browser = await pool.get_browser()
+        assert await pool.get_browser() is browser
+        await pool.close()
+        return browser
+
+    browser = asyncio.run(use())
+    assert browser.source == source and browser.closed
+    assert (pool.connects, pool.launches) == ((1, 0) if cdp_up else (0, 1))
+    assert chromium.calls[0] == ("connect", "http://127.0.0.1:9222")
+    if not cdp_up:
+        assert chromium.calls[1] == ("launch", {"server": "per-context"})
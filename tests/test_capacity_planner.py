@@ -0,0 +1,95 @@
+import pytest
+
+from capacity_planner import (LogHistory, RetailerProfile, load_profiles, simulate, recommend, capacity)
+
+LEGACY_LOG = """\
+scrape\tRun Scraper\t2025-12-13T17:00:00.0000000Z 2025-12-13 17:00:00,000 - INFO - Starting Hybrid Scraper...
+scrape\tRun Scraper\t2025-12-13T17:00:01.0000000Z 2025-12-13 17:00:01,000 - INFO - [Walmart] Trying proxy for Leche...
+scrape\tRun Scraper\t2025-12-13T17:00:31.0000000Z 2025-12-13 17:00:31,000 - INFO - [Walmart] Trying direct for Leche...
+scrape\tRun Scraper\t2025-12-13T17:01:01.0000000Z 2025-12-13 17:01:01,000 - WARNING - No price found for Wal-Mart
+scrape\tRun Scraper\t2025-12-13T17:01:02.0000000Z 2025-12-13 17:01:02,000 - INFO - [Chedraui] Trying direct for Leche...
+scrape\tRun Scraper\t2025-12-13T17:01:06.0000000Z 2025-12-13 17:01:06,000 - INFO - [Chedraui] SUCCESS (direct): $28.5
+scrape\tRun Scraper\t2025-12-13T17:01:07.0000000Z 2025-12-13 17:01:07,000 - INFO - [Soriana] SUCCESS (snapshot, ean): $30.0
+scrape\tRun Scraper\t2025-12-13T17:01:08.0000000Z 2025-12-13 17:01:08,000 - INFO - Scraping Cycle Completed.
+scrape\tComplete job\t2025-12-13T17:01:38.0000000Z Cleaning up orphan processes
+"""
+
+PAIR_LOG = """\
+2026-10-01 12:00:00,000 - INFO - [Pair] product=1 establishment=Chedraui status=persisted price=28.5 source=direct attempts=1 duration=2.0s
+2026-10-01 12:00:02,000 - WARNING - [Pair] product=1 establishment=Wal-Mart status=not_found price=- source=- attempts=6 duration=120.0s
+2026-10-01 12:00:03,000 - INFO - [Pair] product=2 establishment=Chedraui status=exists price=- source=- attempts=0 duration=-
+"""
+
+
+def write(tmp_path, name, text, encoding):
+    path = tmp_path / name
+    path.write_text(text, encoding=encoding)
+    return str(path)
+
+
+def profile(name, durations, successes):
+    p = RetailerProfile(name)
+    for duration, success in zip(durations, successes):
+        p.add(duration, success)
+    return p
+
+
+def test_legacy_utf16_log_is_segmented_into_pairs(tmp_path):
+    history = LogHistory()
+    history.add_log(write(tmp_path, "scraper_log.txt", LEGACY_LOG, "utf-16"))
+    walmart, chedraui, soriana = (history.profiles[name] for name in ("Walmart", "Chedraui", "Soriana"))
+    assert (walmart.durations, walmart.successes, walmart.attempts) == ([60.0], [False], [2])
+    assert (chedraui.durations, chedraui.successes) == ([4.0], [True])
+    assert (soriana.durations, soriana.attempts) == ([0.0], [0])
+    # Setup before the scraper (none here) and teardown after it
+    assert history.overheads_s == [30.0]
+
+
+def test_pair_lines_are_used_when_present(tmp_path):
+    history = LogHistory()
+    history.add_log(write(tmp_path, "latest.txt", PAIR_LOG, "utf-8-sig"))
+    assert history.profiles["Chedraui"].durations == [2.0]
+    assert history.profiles["Walmart"].attempts == [6]
+    assert history.overheads_s == []
+
+
+def test_missing_retailers_fall_back_to_stats_then_defaults(tmp_path):
+    stats = tmp_path / "retailer_stats.json"
+    stats.write_text('{"retailers": {"Soriana": {"cost_s": 3.0, "success_rate": 0.25, "samples": 4}}}')
+    history = LogHistory()
+    history.profile("Chedraui").add(2.0, True)
+    profiles = load_profiles(history, str(stats), ("Chedraui", "Soriana", "Bodega"))
+    assert profiles["Chedraui"].source == "log"
+    assert profiles["Soriana"].source == "retailer_stats"
+    assert set(profiles["Soriana"].durations) == {3.0} and sum(profiles["Soriana"].successes) == 5
+    assert profiles["Bodega"].source == "default" and profiles["Bodega"].durations[0] == 90.0
+
+
+def test_sequential_run_is_the_sum_of_pairs():
+    profiles = {"Walmart": profile("Walmart", [60.0], [False]), "Chedraui": profile("Chedraui", [5.0], [True])}
+    result = simulate(profiles, products=10, overhead_s=30.0, trials=5)
+    assert result.run_s.tolist() == [10 * 65.0 + 30.0] * 5
+    assert result.found.tolist() == [10.0] * 5
+
+
+def test_concurrency_is_capped_per_retailer():
+    profiles = {"Walmart": profile("Walmart", [60.0], [True])}
+    # Browser retailers run at most 2 pairs at once however many workers a job has
+    two = simulate(profiles, products=10, concurrency=2, trials=1)
+    eight = simulate(profiles, products=10, concurrency=8, trials=1)
+    assert two.run_s[0] == pytest.approx(eight.run_s[0]) == pytest.approx(10 * 60 / 2 + 30)
+
+
+def test_recommendation_and_capacity_fit_the_limit():
+    profiles = {"Chedraui": profile("Chedraui", [60.0], [True])}
+    best = recommend(profiles, products=500, limit_min=200, max_shards=8, concurrency_options=(1,), trials=3)
+    # 500 products × 1 min sequentially need 3 shards to fit 200 minutes
+    assert (best.shards, best.concurrency) == (3, 1)
+    assert capacity(profiles, concurrency=1, limit_min=200, trials=3) == 200
+
+def test_default_recommendation_only_uses_runner_settings():
+    profiles = {"Chedraui": profile("Chedraui", [60.0], [True])}
+    # The runner is one job at concurrency 1: 500 products do not fit, 150 do
+    assert recommend(profiles, products=500, limit_min=200, trials=3) is None
+    best = recommend(profiles, products=150, limit_min=200, trials=3)
+    assert (best.shards, best.concurrency) == (1, 1)
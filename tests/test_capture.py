@@ -0,0 +1,82 @@
+import argparse
+import httpx
+import pytest
+import main
+from capture import CaptureArchive, CaptureRotator
+from capture_transport import RecordingTransport, ReplayTransport
+from catalog_snapshot import CatalogIndex
+from http_pool import HTTPClientPool
+from single_flight import SingleFlight
+
+PRODUCT = {"product_id": 5, "ean_code": "7501055300075", "product_name": "Leche Entera 1L"}
+CHEDRAUI = {"establishment_id": 2, "establishment_name": "Chedraui"}
+VTEX_BODY = b'[{"items": [{"sellers": [{"commertialOffer": {"Price": 27.5}}]}]}]'
+
+
+def next_data_with(price):
+    return {"props": {"pageProps": {"initialData": {"data": {"product": {"price": {"price": {"price": price}}}}}}}}
+
+
+def vtex_server(request: httpx.Request) -> httpx.Response:
+    if request.url.params.get("ft") == PRODUCT["ean_code"]:
+        return httpx.Response(200, json=[])  # EAN search misses, name search hits
+    return httpx.Response(200, content=VTEX_BODY, headers={"content-type": "application/json"})
+
+
+@pytest.fixture
+def scraper_globals(monkeypatch):
+    """Fresh capture, HTTP pool, catalog, rotator and lookup coalescing in main, restored after the test."""
+    monkeypatch.setattr(main, "capture", CaptureArchive())
+    monkeypatch.setattr(main, "http_pool", HTTPClientPool())
+    monkeypatch.setattr(main, "catalog", CatalogIndex(path=""))
+    monkeypatch.setattr(main, "rotator", main.rotator)
+    monkeypatch.setattr(main, "flights", SingleFlight())
+    return main
+
+
+@pytest.mark.asyncio
+async def test_replay_serves_responses_in_recorded_order(tmp_path):
+    archive = CaptureArchive()
+    archive.record_to(str(tmp_path / "run.jsonl.gz"))
+    replies = iter([httpx.Response(503), httpx.Response(200, text="ok")])
+    transport = RecordingTransport(httpx.MockTransport(lambda request: next(replies)), archive)
+    async with httpx.AsyncClient(transport=transport) as client:
+        assert (await client.get("https://example.com/a?q=1")).status_code == 503
+        assert (await client.get("https://example.com/a?q=1")).text == "ok"
+    archive.close()
+
+    replay = CaptureArchive()
+    replay.load(str(tmp_path / "run.jsonl.gz"))
+    async with httpx.AsyncClient(transport=ReplayTransport(replay)) as client:
+        assert (await client.get("https://example.com/a?q=1")).status_code == 503
+        assert (await client.get("https://example.com/a?q=1")).text == "ok"
+        assert (await client.get("https://example.com/a?q=1")).text == "ok"  # last response repeats
+        with pytest.raises(httpx.ConnectError):
+            await client.get("https://example.com/unrecorded")
+
+
+@pytest.mark.asyncio
+async def test_recorded_run_replays_offline(tmp_path, monkeypatch, scraper_globals):
+    path = str(tmp_path / "run.jsonl.gz")
+    capture = scraper_globals.capture
+    capture.record_to(path)
+    monkeypatch.setattr(capture, "transport",
+                        lambda proxy_url=None: RecordingTransport(httpx.MockTransport(vtex_server), capture))
+    scraper_globals.http_pool.capture = capture
+    scraper_globals.rotator = CaptureRotator(capture)
+    scraper_globals.rotator.attach(None)
+
+    price = (await scraper_globals.SCRAPER_REGISTRY["Chedraui"].scrape(None, PRODUCT)).price
+    capture.record_pair(PRODUCT, CHEDRAUI, price)
+    capture.record_next_data("Walmart", PRODUCT["ean_code"], next_data_with(31.0))
+    capture.record_pair(PRODUCT, {"establishment_id": 1, "establishment_name": "Walmart"}, 31.0)
+    capture.close()
+    await scraper_globals.http_pool.close()
+    assert price == 27.5
+
+    monkeypatch.setattr(main, "capture", CaptureArchive())
+    monkeypatch.setattr(main, "http_pool", HTTPClientPool())
+    monkeypatch.setattr(main, "flights", SingleFlight())
+    mismatches = await main.run_replay(argparse.Namespace(replay=path, browser_url=""))
+    assert mismatches == 0
+    assert main.capture.counts["missed"] == 0
@@ -0,0 +1,41 @@
+from catalog_snapshot import (
+    CatalogIndex, normalize_name, normalize_ean,
+    parse_vtex_products, parse_soriana_listing, parse_lacomer_articles
+)
+
+def test_normalize():
+    assert normalize_name("  Leche Santa Clara  Entera 1 L.") == "leche santa clara entera 1 l"
+    assert normalize_name("Café Soluble Nescafé") == "cafe soluble nescafe"
+    assert normalize_ean("034587030013") == normalize_ean("34587030013")
+
+def test_index_lookup_by_ean_then_name(tmp_path):
+    index = CatalogIndex(str(tmp_path / "catalog.sqlite"))
+    stored = index.replace_retailer("Chedraui", [
+        {"ean": "7501055904143", "name": "Leche Alpura Light", "price": 37.0, "ref": "1"},
+        {"ean": None, "name": "Sal La Fina 1 kg", "price": 18.5, "ref": "2"},
+        {"ean": "123", "name": "No price", "price": None},
+    ])
+    assert stored == 2
+    assert index.lookup("Chedraui", "7501055904143")["price"] == 37.0
+    assert index.lookup("Chedraui", "000", "sal la fina 1 KG")["match"] == "name"
+    assert index.lookup("Soriana", "7501055904143") is None
+    assert index.lookup("Chedraui", "7501055904143", max_age=-1) is None
+    index.close()
+
+def test_missing_index_is_a_miss(tmp_path):
+    index = CatalogIndex(str(tmp_path / "absent.sqlite"))
+    assert index.lookup("Chedraui", "7501055904143") is None
+
+def test_parsers():
+    vtex = [{"productId": "9", "productName": "Aceite 1-2-3", "items": [
+        {"ean": "75002343", "sellers": [{"commertialOffer": {"Price": 45.9}}]}]}]
+    assert parse_vtex_products(vtex) == [{"ean": "75002343", "name": "Aceite 1-2-3", "price": 45.9, "ref": "9"}]
+
+    html = ('<div class="product" data-pid="7501295600126"><div class="product-tile">'
+            '<div class="pdp-link"><a>Leche Santa Clara</a></div>'
+            '<div class="price"><span class="sales"><span class="value" content="30.50">$30.50</span></span></div>'
+            '</div></div>')
+    assert parse_soriana_listing(html) == [{"ean": "7501295600126", "name": "Leche Santa Clara", "price": 30.5, "ref": "7501295600126"}]
+
+    lacomer = {"vecArticulo": [{"artEan": "7501055904143", "artDes": "Leche Light", "marDes": "Alpura", "artPrven": 37, "artCod": 69863684}]}
+    assert parse_lacomer_articles(lacomer)[0]["price"] == 37
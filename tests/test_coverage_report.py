@@ -0,0 +1,72 @@
+from unittest.mock import MagicMock
+
+import numpy as np
+
+from local_mirror import LocalMirror, rows_to_columns, PRICE_COLUMNS, PRODUCT_COLUMNS, ESTABLISHMENT_COLUMNS
+from coverage_report import local_coverage, remote_coverage, write_missing
+
+PRODUCT_ROWS = [
+    {"product_id": 1, "country_id": 1, "category_id": 10, "is_active_product": True, "product_name": "Leche", "ean_code": "1"},
+    {"product_id": 2, "country_id": 1, "category_id": 10, "is_active_product": True, "product_name": "Huevo", "ean_code": "2"},
+    {"product_id": 3, "country_id": 1, "category_id": 20, "is_active_product": True, "product_name": "Jabon", "ean_code": "3"},
+    {"product_id": 4, "country_id": 1, "category_id": 20, "is_active_product": False, "product_name": "Viejo", "ean_code": "4"},
+]
+ESTABLISHMENT_ROWS = [
+    {"establishment_id": 1, "country_id": 1, "establishment_name": "Wal-Mart"},
+    {"establishment_id": 2, "country_id": 1, "establishment_name": "Chedraui"},
+    {"establishment_id": 4, "country_id": 1, "establishment_name": "OXXO"},
+]
+
+
+def price(price_id, product_id, establishment_id, day):
+    return {"price_id": price_id, "product_id": product_id, "location_id": 1, "establishment_id": establishment_id,
+            "price_value": 10.0, "date": day, "is_valid": True}
+
+
+def mirror_with(tmp_path, prices):
+    mirror = LocalMirror(str(tmp_path))
+    mirror.prices.replace(rows_to_columns(prices, PRICE_COLUMNS))
+    mirror.products.replace(rows_to_columns(PRODUCT_ROWS, PRODUCT_COLUMNS))
+    mirror.establishments.replace(rows_to_columns(ESTABLISHMENT_ROWS, ESTABLISHMENT_COLUMNS))
+    return mirror
+
+
+def test_local_coverage_counts_gaps_per_establishment_and_category(tmp_path):
+    mirror = mirror_with(tmp_path, [
+        price(1, 1, 1, "2026-10-01"),
+        price(2, 1, 1, "2026-10-15"),   # second price of a covered pair
+        price(3, 1, 2, "2026-10-31"),
+        price(4, 3, 2, "2026-10-02"),
+        price(5, 2, 1, "2026-09-30"),   # previous month
+        price(6, 4, 1, "2026-10-02"),   # inactive product
+        price(7, 2, 4, "2026-10-02"),   # establishment without a scraper
+    ])
+    coverage = local_coverage(mirror, 2026, 10, ["Wal-Mart", "Chedraui"])
+    assert (coverage.pairs, coverage.gaps) == (6, 3)
+    assert coverage.gaps_by_establishment() == [("Wal-Mart", 2, 3), ("Chedraui", 1, 3)]
+    assert coverage.gaps_by_category() == [(10, 2, 4), (20, 1, 2)]
+    assert [(row["product_id"], row["establishment_name"]) for row in coverage.missing_pairs()] == [
+        (2, "Wal-Mart"), (2, "Chedraui"), (3, "Wal-Mart")]
+
+    everything = local_coverage(mirror, 2026, 10)
+    assert (everything.pairs, everything.gaps) == (9, 5)
+
+
+def test_remote_coverage_uses_one_rpc(tmp_path):
+    client = MagicMock()
+    client.rpc.return_value.execute.return_value.data = {
+        "products": PRODUCT_ROWS[:3], "establishments": ESTABLISHMENT_ROWS, "covered": [[1, 1], [3, 2], [9, 1]]}
+    coverage = remote_coverage(client, 2026, 10, ["Wal-Mart", "Chedraui"])
+    client.rpc.assert_called_once_with("get_month_coverage", {"p_month": "2026-10-01"})
+    assert coverage.gaps == 4
+
+    path = tmp_path / "gaps.csv"
+    write_missing(coverage, str(path))
+    lines = path.read_text(encoding="utf-8").splitlines()
+    assert lines[0].startswith("product_id,ean_code") and len(lines) == 5
+
+
+def test_empty_month(tmp_path):
+    coverage = local_coverage(mirror_with(tmp_path, []), 2026, 10, ["Wal-Mart"])
+    assert coverage.gaps == 3
+    assert np.array_equal(coverage.covered, np.zeros((3, 1), dtype=bool))
@@ -0,0 +1,68 @@
+from unittest.mock import MagicMock
+import numpy as np
+import pytest
+from local_mirror import rows_to_columns, PRICE_COLUMNS, PRODUCT_COLUMNS
+from cpi_engine import compute_month, to_rows, write_results
+
+def price(price_id, product_id, establishment_id, value, day, location_id=1):
+    return {"price_id": price_id, "product_id": product_id, "location_id": location_id,
+            "establishment_id": establishment_id, "price_value": value, "date": day, "is_valid": True}
+
+PRODUCTS = rows_to_columns([
+    {"product_id": 1, "country_id": 1, "category_id": 10, "is_active_product": True, "product_name": "Leche", "ean_code": "1"},
+    {"product_id": 2, "country_id": 1, "category_id": 10, "is_active_product": True, "product_name": "Huevo", "ean_code": "2"},
+    {"product_id": 3, "country_id": 1, "category_id": 20, "is_active_product": True, "product_name": "Jabon", "ean_code": "3"},
+], PRODUCT_COLUMNS)
+WEIGHTS = {"criterion_id": np.array([7, 7]), "category_id": np.array([10, 20]), "weight_value": np.array([3.0, 1.0])}
+
+def test_compute_month_matches_hand_calculation():
+    prices = rows_to_columns([
+        price(1, 1, 5, 20.0, "2025-10-03"),
+        price(2, 1, 5, 22.0, "2026-10-01"),
+        price(3, 1, 5, 24.0, "2026-10-09"),   # latest of the month wins
+        price(4, 2, 5, 40.0, "2025-10-15"),
+        price(5, 2, 5, 50.0, "2026-10-02"),
+        price(6, 3, 5, 10.0, "2025-10-20"),
+        price(7, 3, 5, 9.0, "2026-10-20"),
+        price(8, 3, 6, 9.0, "2026-10-20"),    # no price a year earlier: no cell
+    ], PRICE_COLUMNS)
+    results = compute_month(prices, PRODUCTS, WEIGHTS, 2026, 10)
+
+    cells = results["cells"]
+    assert sorted(cells["recent_price_id"].tolist()) == [3, 5, 7]
+    rates = dict(zip(cells["product_id"].tolist(), cells["aple_inflation_rate"].tolist()))
+    assert rates == pytest.approx({1: 20.0, 2: 25.0, 3: -10.0})
+
+    category = dict(zip(results["category"]["category_id"].tolist(), results["category"]["ci_inflation_rate"].tolist()))
+    assert category[10] == pytest.approx((np.sqrt(1.2 * 1.25) - 1) * 100)
+    assert category[20] == pytest.approx(-10.0)
+    assert results["category_location"]["location_id"].tolist() == [1, 1]
+
+    real = results["real_cpi"]["real_cpi_inflation_rate"][0]
+    assert real == pytest.approx((3 * category[10] + category[20]) / 4)
+
+    rows = to_rows(cells, ["recent_date", "location_id", "recent_price_value"])
+    assert rows[0]["recent_date"].startswith("2026-10")
+
+def test_compute_month_without_history_is_empty():
+    prices = rows_to_columns([price(1, 1, 5, 20.0, "2026-10-03")], PRICE_COLUMNS)
+    results = compute_month(prices, PRODUCTS, WEIGHTS, 2026, 10)
+    assert len(results["cells"]["product_id"]) == 0
+    assert len(results["real_cpi"]["criterion_id"]) == 0
+
+def test_write_results_replaces_the_month_in_one_call():
+    prices = rows_to_columns([
+        price(1, 1, 5, 20.0, "2025-10-03"),
+        price(2, 1, 5, 22.0, "2026-10-01"),
+    ], PRICE_COLUMNS)
+    client = MagicMock()
+    write_results(client, compute_month(prices, PRODUCTS, WEIGHTS, 2026, 10), 2026, 10)
+
+    client.rpc.assert_called_once()
+    client.table.assert_not_called()
+    name, params = client.rpc.call_args.args
+    assert name == "replace_month_inflation"
+    assert (params["p_year"], params["p_month"]) == (2026, 10)
+    assert [row["recent_price_id"] for row in params["p_cells"]] == [2]
+    assert params["p_category"] == [{"country_id": 1, "category_id": 10, "ci_inflation_rate": 10.0}]
+    assert params["p_real_cpi"][0]["criterion_id"] == 7
@@ -0,0 +1,71 @@
+from unittest.mock import MagicMock
+import numpy as np
+from local_mirror import rows_to_columns, PRICE_COLUMNS, PRODUCT_COLUMNS
+from cpi_incremental import MonthState, apply_increment, rebuild, verify, write_increment
+
+PRODUCTS = rows_to_columns([
+    {"product_id": 1, "country_id": 1, "category_id": 10, "is_active_product": True, "product_name": "Leche", "ean_code": "1"},
+    {"product_id": 2, "country_id": 1, "category_id": 20, "is_active_product": True, "product_name": "Jabon", "ean_code": "2"},
+], PRODUCT_COLUMNS)
+WEIGHTS = {"criterion_id": np.array([7]), "category_id": np.array([10]), "weight_value": np.array([1.0])}
+
+def prices(rows):
+    return rows_to_columns([
+        {"price_id": pid, "product_id": product, "location_id": 1, "establishment_id": est,
+         "price_value": value, "date": day, "is_valid": True}
+        for pid, product, est, value, day in rows
+    ], PRICE_COLUMNS)
+
+BASE = [
+    (1, 1, 5, 20.0, "2025-10-03"),
+    (2, 2, 5, 10.0, "2025-10-04"),
+    (3, 1, 5, 22.0, "2026-10-01"),
+    (4, 2, 5, 11.0, "2026-10-02"),
+]
+
+def test_increment_matches_full_rebuild(tmp_path):
+    state = MonthState(2026, 10, str(tmp_path))
+    rebuild(state, prices(BASE), PRODUCTS, WEIGHTS)
+    state.save()
+
+    newer = BASE + [
+        (5, 1, 5, 25.0, "2026-10-08"),   # replaces product 1's recent price
+        (6, 2, 6, 12.0, "2026-10-08"),   # new establishment, no history yet
+        (7, 2, 6, 10.0, "2025-10-09"),   # ...which this late history completes
+    ]
+    loaded = MonthState(2026, 10, str(tmp_path))
+    assert loaded.load() and loaded.watermark == 4
+    changes = apply_increment(loaded, prices(newer), PRODUCTS)
+
+    assert sorted(changes["removed"]["recent_price_id"].tolist()) == [3]
+    assert sorted(changes["added"]["recent_price_id"].tolist()) == [5, 6]
+    assert changes["category"]["upsert"]["category_id"].tolist() == [10, 20]
+    assert loaded.watermark == 7
+    assert verify(loaded, prices(newer), PRODUCTS) == {
+        "missing_cells": 0, "extra_cells": 0, "stale_cells": 0, "category_mismatches": 0
+    }
+
+def test_verify_detects_edits_below_watermark(tmp_path):
+    state = MonthState(2026, 10, str(tmp_path))
+    rebuild(state, prices(BASE), PRODUCTS, WEIGHTS)
+    edited = prices(BASE)
+    edited["is_valid"][2] = False
+    assert verify(state, edited, PRODUCTS)["extra_cells"] == 1
+
+def test_write_increment_applies_changes_in_one_call(tmp_path):
+    state = MonthState(2026, 10, str(tmp_path))
+    rebuild(state, prices(BASE), PRODUCTS, WEIGHTS)
+    changes = apply_increment(state, prices(BASE + [(5, 1, 5, 25.0, "2026-10-08")]), PRODUCTS)
+    changes["category_location"]["deleted"].append((1, 20, -1))
+    client = MagicMock()
+    write_increment(client, state, changes, WEIGHTS)
+
+    client.rpc.assert_called_once()
+    client.table.assert_not_called()
+    name, params = client.rpc.call_args.args
+    assert name == "apply_month_inflation_increment"
+    assert params["p_removed_price_ids"] == [3]
+    assert [row["recent_price_id"] for row in params["p_added_cells"]] == [5]
+    assert [row["category_id"] for row in params["p_category"]] == [10]
+    assert params["p_category_location_deleted"] == [{"country_id": 1, "category_id": 20, "location_id": None}]
+    assert params["p_real_cpi"][0]["criterion_id"] == 7
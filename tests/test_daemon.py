@@ -0,0 +1,82 @@
+import asyncio
+import pytest
+from aiohttp.test_utils import TestServer, TestClient
+from daemon import ScraperDaemon
+
+ESTABLISHMENTS = [
+    {"establishment_id": 1, "establishment_name": "Chedraui"},
+    {"establishment_id": 2, "establishment_name": "La Comer"},
+]
+PRODUCT = {"product_id": 9, "product_name": "Sal La Fina", "ean_code": "034587030013"}
+
+def make_daemon(scraped):
+    async def scrape(product, establishment):
+        scraped.append((product['product_id'], establishment['establishment_id']))
+        return {"establishment_id": establishment['establishment_id'],
+                "establishment_name": establishment['establishment_name'],
+                "status": "persisted", "price": 12.5}
+
+    async def fetch_due(limit, after_product_id):
+        return [PRODUCT]
+
+    async def fetch_product(product_id):
+        return [PRODUCT] if product_id == PRODUCT['product_id'] else []
+
+    return ScraperDaemon(ESTABLISHMENTS, scrape, fetch_due, fetch_product, workers=1)
+
+@pytest.mark.asyncio
+async def test_on_demand_endpoint_returns_results():
+    scraped = []
+    daemon = make_daemon(scraped)
+    worker = asyncio.create_task(daemon._worker(0))
+    async with TestClient(TestServer(daemon.build_app())) as http:
+        response = await http.post("/scrape/9")
+        body = await response.json()
+        missing = await http.get("/scrape/404")
+    worker.cancel()
+
+    assert response.status == 200
+    assert body["complete"] is True
+    assert [r["price"] for r in body["results"]] == [12.5, 12.5]
+    assert sorted(scraped) == [(9, 1), (9, 2)]
+    assert missing.status == 404
+
+@pytest.mark.asyncio
+async def test_due_work_is_deduplicated():
+    daemon = make_daemon([])
+    assert daemon.enqueue(PRODUCT, ESTABLISHMENTS[0]) is True
+    assert daemon.enqueue(PRODUCT, ESTABLISHMENTS[0]) is False
+    # On-demand requests always go through, ahead of due work.
+    future = asyncio.get_running_loop().create_future()
+    assert daemon.enqueue(PRODUCT, ESTABLISHMENTS[0], priority=0, future=future) is True
+    assert daemon.queue.get_nowait()[4] is future
+
+@pytest.mark.asyncio
+async def test_polls_page_through_the_catalog_past_failing_products(monkeypatch):
+    import daemon as daemon_module
+
+    monkeypatch.setattr(daemon_module, "POLL_BATCH", 2)
+    catalog = [dict(PRODUCT, product_id=i) for i in range(1, 6)]
+    scraped = []
+
+    async def scrape(product, establishment):
+        scraped.append(product['product_id'])
+        # The first page never gets a price
+        status = "not_found" if product['product_id'] <= 2 else "persisted"
+        return {"establishment_id": establishment['establishment_id'],
+                "establishment_name": establishment['establishment_name'], "status": status, "price": None}
+
+    async def fetch_due(limit, after_product_id):
+        return [p for p in catalog if p['product_id'] > after_product_id][:limit]
+
+    daemon = ScraperDaemon(ESTABLISHMENTS[:1], scrape, fetch_due, lambda product_id: None, workers=1)
+    worker = asyncio.create_task(daemon._worker(0))
+    queued = []
+    for _ in range(4):
+        queued.append(await daemon.poll_once())
+        await daemon.queue.join()
+    worker.cancel()
+
+    assert scraped == [1, 2, 3, 4, 5]
+    # The cursor wraps after the short last page; the failed pairs wait out their back-off
+    assert queued == [2, 2, 1, 0]
@@ -0,0 +1,28 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from db import Database
+
+@pytest.mark.asyncio
+async def test_execute_times_each_named_call():
+    client = MagicMock()
+    client.rpc.return_value.execute = AsyncMock(return_value=MagicMock(data=[1]))
+    db = Database(client)
+
+    response = await db.execute("get_products_to_scrape", db.rpc("get_products_to_scrape", {"p_limit": 3}))
+    await db.execute("get_products_to_scrape", db.rpc("get_products_to_scrape", {"p_limit": 3}))
+
+    assert response.data == [1]
+    stats = db.stats["get_products_to_scrape"]
+    assert stats.calls == 2 and stats.errors == 0
+    assert stats.max_s >= 0 and stats.total_s >= stats.max_s
+
+@pytest.mark.asyncio
+async def test_execute_counts_errors_and_reraises():
+    client = MagicMock()
+    client.table.return_value.select.return_value.execute = AsyncMock(side_effect=RuntimeError("down"))
+    db = Database(client)
+
+    with pytest.raises(RuntimeError):
+        await db.execute("fetch_establishments", db.table("cpi_establishments").select("*"))
+
+    assert db.stats["fetch_establishments"].errors == 1
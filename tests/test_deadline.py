@@ -0,0 +1,24 @@
+import pytest
+from deadline import Deadline, DeadlineExceeded, MIN_TIMEOUT_S
+
+def test_no_deadline_keeps_defaults():
+    deadline = Deadline()
+    assert deadline.remaining() is None
+    assert not deadline.expired()
+    assert deadline.timeout_ms(30000) == 30000
+    deadline.check(10 ** 6)
+
+def test_timeouts_shrink_near_deadline():
+    deadline = Deadline(70, reserve_s=60)
+    assert deadline.timeout_s(30) <= 10
+    assert deadline.timeout_s(30) >= MIN_TIMEOUT_S
+    assert deadline.can_fit(5)
+    with pytest.raises(DeadlineExceeded):
+        deadline.check(45)
+
+def test_reserve_expires_before_deadline():
+    deadline = Deadline(30, reserve_s=60)
+    assert deadline.expired()
+    assert deadline.hard_remaining() > 0
+    with pytest.raises(DeadlineExceeded):
+        deadline.check()
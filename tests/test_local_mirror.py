@@ -0,0 +1,58 @@
+import numpy as np
+from local_mirror import LocalMirror, ColumnTable, rows_to_columns, PRICE_COLUMNS
+
+class FakeQuery:
+    def __init__(self, rows):
+        self.rows = rows
+    def select(self, *_):
+        return self
+    def gt(self, key, value):
+        return FakeQuery([r for r in self.rows if r[key] > value])
+    def order(self, key):
+        return FakeQuery(sorted(self.rows, key=lambda r: r[key]))
+    def limit(self, n):
+        return FakeQuery(self.rows[:n])
+    def execute(self):
+        return type("Response", (), {"data": self.rows})
+
+class FakeClient:
+    def __init__(self, tables):
+        self.tables = tables
+    def table(self, name):
+        return FakeQuery(self.tables[name])
+
+def price(price_id, value):
+    return {"price_id": price_id, "product_id": 1, "location_id": None, "establishment_id": 2,
+            "price_value": value, "date": "2026-10-01", "is_valid": True}
+
+def test_sync_appends_from_watermark(tmp_path, monkeypatch):
+    monkeypatch.setattr("local_mirror.SYNC_PAGE_SIZE", 2)
+    tables = {
+        "cpi_prices": [price(i, 10.0 + i) for i in range(1, 4)],
+        "cpi_products": [{"product_id": 1, "country_id": 1, "category_id": 5, "is_active_product": True,
+                          "product_name": "Leche", "ean_code": "7501055904143"}],
+        "cpi_establishments": [{"establishment_id": 2, "country_id": 1, "establishment_name": "Chedraui"}],
+    }
+    mirror = LocalMirror(str(tmp_path))
+    assert mirror.sync(FakeClient(tables))["cpi_prices"] == 3
+
+    tables["cpi_prices"].append(price(4, 99.5))
+    reopened = LocalMirror(str(tmp_path))
+    assert reopened.prices.watermark == 3
+    assert reopened.sync(FakeClient(tables))["cpi_prices"] == 1
+
+    prices = LocalMirror(str(tmp_path)).prices.columns()
+    assert isinstance(prices["price_value"], np.memmap)
+    assert prices["price_id"].tolist() == [1, 2, 3, 4]
+    assert prices["price_value"][-1] == 99.5
+    assert prices["location_id"][0] == -1
+    assert str(prices["date"][0]) == "2026-10-01"
+    assert LocalMirror(str(tmp_path)).products.columns()["product_name"][0] == "Leche"
+
+def test_append_ignores_torn_tail(tmp_path):
+    table = ColumnTable(str(tmp_path))
+    table.append(rows_to_columns([price(1, 1.0)], PRICE_COLUMNS), watermark=1)
+    with open(tmp_path / "price_id.bin", "ab") as f:
+        f.write(b"\x07\x07\x07")
+    table.append(rows_to_columns([price(2, 2.0)], PRICE_COLUMNS), watermark=2)
+    assert ColumnTable(str(tmp_path)).columns()["price_id"].tolist() == [1, 2]
@@ -0,0 +1,32 @@
+import io
+import logging
+from log_setup import SamplingFilter, ATTEMPT, configure_logging, shutdown_logging, log_attempt, pair_attempts
+
+def make_record(extra=None, level=logging.INFO):
+    record = logging.LogRecord("main", level, __file__, 1, "msg", None, None)
+    for key, value in (extra or {}).items():
+        setattr(record, key, value)
+    return record
+
+def test_sampling_filter_passes_burst_then_samples():
+    sampler = SamplingFilter(window_s=3600, burst=3, every=5)
+    passed = [sampler.filter(make_record(ATTEMPT)) for _ in range(20)]
+    assert passed[:3] == [True, True, True]
+    # The first 3, then every 5th (5, 10, 15, 20)
+    assert sum(passed) == 7
+    assert sampler.suppressed["attempt"] == 20 - sum(passed)
+    assert sampler.filter(make_record())
+    assert sampler.filter(make_record(ATTEMPT, logging.ERROR))
+
+def test_queue_logging_writes_from_listener_thread():
+    stream = io.StringIO()
+    configure_logging(stream=stream)
+    try:
+        token = pair_attempts.set(0)
+        log_attempt(logging.getLogger("main"), "[Chedraui] Trying direct for Leche...")
+        assert pair_attempts.get() == 1
+        pair_attempts.reset(token)
+    finally:
+        shutdown_logging()
+        logging.getLogger().handlers.clear()
+    assert "[Chedraui] Trying direct" in stream.getvalue()
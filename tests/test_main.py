@@ -1,53 +1,74 @@
+import httpx
 import pytest
-from unittest.mock import AsyncMock, MagicMock, patch
-import json
+from unittest.mock import AsyncMock, MagicMock
 import main
+from db import Database
+from adapters import EgressBlocked
+from single_flight import SingleFlight
+
+PRODUCT = {"product_id": 1, "ean_code": "7501055300075", "product_name": "Leche Lala 1L", "country_id": None, "category_id": 3}
+
+def serve(monkeypatch, response):
+    """Answers every request of the shared HTTP pool with `response`."""
+    client = httpx.AsyncClient(transport=httpx.MockTransport(lambda request: response))
+    monkeypatch.setattr(main.http_pool, "get", AsyncMock(return_value=client))
+    monkeypatch.setattr(main, "flights", SingleFlight())
 
 @pytest.mark.asyncio
 async def test_persist_price():
     mock_client = MagicMock()
-    mock_client.rpc.return_value.execute.return_value = {"data": "success"}
-    
-    await main.persist_price(mock_client, 1, 25.50)
-    
+    mock_client.rpc.return_value.execute = AsyncMock(return_value=MagicMock(data="success"))
+
+    assert await main.persist_price(Database(mock_client), PRODUCT, 1, 25.50)
+
     mock_client.rpc.assert_called_once()
     args = mock_client.rpc.call_args[0]
     assert args[0] == "add_product_and_price"
     assert args[1]["p_price_value"] == 25.50
     assert args[1]["p_establishment_id"] == 1
+    assert args[1]["p_ean_code"] == PRODUCT["ean_code"]
+    assert args[1]["p_country_id"] == 1 and args[1]["p_category_id"] == 3
+
+@pytest.mark.asyncio
+async def test_chedraui_fetch_reads_the_vtex_price(monkeypatch):
+    serve(monkeypatch, httpx.Response(200, json=[{"items": [{"sellers": [{"commertialOffer": {"Price": 28.00}}]}]}]))
+    assert await main.ChedrauiAdapter(main.services).fetch(None, PRODUCT, None) == 28.00
+
+@pytest.mark.asyncio
+async def test_chedraui_fetch_error_response_is_blocked(monkeypatch):
+    serve(monkeypatch, httpx.Response(404))
+    with pytest.raises(EgressBlocked):
+        await main.ChedrauiAdapter(main.services).fetch(None, PRODUCT, None)
 
 @pytest.mark.asyncio
-async def test_scrape_chedraui_success():
-    with patch("httpx.AsyncClient.get", new_callable=AsyncMock) as mock_get:
-        mock_response = MagicMock()
-        mock_response.status_code = 200
-        mock_response.json.return_value = [{
-            "items": [{"sellers": [{"commertialOffer": {"Price": 28.00}}]}]
-        }]
-        mock_get.return_value = mock_response
-        
-        price = await main.scrape_chedraui()
-        assert price == 28.00
+async def test_soriana_fetch_reads_the_html_price(monkeypatch):
+    serve(monkeypatch, httpx.Response(
+        200, text='<html><div class="price"><div class="sales"><span class="value">$30.50</span></div></div></html>'))
+    assert await main.SorianaAdapter(main.services).fetch(None, PRODUCT, None) == 30.50
 
 @pytest.mark.asyncio
-async def test_scrape_chedraui_failure():
-    with patch("httpx.AsyncClient.get", new_callable=AsyncMock) as mock_get:
-        mock_response = MagicMock()
-        mock_response.status_code = 404
-        mock_get.return_value = mock_response
-        
-        price = await main.scrape_chedraui()
-        assert price is None
+async def test_iter_products_to_scrape_pages_by_keyset():
+    pages = [
+        [{"product_id": 1}, {"product_id": 4}],
+        [{"product_id": 7}],
+    ]
+    mock_client = MagicMock()
+    mock_client.rpc.return_value.execute = AsyncMock(side_effect=[MagicMock(data=page) for page in pages])
+
+    products = [p async for p in main.iter_products_to_scrape(Database(mock_client), page_size=2)]
+
+    assert [p["product_id"] for p in products] == [1, 4, 7]
+    cursors = [call.args[1]["p_after_product_id"] for call in mock_client.rpc.call_args_list]
+    assert cursors == [0, 4]
 
 @pytest.mark.asyncio
-async def test_scrape_soriana_html_fallback():
-    with patch("httpx.AsyncClient.get", new_callable=AsyncMock) as mock_get:
-        mock_response = MagicMock()
-        mock_response.status_code = 200
-        # Simulate JSON decode error to trigger fallback
-        mock_response.json.side_effect = json.JSONDecodeError("Expecting value", "", 0)
-        mock_response.text = '<html><div class="price"><div class="sales"><span class="value">$30.50</span></div></div></html>'
-        mock_get.return_value = mock_response
-        
-        price = await main.scrape_soriana()
-        assert price == 30.50
+async def test_scrape_pair_returns_the_existing_price():
+    mock_client = MagicMock()
+    mock_client.execute = AsyncMock(return_value=MagicMock(data=[{"price_value": 31.5, "date": "2026-10-03"}]))
+    product = {"product_id": 1, "product_name": "Leche", "ean_code": "7501000000001"}
+    establishment = {"establishment_id": 2, "establishment_name": "Chedraui"}
+
+    result = await main.scrape_pair(mock_client, None, product, establishment)
+
+    assert (result["status"], result["price"], result["date"]) == ("exists", 31.5, "2026-10-03")
+    assert result["source"] is None
@@ -0,0 +1,142 @@
+import pytest
+
+from adapters import ScrapeResult, EgressBlocked, VERDICT_FOUND, VERDICT_NOT_FOUND, VERDICT_UNREACHABLE
+from negative_cache import NotFoundCache
+from test_adapters import FakeAdapter, make_services, PRODUCT
+
+HOUR = 3600
+
+
+def test_back_off_doubles_up_to_the_cap(tmp_path):
+    cache = NotFoundCache(str(tmp_path / "not_found.json"), backoff_h=6, max_backoff_h=20)
+    assert [cache.record_not_found(1, 2, now=0) / HOUR for _ in range(4)] == [6, 12, 20, 20]
+    assert cache.should_skip(1, 2, now=19 * HOUR)
+    assert not cache.should_skip(1, 2, now=20 * HOUR)
+    assert not cache.should_skip(1, 3, now=0)
+
+    cache.record_found(1, 2)
+    assert not cache.should_skip(1, 2, now=0)
+    assert cache.counts == {"skipped": 1, "recorded": 4, "cleared": 1}
+
+
+def test_verdicts_persist_between_runs(tmp_path):
+    path = str(tmp_path / "cache" / "not_found.json")
+    cache = NotFoundCache(path)
+    cache.record_not_found(1, 2)
+    cache.save()
+
+    reloaded = NotFoundCache(path)
+    assert reloaded.should_skip(1, 2)
+    reloaded.skipping = False
+    assert not reloaded.should_skip(1, 2)
+
+
+def test_old_verdicts_are_forgotten_on_save(tmp_path):
+    path = str(tmp_path / "not_found.json")
+    cache = NotFoundCache(path)
+    cache.record_not_found(1, 2, now=1.0)
+    cache.record_not_found(3, 4)
+    cache.save()
+    assert list(NotFoundCache(path).entries) == ["3:4"]
+
+
+def test_scrape_result_verdicts():
+    assert ScrapeResult(10.0).verdict == VERDICT_FOUND
+    assert ScrapeResult(attempts=2, answered=1).verdict == VERDICT_NOT_FOUND
+    assert ScrapeResult(attempts=2).verdict == VERDICT_UNREACHABLE
+
+
+@pytest.mark.asyncio
+async def test_blocked_and_broken_attempts_are_not_a_verdict():
+    services = make_services([{"url": "http://p1", "proxy_id": 1}, {"url": "http://p2", "proxy_id": 2}])
+    adapter = FakeAdapter(services, [RuntimeError("timeout"), EgressBlocked("HTTP 403"), RuntimeError("reset")])
+    adapter.discard_egress = lambda proxy_url: _noop()
+    assert (await adapter.scrape(None, PRODUCT)).verdict == VERDICT_UNREACHABLE
+
+    adapter = FakeAdapter(make_services([{"url": "http://p1", "proxy_id": 1}]), [EgressBlocked("HTTP 403"), None])
+    assert (await adapter.scrape(None, PRODUCT)).verdict == VERDICT_NOT_FOUND
+
+
+async def _noop():
+    pass
+
+
+def patch_chedraui(tmp_path, monkeypatch, response):
+    import httpx
+    from unittest.mock import AsyncMock
+    import main
+    from single_flight import SingleFlight
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(lambda request: response))
+    cache = NotFoundCache(str(tmp_path / "not_found.json"))
+    monkeypatch.setattr(main, "not_found", cache)
+    monkeypatch.setattr(main, "flights", SingleFlight())
+    monkeypatch.setattr(main, "check_existing_price", AsyncMock(return_value=None))
+    monkeypatch.setattr(main.http_pool, "get", AsyncMock(return_value=client))
+    monkeypatch.setattr(main.rotator, "get_proxy", AsyncMock(return_value=None))
+    monkeypatch.setattr(main.catalog, "lookup", lambda *args: None)
+    return cache
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("status", [429, 500, 504])
+async def test_error_responses_are_never_not_found_verdicts(tmp_path, monkeypatch, status):
+    import httpx
+    import main
+
+    cache = patch_chedraui(tmp_path, monkeypatch, httpx.Response(status, text="busy"))
+    product = dict(PRODUCT, category_id=1)
+    result = await main.scrape_pair(None, None, product, {"establishment_id": 2, "establishment_name": "Chedraui"})
+    assert result["status"] == "unreachable"
+    assert (await main.SCRAPER_REGISTRY["Chedraui"].scrape(None, product)).verdict == VERDICT_UNREACHABLE
+    assert cache.entries == {} and cache.counts["recorded"] == 0
+
+
+def test_next_data_page_without_product_is_no_answer():
+    import main
+
+    adapter = main.BodegaAdapter(make_services())
+    for page in (None, {"props": {"pageProps": {}}}):
+        with pytest.raises(EgressBlocked):
+            adapter.page_price(page)
+
+
+@pytest.mark.asyncio
+async def test_empty_search_is_a_not_found_verdict(tmp_path, monkeypatch):
+    import httpx
+    import main
+
+    cache = patch_chedraui(tmp_path, monkeypatch, httpx.Response(200, json=[]))
+    product = dict(PRODUCT, category_id=1)
+    result = await main.scrape_pair(None, None, product, {"establishment_id": 2, "establishment_name": "Chedraui"})
+    assert result["status"] == "not_found"
+    assert cache.should_skip(PRODUCT["product_id"], 2)
+
+
+def bodega_page(has_next_data, link):
+    from unittest.mock import AsyncMock, MagicMock
+
+    page = MagicMock()
+    page.goto = AsyncMock()
+    page.wait_for_load_state = AsyncMock()
+    page.evaluate = AsyncMock(return_value=has_next_data)
+    page.query_selector = AsyncMock(return_value=link)
+    page.click = AsyncMock(side_effect=AssertionError("must not wait for a missing link"))
+    context = MagicMock()
+    context.new_page = AsyncMock(return_value=page)
+    context.close = AsyncMock()
+    pool = MagicMock()
+    pool.new_context = AsyncMock(return_value=context)
+    return pool
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("has_next_data, verdict", [(True, VERDICT_NOT_FOUND), (False, VERDICT_UNREACHABLE)])
+async def test_browser_search_without_results_is_answered(monkeypatch, has_next_data, verdict):
+    from unittest.mock import AsyncMock
+    import main
+
+    monkeypatch.setattr(main, "install_blocking", AsyncMock(return_value=None))
+    adapter = main.BodegaAdapter(make_services())
+    result = await adapter.scrape(bodega_page(has_next_data, link=None), PRODUCT)
+    assert result.verdict == verdict
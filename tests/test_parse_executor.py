@@ -0,0 +1,44 @@
+import json
+import pytest
+from parse_executor import (ParseExecutor, SORIANA_NAME_SELECTORS, vtex_price, soriana_price, lacomer_price,
+                            next_data_price, next_data_html_price)
+
+NEXT_DATA = {"props": {"pageProps": {"initialData": {"data": {"product": {"price": {"price": {"price": 0, "leadPrice": 42.5}}}}}}}}
+
+def test_extractors_return_only_the_price():
+    assert vtex_price(json.dumps([{"items": [{"sellers": [{"commertialOffer": {"Price": 19.9}}]}]}]).encode()) == 19.9
+    assert vtex_price(b"[]") is None
+    assert lacomer_price(b'{"estrucArti": {"artPrven": "31.00"}}') == 31.0
+    assert lacomer_price(b'{"estrucArti": {"artPrven": 0}}') is None
+    assert next_data_price(NEXT_DATA) == 42.5
+    html = f'<html><script id="__NEXT_DATA__" type="application/json">{json.dumps(NEXT_DATA)}</script></html>'
+    assert next_data_html_price(html.encode()) == 42.5
+
+def test_soriana_selectors():
+    html = '<div data-price>$1,030.50</div>'
+    assert soriana_price(html) == 1030.5
+    assert soriana_price(html, SORIANA_NAME_SELECTORS) is None
+
+def test_offloads_only_measured_expensive_extractors():
+    executor = ParseExecutor(workers=2, inline_bytes=1024, inline_ms=1.0)
+    assert not executor.offload(soriana_price, 50_000)  # cost not measured yet
+    executor.cost_per_byte["soriana_price"] = 1e-6  # ~1 ms/KB
+    executor.cost_per_byte["vtex_price"] = 5e-9
+    assert executor.offload(soriana_price, 4096)
+    assert not executor.offload(soriana_price, 512)  # below the pickling break-even
+    assert not executor.offload(vtex_price, 100_000)
+    assert executor.offload(vtex_price, 1_000_000)
+    assert not ParseExecutor(workers=0).offload(soriana_price, 10**7)
+
+@pytest.mark.asyncio
+async def test_parse_runs_in_pool_and_propagates_errors():
+    executor = ParseExecutor(workers=1, inline_bytes=0, inline_ms=0)
+    body = json.dumps({"estrucArti": {"artPrven": 12.5}})
+    assert await executor.parse(lacomer_price, body) == 12.5  # inline, measures the cost
+    try:
+        assert await executor.parse(lacomer_price, body) == 12.5
+        assert executor.stats.inline == 1 and executor.stats.pooled == 1
+        with pytest.raises(json.JSONDecodeError):
+            await executor.parse(lacomer_price, "not json")
+    finally:
+        executor.close()
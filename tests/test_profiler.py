@@ -0,0 +1,42 @@
+import time
+import asyncio
+import pytest
+from profiler import RunProfiler, callback_label
+
+
+def busy(seconds):
+    started = time.perf_counter()
+    while time.perf_counter() - started < seconds:
+        pass
+
+
+async def blocking_worker():
+    for _ in range(3):
+        busy(0.04)
+        await asyncio.sleep(0.005)
+
+
+def test_callback_label_groups_task_steps():
+    handle = "<Task pending name='Task-9' coro=<scrape_pair() running at /app/main.py:640> wait_for=<Future pending>>"
+    assert callback_label(handle) == "task step scrape_pair() at main.py:640"
+
+
+@pytest.mark.asyncio
+async def test_profile_attributes_samples_lag_and_cpu_to_tasks(tmp_path):
+    async with RunProfiler(str(tmp_path), interval_ms=2, lag_interval_ms=10, slow_callback_ms=20) as profiler:
+        await asyncio.gather(*(asyncio.ensure_future(blocking_worker()) for _ in range(2)))
+        await asyncio.sleep(0.03)
+
+    stats = profiler.tasks["blocking_worker"]
+    assert stats.tasks == 2 and stats.steps >= 6
+    assert stats.cpu_s >= 0.2
+    assert any(stack.startswith("task:blocking_worker;") and "busy (test_profiler.py" in stack
+               for stack in profiler.samples)
+    assert max(profiler.lags) >= 0.03
+    assert sum(len(v) for v in profiler.slow_callbacks.values()) >= 6
+    assert not asyncio.get_running_loop().get_debug()
+
+    folded = next(tmp_path.glob("*.folded")).read_text().splitlines()
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in folded)
+    summary = next(tmp_path.glob("*.txt")).read_text()
+    assert "Loop lag" in summary and "blocking_worker" in summary
@@ -0,0 +1,61 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from db import Database
+from proxy_client import ProxyRotator
+
+def make_client(rows_by_lane):
+    """Async Supabase mock whose cpi_proxies query returns rows depending on the lane filter."""
+    client = MagicMock()
+    query = client.table.return_value.select.return_value.eq.return_value
+    query.contains.side_effect = lambda column, value: MagicMock(**{
+        "order.return_value.limit.return_value.execute": AsyncMock(
+            return_value=MagicMock(data=rows_by_lane.get(next(iter(value)), [])))
+    })
+    query.order.return_value.limit.return_value.execute = AsyncMock(
+        return_value=MagicMock(data=rows_by_lane.get(None, [])))
+    return client
+
+ROW = {"proxy_id": 3, "protocol": "http", "ip_address": "1.2.3.4", "port": 8080}
+
+@pytest.mark.asyncio
+async def test_get_proxy_filters_by_lane():
+    client = make_client({"walmart": [ROW]})
+    rotator = ProxyRotator(Database(client))
+    assert await rotator.get_proxy("walmart") == {"url": "http://1.2.3.4:8080", "proxy_id": 3}
+    client.table.return_value.select.return_value.eq.return_value.contains.assert_called_with("lanes", {"walmart": True})
+
+@pytest.mark.asyncio
+async def test_get_proxy_without_proven_proxy_returns_none():
+    rotator = ProxyRotator(Database(make_client({None: [dict(ROW, proxy_id=9)]})))
+    assert await rotator.get_proxy("soriana") is None
+    assert "soriana" in rotator._unproven_lanes
+
+@pytest.mark.asyncio
+async def test_get_proxy_falls_back_when_lane_unproven_and_opted_in():
+    rotator = ProxyRotator(Database(make_client({None: [dict(ROW, proxy_id=9)]})), lane_fallback=True)
+    assert (await rotator.get_proxy("soriana"))["proxy_id"] == 9
+    assert "soriana" in rotator._unproven_lanes
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("lane_fallback, proxy_id", [(False, None), (True, 9)])
+async def test_get_proxy_reports_missing_lanes_column(caplog, lane_fallback, proxy_id):
+    client = make_client({None: [dict(ROW, proxy_id=9)]})
+    query = client.table.return_value.select.return_value.eq.return_value
+    query.contains.side_effect = None
+    query.contains.return_value.order.return_value.limit.return_value.execute = AsyncMock(
+        side_effect=Exception("column cpi_proxies.lanes does not exist"))
+    rotator = ProxyRotator(Database(client), lane_fallback=lane_fallback)
+
+    proxies = [await rotator.get_proxy("walmart") for _ in range(2)]
+    assert [p and p["proxy_id"] for p in proxies] == [proxy_id, proxy_id]
+    assert sum("scripts/add_proxy_lanes.sql" in r.message for r in caplog.records) == 1
+
+@pytest.mark.asyncio
+async def test_report_failure_marks_dead_after_five():
+    client = MagicMock()
+    client.table.return_value.select.return_value.eq.return_value.execute = AsyncMock(
+        return_value=MagicMock(data=[{"fail_count": 5}]))
+    client.table.return_value.update.return_value.eq.return_value.execute = AsyncMock()
+    rotator = ProxyRotator(Database(client))
+    await rotator.report_failure(3)
+    client.table.return_value.update.assert_called_with({"fail_count": 6, "status": "dead"})
@@ -0,0 +1,83 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from scripts import proxy_harvester as harvester
+
+WALMART_ROBOTS = harvester.RETAILER_LANES["walmart"]
+CHEDRAUI_ROBOTS = harvester.RETAILER_LANES["chedraui"]
+
+
+class FakeSession:
+    """aiohttp.ClientSession stand-in: `routes` maps (proxy host, url) to a status or an exception."""
+
+    def __init__(self, routes):
+        self.routes = routes
+        self.requests = []
+
+    def get(self, url, proxy=None, **kwargs):
+        host = proxy.split("//")[1].split(":")[0]
+        self.requests.append((host, url))
+        outcome = self.routes.get((host, url), asyncio.TimeoutError())
+        context = MagicMock()
+        if isinstance(outcome, Exception):
+            context.__aenter__ = AsyncMock(side_effect=outcome)
+        else:
+            context.__aenter__ = AsyncMock(return_value=MagicMock(status=outcome))
+        context.__aexit__ = AsyncMock(return_value=False)
+        return context
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+@pytest.fixture(autouse=True)
+def two_lanes(monkeypatch):
+    monkeypatch.setattr(harvester, "ENABLED_LANES", ["walmart", "chedraui"])
+
+
+@pytest.mark.asyncio
+async def test_lanes_record_https_and_each_retailer_probe():
+    session = FakeSession({
+        ("1.1.1.1", harvester.HTTPS_PROBE_URL): 200,
+        ("1.1.1.1", WALMART_ROBOTS): 403,
+        ("1.1.1.1", CHEDRAUI_ROBOTS): 200,
+    })
+    lanes = await harvester.validate_lanes(session, "1.1.1.1:8080")
+    assert lanes == {"https": True, "walmart": False, "chedraui": True}
+
+
+@pytest.mark.asyncio
+async def test_retailer_lanes_fail_without_https():
+    session = FakeSession({("1.1.1.1", harvester.HTTPS_PROBE_URL): 502, ("1.1.1.1", CHEDRAUI_ROBOTS): 200})
+    lanes = await harvester.validate_lanes(session, "1.1.1.1:8080")
+    assert lanes == {"https": False, "walmart": False, "chedraui": False}
+    assert session.requests == [("1.1.1.1", harvester.HTTPS_PROBE_URL)]
+
+
+@pytest.mark.asyncio
+async def test_proxies_failing_the_tcp_connect_never_reach_http(monkeypatch):
+    async def open_connection(host, port):
+        if host == "2.2.2.2":
+            raise ConnectionRefusedError()
+        writer = MagicMock()
+        writer.wait_closed = AsyncMock()
+        return MagicMock(), writer
+
+    session = FakeSession({
+        ("1.1.1.1", "http://httpbin.org/ip"): 200,
+        ("1.1.1.1", harvester.HTTPS_PROBE_URL): 200,
+        ("1.1.1.1", WALMART_ROBOTS): 200,
+        ("2.2.2.2", "http://httpbin.org/ip"): 200,
+    })
+    monkeypatch.setattr(harvester.asyncio, "open_connection", open_connection)
+    monkeypatch.setattr(harvester.aiohttp, "ClientSession", lambda: session)
+
+    rows = await harvester.validate_candidates([("1.1.1.1:8080", "MX"), ("2.2.2.2:3128", "US"), ("not-a-proxy", "MX")])
+    assert [(row["ip_address"], row["port"], row["country_code"]) for row in rows] == [("1.1.1.1", 8080, "MX")]
+    assert rows[0]["lanes"] == {"https": True, "walmart": True, "chedraui": False}
+    assert all(host != "2.2.2.2" for host, _ in session.requests)
@@ -0,0 +1,17 @@
+import json
+from reference_cache import load_reference, save_reference
+
+ESTABLISHMENTS = [{"establishment_id": 3, "establishment_name": "Chedraui"}]
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / "cache" / "reference.json")
+    save_reference(ESTABLISHMENTS, {"3": "Chedraui"}, path=path)
+    data = load_reference(path=path, ttl=60)
+    assert data["establishments"] == ESTABLISHMENTS
+    assert data["registry"] == {"3": "Chedraui"}
+
+def test_expired_or_missing_cache(tmp_path):
+    path = tmp_path / "reference.json"
+    assert load_reference(path=str(path)) is None
+    path.write_text(json.dumps({"fetched_at": 0, "establishments": ESTABLISHMENTS, "registry": {}}))
+    assert load_reference(path=str(path), ttl=60) is None
@@ -0,0 +1,23 @@
+from resource_blocking import BLOCKED_HOST_PATTERN, BLOCKED_ASSET_PATTERN, BlockStats, asset_category
+
+def test_patterns_block_trackers_and_assets_only():
+    assert BLOCKED_HOST_PATTERN.search("https://www.googletagmanager.com/gtm.js?id=GTM-1")
+    assert BLOCKED_HOST_PATTERN.search("https://stats.g.doubleclick.net/collect")
+    assert BLOCKED_ASSET_PATTERN.search("https://www.walmart.com.mx/static/logo.PNG?v=3")
+    assert BLOCKED_ASSET_PATTERN.search("https://cdn.example.com/fonts/roboto.woff2")
+    # Pages, APIs and the Google entry point must go through.
+    assert not BLOCKED_HOST_PATTERN.search("https://www.google.com.mx/search?q=leche")
+    assert not BLOCKED_HOST_PATTERN.search("https://www.walmart.com.mx/productos?Ntt=7501055904143")
+    assert not BLOCKED_HOST_PATTERN.search("https://notdoubleclick.net.example.com/")
+    # Google's scripts and reCAPTCHA are served from gstatic.com
+    assert not BLOCKED_HOST_PATTERN.search("https://www.gstatic.com/recaptcha/releases/abc/recaptcha__es.js")
+    assert not BLOCKED_ASSET_PATTERN.search("https://www.walmart.com.mx/_next/static/chunks/main.js")
+
+def test_block_stats_summary():
+    stats = BlockStats()
+    stats.add(asset_category("https://i5.walmartimages.com/asr/a.jpeg?odnHeight=180"))
+    stats.add(asset_category("https://www.google-analytics.com/g/collect"))
+    stats.add(asset_category("https://x.com/a.css"))
+    assert stats.requests == {"image": 1, "tracker": 1, "stylesheet": 1}
+    assert stats.total == 3
+    assert "3 requests" in stats.summary()
@@ -0,0 +1,68 @@
+import json
+from run_journal import RunJournal, PROXY_BURN_THRESHOLD
+
+PRODUCT = {"product_id": 7, "product_name": "Leche", "ean_code": "7501055904143", "country_id": 1, "category_id": 1}
+
+def test_resume_unfinished_run(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    journal = RunJournal(path)
+    assert journal.open() is False
+    journal.record_pending(PRODUCT, [1, 2, 3])
+    journal.record_completed(7, 1, "exists")
+    journal.record_failed(7, 2, "no price")
+    journal.record_result(7, 3, 25.5)
+    for _ in range(PROXY_BURN_THRESHOLD):
+        journal.record_proxy(42, "failure")
+    journal.close(finished=False)
+
+    resumed = RunJournal(path)
+    assert resumed.open() is True
+    assert resumed.is_done(7, 1)
+    assert resumed.is_done(7, 2)
+    assert not resumed.is_done(7, 3)
+    assert resumed.open_pairs() == {(7, 3)}
+    assert resumed.unpersisted_results() == {(7, 3): 25.5}
+    assert resumed.pending_products() == [PRODUCT]
+    assert resumed.burned_proxies() == {42}
+    resumed.close()
+
+def test_finished_run_starts_fresh(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    journal = RunJournal(path)
+    journal.open()
+    journal.record_pending(PRODUCT, [1])
+    journal.close(finished=True)
+
+    fresh = RunJournal(path)
+    assert fresh.open() is False
+    assert fresh.open_pairs() == set()
+    fresh.close()
+
+def test_truncated_line_is_ignored(tmp_path):
+    path = tmp_path / "journal.jsonl"
+    journal = RunJournal(str(path))
+    journal.open()
+    journal.record_pending(PRODUCT, [1])
+    journal.close(finished=False)
+    with open(path, "a") as f:
+        f.write(json.dumps({"event": "completed", "product_id": 7})[:20])
+
+    resumed = RunJournal(str(path))
+    assert resumed.open() is True
+    assert resumed.open_pairs() == {(7, 1)}
+    resumed.close()
+
+def test_proxy_success_resets_burn_count():
+    journal = RunJournal("unused.jsonl")
+    for _ in range(PROXY_BURN_THRESHOLD - 1):
+        journal.record_proxy(5, "failure")
+    journal.record_proxy(5, "success")
+    journal.record_proxy(5, "failure")
+    assert not journal.is_burned(5)
+
+def test_last_product_id_is_resume_cursor():
+    journal = RunJournal("unused.jsonl")
+    assert journal.last_product_id() is None
+    journal.record_pending(PRODUCT, [1])
+    journal.record_pending(dict(PRODUCT, product_id=12), [1])
+    assert journal.last_product_id() == 12
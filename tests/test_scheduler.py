@@ -0,0 +1,69 @@
+from scheduler import Scheduler, RetailerStats, COST_BROWSER, COST_HTTP
+
+COST_CLASSES = {"Walmart": COST_BROWSER, "Chedraui": COST_HTTP, "Soriana": COST_HTTP}
+ESTABLISHMENTS = [
+    {"establishment_id": 1, "establishment_name": "Walmart"},
+    {"establishment_id": 2, "establishment_name": "Soriana"},
+    {"establishment_id": 3, "establishment_name": "Chedraui"},
+]
+
+def make_stats(tmp_path):
+    stats = RetailerStats(str(tmp_path / "stats.json"))
+    stats.record("Chedraui", (0, 3), 0.2, True)
+    stats.record("Soriana", (0, 2), 4.0, True)
+    stats.record("Walmart", (0, 1), 60.0, True)
+    return stats
+
+def test_cheap_work_first_and_browser_deferred(tmp_path):
+    scheduler = Scheduler(make_stats(tmp_path), COST_CLASSES)
+    product = {"product_id": 1, "prices_count": 0}
+    cheap = scheduler.plan(product, ESTABLISHMENTS)
+    assert [e["establishment_name"] for e in cheap] == ["Chedraui", "Soriana"]
+    assert [(product_id, e["establishment_name"]) for product_id, e in scheduler.drain_deferred()] == [(1, "Walmart")]
+
+def test_browser_work_respects_budget(tmp_path):
+    scheduler = Scheduler(make_stats(tmp_path), COST_CLASSES, budget_s=30)
+    scheduler.plan({"product_id": 1, "prices_count": 0}, ESTABLISHMENTS)
+    assert list(scheduler.drain_deferred()) == []
+    assert scheduler.skipped_over_budget == 1
+
+def test_failure_streak_lowers_priority(tmp_path):
+    stats = make_stats(tmp_path)
+    stats.record("Walmart", (2, 1), 60.0, False)
+    stats.record("Walmart", (2, 1), 60.0, False)
+    scheduler = Scheduler(stats, COST_CLASSES)
+    scheduler.plan({"product_id": 2, "prices_count": 0}, ESTABLISHMENTS)
+    scheduler.plan({"product_id": 3, "prices_count": 0}, ESTABLISHMENTS)
+    assert scheduler.upcoming_product_ids(10) == [3, 2]
+    assert [product_id for product_id, _ in scheduler.drain_deferred()] == [3, 2]
+
+def test_stats_persist(tmp_path):
+    stats = make_stats(tmp_path)
+    stats.save()
+    reloaded = RetailerStats(stats.path)
+    assert reloaded.expected_cost("Walmart", COST_BROWSER) == 60.0
+
+def test_failure_streaks_are_capped(tmp_path, monkeypatch):
+    import scheduler as scheduler_module
+
+    monkeypatch.setattr(scheduler_module, "MAX_FAILURE_STREAKS", 3)
+    stats = RetailerStats(str(tmp_path / "stats.json"))
+    for _ in range(10):
+        stats.record("Walmart", (1, 1), 60.0, False)
+    for product_id in (2, 3, 4):
+        stats.record("Walmart", (product_id, 1), 60.0, False)
+    stats.record("Walmart", (3, 1), 60.0, True)
+    # Pair 1 failed least recently and is forgotten; pair 3 reset on success
+    assert stats.failure_streaks == {"2:1": 1, "4:1": 1}
+
+    stats.record("Walmart", (5, 1), 60.0, False)
+    stats.record("Walmart", (6, 1), 60.0, False)
+    assert list(stats.failure_streaks) == ["4:1", "5:1", "6:1"]
+
+def test_failure_streak_value_is_capped(tmp_path):
+    from scheduler import MAX_FAILURE_STREAK
+
+    stats = RetailerStats(str(tmp_path / "stats.json"))
+    for _ in range(MAX_FAILURE_STREAK + 5):
+        stats.record("Walmart", (1, 1), 60.0, False)
+    assert stats.failure_streaks == {"1:1": MAX_FAILURE_STREAK}
@@ -0,0 +1,74 @@
+import asyncio
+
+import pytest
+
+from single_flight import SingleFlight
+
+
+@pytest.mark.asyncio
+async def test_concurrent_identical_lookups_share_one_request():
+    flights = SingleFlight(ttl_s=0)
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return 27.5
+
+    results = await asyncio.gather(*(flights.do(("Chedraui", "name", "leche entera"), fetch) for _ in range(5)))
+    assert results == [27.5] * 5
+    assert len(calls) == 1
+    assert (flights.stats.sent, flights.stats.shared) == (1, 4)
+
+
+@pytest.mark.asyncio
+async def test_found_prices_are_reused_and_misses_are_not():
+    flights = SingleFlight(ttl_s=60)
+    answers = iter([None, 30.0, 99.0])
+
+    async def fetch():
+        return next(answers)
+
+    assert await flights.do("k", fetch) is None
+    assert await flights.do("k", fetch) == 30.0   # a miss is not kept
+    assert await flights.do("k", fetch) == 30.0   # a found price is
+    assert flights.stats.reused == 1
+
+
+@pytest.mark.asyncio
+async def test_failed_lookup_is_retried_by_waiters():
+    flights = SingleFlight(ttl_s=0)
+    attempts = []
+
+    async def fetch():
+        attempts.append(1)
+        await asyncio.sleep(0.01)
+        if len(attempts) == 1:
+            raise RuntimeError("proxy reset")
+        return 12.0
+
+    results = await asyncio.gather(flights.do("k", fetch), flights.do("k", fetch), flights.do("k", fetch),
+                                   return_exceptions=True)
+    assert isinstance(results[0], RuntimeError)
+    assert results[1:] == [12.0, 12.0]
+    assert len(attempts) == 2
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_does_not_cancel_the_request():
+    flights = SingleFlight(ttl_s=0)
+    done = asyncio.Event()
+
+    async def fetch():
+        await asyncio.sleep(0.02)
+        done.set()
+        return 1.0
+
+    leader = asyncio.create_task(flights.do("k", fetch))
+    await asyncio.sleep(0)
+    waiter = asyncio.create_task(flights.do("k", fetch))
+    await asyncio.sleep(0)
+    waiter.cancel()
+    assert await leader == 1.0 and done.is_set()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter